@@ -0,0 +1,141 @@
+"""
+状态后端一致性 + 性能对比：本地 SQLite（CoreDAO） vs 远程（RemoteBackend -> 进程内 StateServer）
+用法（仓库根目录）：python -m benchmarks.bench_backends [--ops 3000 --concurrency 32]
+
+1. 一致性：同一份随机操作序列分别在两个后端上顺序执行，逐条比对返回值和最终状态
+2. 吞吐：并发混合负载，远程后端额外报告平均每帧请求数（批量 + 流水线效果）
+3. 多实例：两个 RemoteBackend（模拟两个机器人进程）并发扣同一个钱包，余额不能透支
+不一致时退出码为 1。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugins.sys.core import CoreDAO  # noqa: E402
+from plugins.sys.remote_state import RemoteBackend, StateServer  # noqa: E402
+
+
+def make_ops(n: int, seed: int):
+    rng = random.Random(seed)
+    ops = []
+    for i in range(n):
+        r = rng.random()
+        qq = str(10000 + rng.randrange(20))
+        key = f'k:{rng.randrange(30)}'
+        if r < 0.2:
+            ops.append(('set_key', key, f'v{i}'))
+        elif r < 0.35:
+            ops.append(('get_key', key))
+        elif r < 0.4:
+            ops.append(('del_key', key))
+        elif r < 0.5:
+            ops.append(('set_key_ttl', f'game:{rng.randrange(5)}', {'round': i, 'hints': [i % 3]}, 600))
+        elif r < 0.6:
+            ops.append(('get_key_ttl', f'game:{rng.randrange(5)}'))
+        elif r < 0.7:
+            ops.append(('add_exp_coin', qq, 1, rng.randrange(1, 20)))
+        elif r < 0.8:
+            ops.append(('spend_coin', qq, rng.randrange(1, 15), 'bench'))
+        elif r < 0.85:
+            ops.append(('get_user', qq))
+        elif r < 0.95:
+            ops.append(('store_group_message', f'g{rng.randrange(3)}', qq, 'nick', f'消息 {i}'))
+        else:
+            ops.append(('count_messages', f'g{rng.randrange(3)}', 1))
+    return ops
+
+
+def normalize(op: str, result):
+    if op == 'get_user':
+        return None if result is None else (result.qq, result.exp, result.coin)
+    return result
+
+
+async def consistency(local, remote, ops) -> int:
+    mismatches = 0
+    for i, (op, *args) in enumerate(ops):
+        a = normalize(op, await getattr(local, op)(*args))
+        b = normalize(op, await getattr(remote, op)(*args))
+        if a != b:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f'  第 {i} 条 {op}{tuple(args)} 不一致: local={a!r} remote={b!r}')
+    return mismatches
+
+
+async def throughput(backend, ops, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def run(op, args):
+        async with sem:
+            await getattr(backend, op)(*args)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(op, args) for op, *args in ops))
+    return len(ops) / (time.perf_counter() - start)
+
+
+async def two_instances(port: int, spends: int) -> dict:
+    a, b = RemoteBackend('127.0.0.1', port), RemoteBackend('127.0.0.1', port)
+    await a.init()
+    await b.init()
+    await a.add_exp_coin('shared', coin=spends // 2)
+    results = await asyncio.gather(*[(a if i % 2 else b).spend_coin('shared', 1, 'race') for i in range(spends)])
+    ok = sum(1 for r in results if r is not None)
+    user = await a.get_user('shared')
+    await a.close()
+    await b.close()
+    return {'spends': spends, 'succeeded': ok, 'final_coin': user.coin,
+            'consistent': ok == spends // 2 and user.coin == 0}
+
+
+async def main(args) -> int:
+    ops = make_ops(args.ops, args.seed)
+    result = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        local = CoreDAO(os.path.join(tmp, 'local.db'))
+        await local.init()
+        server = StateServer(CoreDAO(os.path.join(tmp, 'remote.db')))
+        await server.start()
+        remote = RemoteBackend('127.0.0.1', server.port)
+        await remote.init()
+
+        mismatches = await consistency(local, remote, ops)
+        result['consistency'] = {'ops': len(ops), 'mismatches': mismatches}
+        print(f'一致性: {len(ops)} 条操作，不一致 {mismatches} 条')
+
+        ops = make_ops(args.ops, args.seed + 1)
+        local_ops = await throughput(local, ops, args.concurrency)
+        before = (remote.requests, remote.batches)
+        remote_ops = await throughput(remote, ops, args.concurrency)
+        requests, batches = remote.requests - before[0], remote.batches - before[1]
+        result['throughput'] = {'local_ops_s': round(local_ops, 1), 'remote_ops_s': round(remote_ops, 1),
+                                'remote_avg_batch': round(requests / batches, 2) if batches else 0.0}
+        print(f"吞吐: local {local_ops:.1f} op/s   remote {remote_ops:.1f} op/s   "
+              f"平均每帧 {result['throughput']['remote_avg_batch']} 个请求")
+
+        result['multi_instance'] = await two_instances(server.port, args.spends)
+        print(f"多实例扣费: {result['multi_instance']}")
+
+        await remote.close()
+        await server.stop()
+        await local.close()
+
+    print(json.dumps(result, ensure_ascii=False))
+    return 0 if mismatches == 0 and result['multi_instance']['consistent'] else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地 / 远程状态后端一致性与性能对比')
+    parser.add_argument('--ops', type=int, default=3000, help='操作条数')
+    parser.add_argument('--concurrency', type=int, default=32, help='吞吐测试并发数')
+    parser.add_argument('--spends', type=int, default=200, help='多实例并发扣费次数')
+    parser.add_argument('--seed', type=int, default=7, help='随机种子')
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,197 @@
+"""
+CoreDAO 并发混合负载基准
+用法（仓库根目录）：python -m benchmarks.bench_dao_load [--groups 30 --games 3 --users 500 --duration 10]
+
+模拟 N 个群同时聊天 + M 局游戏 + 签到/扣费 + TTL 清理，全部跑在同一个事件循环里，
+直接调用 plugins/sys/core.py 的真实接口（临时库）。每类操作统计吞吐和 p50/p99 延迟。
+--json 输出的字段固定，可以在不同提交之间直接 diff / 对比。
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugins.sys.core import CoreDAO  # noqa: E402
+
+
+def percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+class Recorder:
+    """按操作名收集延迟（毫秒）"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    async def timed(self, name: str, fn: Callable):
+        start = time.perf_counter()
+        try:
+            await fn()
+        except Exception:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return
+        self.samples.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+
+    def report(self, elapsed: float) -> Dict[str, dict]:
+        result = {}
+        for name in sorted(self.samples):
+            s = self.samples[name]
+            result[name] = {
+                'ops': len(s),
+                'ops_s': round(len(s) / elapsed, 1),
+                'p50_ms': round(percentile(s, 50), 3),
+                'p99_ms': round(percentile(s, 99), 3),
+                'max_ms': round(max(s), 3),
+                'errors': self.errors.get(name, 0),
+            }
+        return result
+
+
+async def seed(dao: CoreDAO, args) -> None:
+    """预置用户和历史消息"""
+    for i in range(args.users):
+        await dao.add_exp_coin(str(100000 + i), exp=0, coin=1000)
+    now = time.time()
+    rows = [(str(900000 + i % args.groups), str(100000 + i % args.users), 'nick',
+             f'历史消息 {i} 今天天气不错', now - random.random() * 86400 * 2)
+            for i in range(args.seed_rows)]
+    for i in range(0, len(rows), 1000):
+        await dao._insert_messages(rows[i:i + 1000])
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    rec = Recorder()
+    with tempfile.TemporaryDirectory() as tmp:
+        dao = CoreDAO(os.path.join(tmp, 'load.db'), message_partitioning=args.partitioning)
+        await dao.init()
+        await seed(dao, args)
+
+        deadline = time.perf_counter() + args.duration
+        users = [str(100000 + i) for i in range(args.users)]
+
+        async def chat(group: str):
+            # 群聊：连续写消息，偶尔读最近消息数
+            while time.perf_counter() < deadline:
+                uid = rng.choice(users)
+                await rec.timed('ingest', lambda: dao.store_group_message(group, uid, 'nick', '压测消息 ' * 3))
+                if rng.random() < 0.02:
+                    await rec.timed('count_messages', lambda: dao.count_messages(group, 24))
+                await asyncio.sleep(args.think_ms / 1000)
+
+        async def game(idx: int):
+            # 游戏：每条消息读一次状态，答对时写回并发奖
+            key = f'bench_game:{900000 + idx}'
+            await dao.set_key_ttl(key, {'round': 0, 'answer': 'apple'}, 600)
+            rnd = 0
+            while time.perf_counter() < deadline:
+                await rec.timed('game_load', lambda: dao.get_key_ttl(key))
+                if rng.random() < 0.2:
+                    rnd += 1
+                    state = {'round': rnd, 'answer': 'apple', 'hints': [1, 2, 3]}
+                    await rec.timed('game_save', lambda: dao.set_key_ttl(key, state, 600))
+                    uid = rng.choice(users)
+                    await rec.timed('reward', lambda: dao.add_exp_coin(uid, exp=5, coin=10))
+                await asyncio.sleep(args.think_ms / 1000)
+
+        async def wallet():
+            while time.perf_counter() < deadline:
+                uid = rng.choice(users)
+                r = rng.random()
+                if r < 0.5:
+                    await rec.timed('get_user', lambda: dao.get_user(uid))
+                elif r < 0.8:
+                    await rec.timed('spend_coin', lambda: dao.spend_coin(uid, 1, reason='bench'))
+                else:
+                    await rec.timed('add_exp_coin', lambda: dao.add_exp_coin(uid, exp=1, coin=1))
+                await asyncio.sleep(args.think_ms / 1000)
+
+        async def ttl():
+            # 短 TTL 的 key 不断产生，清理任务定期回收
+            n = 0
+            while time.perf_counter() < deadline:
+                for _ in range(20):
+                    n += 1
+                    await dao.set_key_ttl(f'bench_ttl:{n}', n, 1)
+                await rec.timed('ttl_cleanup', dao.ttl_cleanup)
+                await asyncio.sleep(args.ttl_interval_ms / 1000)
+
+        tasks = [chat(str(900000 + g)) for g in range(args.groups)]
+        tasks += [game(i) for i in range(args.games)]
+        tasks += [wallet() for _ in range(args.wallet_workers)]
+        tasks.append(ttl())
+
+        start = time.perf_counter()
+        await asyncio.gather(*tasks)
+        # 把队列里剩下的消息刷完也算进总耗时，避免吞吐被"只入队"夸大
+        await rec.timed('ingest_drain', dao.ingest.flush)
+        elapsed = time.perf_counter() - start
+        ingest_stats = dao.ingest.stats()
+        await dao.close()
+
+    return {
+        'meta': {
+            'git': git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'params': {k: v for k, v in vars(args).items() if k != 'json'},
+            'elapsed_s': round(elapsed, 3),
+        },
+        'ops': rec.report(elapsed),
+        'ingest': ingest_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CoreDAO 并发混合负载基准')
+    parser.add_argument('--groups', type=int, default=30, help='同时聊天的群数')
+    parser.add_argument('--games', type=int, default=3, help='同时进行的游戏局数')
+    parser.add_argument('--users', type=int, default=500, help='用户数')
+    parser.add_argument('--seed-rows', type=int, default=20000, help='预置历史消息条数')
+    parser.add_argument('--wallet-workers', type=int, default=4, help='钱包操作并发数')
+    parser.add_argument('--duration', type=float, default=10.0, help='压测时长（秒）')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='每个任务两次操作之间的间隔（毫秒）')
+    parser.add_argument('--ttl-interval-ms', type=float, default=500.0, help='TTL 清理间隔（毫秒）')
+    parser.add_argument('--partitioning', choices=['none', 'day'], default='none', help='消息分表方式')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--json', metavar='PATH', help='把结果写到 JSON 文件')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+
+    print(f"{'op':<16}{'ops':>9}{'ops/s':>11}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'err':>6}")
+    for name, r in result['ops'].items():
+        print(f"{name:<16}{r['ops']:>9}{r['ops_s']:>11}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}{r['errors']:>6}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
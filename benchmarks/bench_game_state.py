@@ -0,0 +1,150 @@
+"""
+游戏状态编码基准：JSON 快照 vs 紧凑二进制编码 + 字段级补丁
+用法（仓库根目录）：python -m benchmarks.bench_game_state [--sessions 200 --players 6]
+
+模拟单词猜猜乐的 10 回合对局（WordGameState 的全部字段），每回合：开新词、提示揭一个字母、
+计时提示、有人答对（连击 / 统计 / 昵称更新），每一步都 save 一次。
+1. 编解码：整份状态 JSON（set_key_ttl 的存法）vs state_codec 的大小和单次耗时，取每局最后一回合的状态
+2. 端到端：GameState 每次 save 后立即 flush（最坏情况，不做合并），比较 compact=False / True
+   写入 KV 的字节数、快照 / 补丁次数和耗时；最后从库里重新读回核对
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugins.sys.core import CoreDAO  # noqa: E402
+import plugins.game.game_base as game_base  # noqa: E402
+from plugins.game import state_codec  # noqa: E402
+
+WORDS = ['abandon', 'ability', 'absolute', 'academic', 'accelerate', 'accommodate', 'accurate', 'achievement',
+         'acquire', 'adequate', 'adjacent', 'advocate', 'aggregate', 'allocate', 'ambiguous', 'analogy',
+         'anticipate', 'apparatus', 'arbitrary', 'assemble', 'attribute', 'authentic', 'benevolent', 'bureaucracy']
+NAMES = ['小明', '阿狸', 'Sora', '今天也要加油', '摸鱼王', 'Alice', '猫猫', '路过的同学', '夜猫子', '学习委员']
+
+
+def play_session(rng: random.Random, players: int, rounds: int = 10):
+    """按真实流程生成一局里每次 save 时的状态（同一个 dict 原地修改，产出深拷贝）"""
+    qqs = [str(rng.randint(10 ** 8, 4 * 10 ** 9)) for _ in range(players)]
+    starter = rng.choice(qqs)
+    state = {
+        "current_word": "", "current_mask": [], "revealed_positions": 0, "used_words": [],
+        "player_stats": {}, "player_combo": {}, "last_player": None, "round_number": 1,
+        "max_rounds": rounds, "start_time": time.time(), "hint_used": False,
+        "hints_revealed": {"phonetic": False, "definition": False}, "difficulty": "normal",
+        "strict_mode": False, "player_names": {starter: rng.choice(NAMES)},
+        "word_ids": [rng.randint(1, 700000) for _ in range(rounds)],
+    }
+    yield state
+    for _ in range(rounds):
+        word = rng.choice(WORDS)
+        state.update(current_word=word, current_mask=[False] * len(word), revealed_positions=0,
+                     hints_revealed={"phonetic": False, "definition": False}, hint_used=False,
+                     start_time=time.time())
+        state["used_words"].append(word)
+        yield state
+        if rng.random() < 0.5:                                   # 有人花金币揭一个字母
+            state["current_mask"][rng.randrange(len(word))] = True
+            state["revealed_positions"] += 1
+            yield state
+        if rng.random() < 0.4:                                   # 60 秒音标提示
+            state["hints_revealed"]["phonetic"] = True
+            yield state
+        winner = rng.choice(qqs)
+        state["player_names"].setdefault(winner, rng.choice(NAMES))
+        last = state["last_player"]
+        if last and last != winner:
+            state["player_combo"][last] = 0
+        state["player_combo"][winner] = state["player_combo"].get(winner, 0) + 1
+        stats = state["player_stats"].setdefault(winner, {"count": 0, "total_coins": 0})
+        stats["count"] += 1
+        stats["total_coins"] += 10 * state["player_combo"][winner]
+        state["last_player"] = winner
+        state["round_number"] += 1
+        yield state
+
+
+def timed_us(fn, values, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for v in values:
+            fn(v)
+    return (time.perf_counter() - start) / (repeat * len(values)) * 1e6
+
+
+async def end_to_end(db_path: str, sessions: list, compact: bool) -> dict:
+    dao = CoreDAO(db_path)
+    await dao.init()
+    game_base.dao = dao
+    state = game_base.GameState("bench", compact=compact)
+    start = time.perf_counter()
+    saves = 0
+    for gid, steps in enumerate(sessions):
+        for snapshot in steps:
+            await state.save(str(gid), json.loads(snapshot))
+            await state.flush(str(gid))
+            saves += 1
+    cost = time.perf_counter() - start
+    # 重新读回核对：新的 GameState 没有内存会话，全部从库里解码
+    reader = game_base.GameState("bench", compact=compact)
+    for gid, steps in enumerate(sessions):
+        assert await reader.load(str(gid)) == json.loads(steps[-1])
+    stats = state.stats()
+    await dao.close()
+    return {"saves": saves, "bytes_written": stats["bytes_written"] if compact else None,
+            "snapshots": stats["snapshots"], "patches": stats["patches"], "unchanged": stats["unchanged"],
+            "us_per_save": round(cost / saves * 1e6, 1)}
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    sessions = [[json.dumps(s, ensure_ascii=False) for s in play_session(rng, rng.randint(2, args.players))]
+                for _ in range(args.sessions)]
+    finals = [json.loads(steps[-1]) for steps in sessions]
+    blobs = [state_codec.encode_state(s) for s in finals]
+    for state, blob in zip(finals, blobs):
+        assert state_codec.decode_state(blob) == state
+    json_texts = [json.dumps(s) for s in finals]          # set_key_ttl 的存法（ensure_ascii 默认开）
+
+    result = {
+        "size_bytes": {
+            "json": round(sum(len(t) for t in json_texts) / len(finals)),
+            "compact": round(sum(len(b) for b in blobs) / len(finals)),
+        },
+        "encode_us": {
+            "json": round(timed_us(json.dumps, finals, args.repeat), 2),
+            "compact": round(timed_us(state_codec.encode_state, finals, args.repeat), 2),
+        },
+        "decode_us": {
+            "json": round(timed_us(json.loads, json_texts, args.repeat), 2),
+            "compact": round(timed_us(state_codec.decode_state, blobs, args.repeat), 2),
+        },
+    }
+    print(f"{len(sessions)} 局，平均每局 save {sum(map(len, sessions)) / len(sessions):.1f} 次")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = await end_to_end(os.path.join(tmp, 'json.db'), sessions, compact=False)
+        plain["bytes_written"] = sum(len(s.encode('utf-8')) for steps in sessions
+                                     for s in (json.dumps(json.loads(x)) for x in steps))
+        compact = await end_to_end(os.path.join(tmp, 'compact.db'), sessions, compact=True)
+    result["e2e_json"] = plain
+    result["e2e_compact"] = compact
+
+    for name, values in result.items():
+        print(f'{name}: ' + '  '.join(f'{k}={v}' for k, v in values.items()))
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='游戏状态：JSON vs 紧凑编码 + 字段级补丁')
+    parser.add_argument('--sessions', type=int, default=200, help='模拟的对局数（每局 10 回合）')
+    parser.add_argument('--players', type=int, default=6, help='每局最多玩家数')
+    parser.add_argument('--repeat', type=int, default=20, help='编解码计时重复次数')
+    parser.add_argument('--seed', type=int, default=7, help='随机种子')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,120 @@
+"""
+KV 大值压缩基准：压缩花掉的 CPU vs 少写/少读的字节
+用法（仓库根目录）：python -m benchmarks.bench_kv_compression [--users 200 --turns 20]
+
+1. 编解码：对模拟的 AI 对话历史（和 aichat_plugin 一样经 set_key_ttl 存，约 8000 字）
+   比较 zlib 各级别 / zlib+预置字典 / zstd（装了 zstandard 才测）的压缩比和单次耗时
+2. 端到端：N 个用户每轮整段重写历史再读回（关闭 KV 缓存，每次都读库），
+   统计吞吐、写入库的值字节数、库文件最终页数
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugins.sys.core import CoreDAO  # noqa: E402
+from plugins.sys.kv_codec import KVCodec, train_zdict, zdict_path, zstandard  # noqa: E402
+
+PHRASES = [
+    '今天群里有人问怎么玩单词游戏', '你可以发送 /开始游戏 试试看', '签到可以获得经验和金币',
+    '我觉得这个问题可以换个角度想', '好的，我来帮你总结一下刚才的讨论', '哈哈哈这个太好笑了',
+    '请问机器人能不能查天气', '抱歉，我暂时还不支持这个功能', '大家晚上好呀', '这个单词的意思是“坚持不懈”',
+    'Python 的 asyncio 里可以用 gather 并发执行', '记得多喝水早点休息', '明天还要上课，先睡了',
+]
+
+
+def make_history(rng: random.Random, max_chars: int = 8000) -> str:
+    """和 aichat_plugin 的存法一致：消息列表 -> JSON 字符串 -> set_key_ttl 再 json.dumps 一次"""
+    messages, size = [{"role": "system", "content": "你是群聊机器人 Sora，说话简洁友好。"}], 0
+    while size < max_chars:
+        content = '，'.join(rng.choice(PHRASES) for _ in range(rng.randint(1, 4))) + f'（{rng.randint(1, 9999)}）'
+        messages.append({"role": rng.choice(("user", "assistant")), "content": content})
+        size += len(content)
+    return json.dumps(json.dumps(messages, ensure_ascii=False))
+
+
+def bench_codec(name: str, codec: KVCodec, samples, rounds: int) -> dict:
+    blobs = [codec.encode(s) for s in samples]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for s in samples:
+            codec.encode(s)
+    enc = (time.perf_counter() - start) / (rounds * len(samples)) * 1e6
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for b in blobs:
+            codec.decode(b)
+    dec = (time.perf_counter() - start) / (rounds * len(samples)) * 1e6
+    raw = sum(len(s.encode('utf-8')) for s in samples)
+    stored = sum(len(b) if isinstance(b, bytes) else len(b.encode('utf-8')) for b in blobs)
+    result = {'codec': name, 'ratio': round(raw / stored, 2), 'encode_us': round(enc, 1), 'decode_us': round(dec, 1)}
+    print(f"  {name:<14} 压缩比 {result['ratio']:>5}  压缩 {result['encode_us']:>7}µs  解压 {result['decode_us']:>7}µs")
+    return result
+
+
+async def end_to_end(path: str, method: str, histories, turns: int) -> dict:
+    dao = CoreDAO(path, kv_cache_size=0, kv_compression=method)
+    await dao.init()
+    try:
+        start = time.perf_counter()
+        for turn in range(turns):
+            for i, history in enumerate(histories):
+                key = f'ai_chat_history_{i}'
+                await dao.get_key(key)
+                await dao.set_key(key, history[:len(history) * (turn + 1) // turns])
+        elapsed = time.perf_counter() - start
+        stats = dao.codec.stats()
+    finally:
+        await dao.close()
+    conn = sqlite3.connect(path)
+    stored = conn.execute('SELECT sum(length(CAST(store_value AS BLOB))) FROM kv').fetchone()[0]
+    conn.execute('VACUUM')
+    pages = conn.execute('PRAGMA page_count').fetchone()[0]
+    conn.close()
+    ops = turns * len(histories) * 2
+    result = {'method': method, 'ops_s': round(ops / elapsed, 1), 'final_value_bytes': stored, 'db_pages': pages,
+              'written_bytes': stats['stored_bytes'] if method != 'none' else None}
+    print(f"  {method:<6} {result['ops_s']:>8} op/s   库内值 {stored // 1024}KB   VACUUM 后 {pages} 页")
+    return result
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    histories = [make_history(rng) for _ in range(args.users)]
+    result = {'codec': [], 'end_to_end': []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'编解码（{len(histories)} 份历史，平均 {sum(map(len, histories)) // len(histories)} 字符）:')
+        for level in (1, 6, 9):
+            result['codec'].append(bench_codec(f'zlib-{level}', KVCodec('zlib', level=level), histories, args.rounds))
+        # 用一半样本训练字典，另一半测，避免字典“背答案”
+        zdict = train_zdict(histories[::2])
+        with open(zdict_path(tmp, zlib.adler32(zdict)), 'wb') as f:
+            f.write(zdict)
+        result['codec'].append(bench_codec('zlib-6+dict', KVCodec('zlib', zdict_dir=tmp), histories[1::2], args.rounds))
+        if zstandard is not None:
+            result['codec'].append(bench_codec('zstd-3', KVCodec('zstd'), histories, args.rounds))
+
+        print(f'端到端（{args.users} 用户 × {args.turns} 轮，读-改-写整段历史）:')
+        for method in ('none', 'zlib'):
+            result['end_to_end'].append(
+                await end_to_end(os.path.join(tmp, f'{method}.db'), method, histories, args.turns))
+
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='KV 大值压缩：CPU 开销 vs 节省的 I/O')
+    parser.add_argument('--users', type=int, default=200, help='模拟用户数（每人一份对话历史）')
+    parser.add_argument('--turns', type=int, default=20, help='每个用户重写历史的轮数')
+    parser.add_argument('--rounds', type=int, default=20, help='编解码计时重复次数')
+    parser.add_argument('--seed', type=int, default=7, help='随机种子')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""
+连接池 vs 每次调用新建连接 的 DAO 基准
+用法（仓库根目录）：python -m benchmarks.bench_pool [--ops 2000]
+
+旧实现每个方法都 aiosqlite.connect() 一次（新线程 + 打开文件 + 解析 schema），
+这里用 PerCallDAO 复刻旧行为，和基于 ConnectionPool 的 CoreDAO 在同一份临时库上对比。
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import aiosqlite
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugins.sys.core import CoreDAO  # noqa: E402
+
+
+class PerCallDAO:
+    """旧版 CoreDAO 的访问模式：每次调用单独建连接"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    async def get_key(self, key: str):
+        async with aiosqlite.connect(self.db_path) as conn:
+            cur = await conn.execute('SELECT store_value FROM kv WHERE store_key=?', (key,))
+            row = await cur.fetchone()
+            return row[0] if row else None
+
+    async def set_key(self, key: str, value: str):
+        async with aiosqlite.connect(self.db_path) as conn:
+            await conn.execute('INSERT OR REPLACE INTO kv(store_key, store_value) VALUES(?,?)', (key, value))
+            await conn.commit()
+
+    async def get_user(self, qq: str):
+        async with aiosqlite.connect(self.db_path) as conn:
+            cur = await conn.execute('SELECT * FROM users WHERE qq=?', (qq,))
+            return await cur.fetchone()
+
+    async def add_exp_coin(self, qq: str, exp: int = 0, coin: int = 0):
+        async with aiosqlite.connect(self.db_path) as conn:
+            await conn.execute('INSERT OR IGNORE INTO users(qq, created_at) VALUES(?, ?)',
+                               (qq, datetime.now().isoformat()))
+            await conn.execute('UPDATE users SET exp = exp + ?, coin = coin + ? WHERE qq = ?', (exp, coin, qq))
+            await conn.commit()
+
+    async def store_group_message(self, group_id: str, user_id: str, nickname: str, message: str):
+        async with aiosqlite.connect(self.db_path) as conn:
+            await conn.execute(
+                'INSERT INTO group_messages (group_id, user_id, nickname, message, timestamp) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (group_id, user_id, nickname, message, time.time())
+            )
+            await conn.commit()
+
+
+WORKLOADS = {
+    'get_key': lambda d, i: d.get_key(f'bench:{i % 50}'),
+    'set_key': lambda d, i: d.set_key(f'bench:{i % 50}', 'x' * 64),
+    'get_user': lambda d, i: d.get_user(str(10000 + i % 50)),
+    'add_exp_coin': lambda d, i: d.add_exp_coin(str(10000 + i % 50), exp=1, coin=1),
+    'store_group_message': lambda d, i: d.store_group_message('1000', str(i % 30), 'nick', '测试消息' * 4),
+}
+
+
+async def run_one(dao, name: str, ops: int, concurrency: int) -> float:
+    fn = WORKLOADS[name]
+    sem = asyncio.Semaphore(concurrency)
+
+    async def op(i):
+        async with sem:
+            await fn(dao, i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(op(i) for i in range(ops)))
+    return ops / (time.perf_counter() - start)
+
+
+async def main(ops: int, concurrency: int):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        pooled = CoreDAO(db_path)
+        await pooled.init()        # 建表，并把库切到 WAL
+        per_call = PerCallDAO(db_path)
+
+        for name in WORKLOADS:
+            old = await run_one(per_call, name, ops, concurrency)
+            new = await run_one(pooled, name, ops, concurrency)
+            results[name] = {'per_call_ops_s': round(old, 1), 'pooled_ops_s': round(new, 1),
+                             'speedup': round(new / old, 2)}
+            print(f'{name:<22} per-call {old:>9.1f} op/s   pooled {new:>9.1f} op/s   x{new / old:.2f}')
+
+        await pooled.close()
+    print(json.dumps(results, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CoreDAO 连接池基准')
+    parser.add_argument('--ops', type=int, default=2000, help='每个方法执行次数')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发任务数')
+    args = parser.parse_args()
+    asyncio.run(main(args.ops, args.concurrency))
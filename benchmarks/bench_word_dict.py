@@ -0,0 +1,130 @@
+"""
+内存映射词典 vs SQLite 查词基准
+用法（仓库根目录）：python -m benchmarks.bench_word_dict [--words 200000 --lookups 20000]
+
+用 data/csv2db.py 把一份合成的 ECDICT 风格 CSV 导入临时目录（同时生成 word_game.dict），然后比较：
+1. 精确查词：sqlite3 同步直连 / WordGameDAO（aiosqlite 连接池）/ WordDict（mmap）
+2. 批量查词：每批 --batch 个词，SQL IN (...) vs WordDict.lookup_many
+约 10% 的查询词不存在，覆盖未命中路径。
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'data'))
+
+import csv2db  # noqa: E402
+from plugins.sys.core import WordGameDAO  # noqa: E402
+from plugins.sys.word_dict import WordDict, dict_path  # noqa: E402
+
+TAGS = ['zk', 'gk', 'cet4', 'cet6', 'ky', 'tem4', 'tem8', 'ielts', 'toefl', 'gre', 'sat']
+GLOSS = ['物体', '行为', '状态', '使…变得', '关于', '一种', '非常', '地方', '人', '方法', '时间', '结果']
+
+
+def make_csv(path: str, n: int, rng: random.Random) -> list:
+    words = []
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['word', 'phonetic', 'definition', 'translation', 'pos', 'collins', 'oxford', 'tag',
+                    'bnc', 'frq', 'exchange', 'detail', 'audio'])
+        for i in range(n):
+            word = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 10))) + str(i)
+            words.append(word)
+            definition = '\n'.join(f'{p}. ' + ' '.join(rng.choice(('a', 'the', 'of', 'to', 'make', 'thing', 'state',
+                                                                    'person', 'act', 'place')) for _ in range(8))
+                                   for p in rng.sample(['n', 'v', 'adj', 'adv'], rng.randint(1, 3)))
+            translation = '\\n'.join(f'{p}. ' + '，'.join(rng.sample(GLOSS, 3)) for p in ('n', 'v')[:rng.randint(1, 2)])
+            exchange = f'p:{word}ed/d:{word}ed/i:{word}ing/3:{word}s' if rng.random() < 0.3 else ''
+            w.writerow([word, 'ˈwɜːd', definition, translation, 'n:60/v:40', rng.choice(['', 1, 2, 3, 4, 5]),
+                        rng.choice(['', 1]), ' '.join(rng.sample(TAGS, rng.randint(0, 3))),
+                        rng.randint(1, 60000), rng.randint(1, 60000), exchange, '', ''])
+    return words
+
+
+def timed(fn, count: int) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    result = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, db_path = os.path.join(tmp, 'ecdict.csv'), os.path.join(tmp, 'word_game.db')
+        words = make_csv(csv_path, args.words, rng)
+        stats = csv2db.build(csv_path, db_path)
+        result['files'] = {'db_bytes': os.path.getsize(db_path), 'dict_bytes': stats['dict_bytes']}
+        print(f"词典库 {result['files']['db_bytes'] // 1024}KB，word_game.dict {stats['dict_bytes'] // 1024}KB")
+
+        queries = [rng.choice(words) if rng.random() < 0.9 else f'missing{i}' for i in range(args.lookups)]
+        batches = [queries[i:i + args.batch] for i in range(0, len(queries), args.batch)]
+
+        conn = sqlite3.connect(f'file:{db_path}?mode=ro&immutable=1', uri=True)
+        word_dict = WordDict(dict_path(db_path))
+
+        def sqlite_exact():
+            for q in queries:
+                conn.execute('SELECT * FROM dictionary WHERE word = ?', (q,)).fetchone()
+
+        def dict_exact():
+            for q in queries:
+                word_dict.lookup(q)
+
+        def sqlite_batch():
+            for batch in batches:
+                conn.execute(f"SELECT * FROM dictionary WHERE word IN ({', '.join('?' * len(batch))})", batch).fetchall()
+
+        def dict_batch():
+            for batch in batches:
+                word_dict.lookup_many(batch)
+
+        # 结果一致性：抽查
+        for q in queries[:200]:
+            row = conn.execute('SELECT id, translation, exchange FROM dictionary WHERE word = ?', (q,)).fetchone()
+            hit = word_dict.lookup(q)
+            assert (row is None) == (hit is None) and (row is None or row == (hit['id'], hit['translation'], hit['exchange']))
+
+        result['exact_us'] = {'sqlite_sync': round(timed(sqlite_exact, len(queries)), 2),
+                              'word_dict': round(timed(dict_exact, len(queries)), 2)}
+
+        dao = WordGameDAO(db_path)
+        await dao.init()
+        saved, dao.word_dict = dao.word_dict, None      # 先测纯 SQLite 路径
+        start = time.perf_counter()
+        for q in queries:
+            await dao.get_word_by_exact_match(q)
+        result['exact_us']['dao_sqlite'] = round((time.perf_counter() - start) / len(queries) * 1e6, 2)
+        dao.word_dict = saved
+        start = time.perf_counter()
+        for q in queries:
+            await dao.get_word_by_exact_match(q)
+        result['exact_us']['dao_word_dict'] = round((time.perf_counter() - start) / len(queries) * 1e6, 2)
+        await dao.close()
+
+        result['batch_us_per_word'] = {'sqlite_in': round(timed(sqlite_batch, len(queries)), 2),
+                                       'word_dict': round(timed(dict_batch, len(queries)), 2)}
+        conn.close()
+        word_dict.close()
+
+    for name, values in result.items():
+        print(f'{name}: ' + '  '.join(f'{k}={v}' for k, v in values.items()))
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='内存映射词典 vs SQLite 查词')
+    parser.add_argument('--words', type=int, default=200000, help='合成词典的词条数')
+    parser.add_argument('--lookups', type=int, default=20000, help='查询次数')
+    parser.add_argument('--batch', type=int, default=100, help='批量查词每批词数')
+    parser.add_argument('--seed', type=int, default=7, help='随机种子')
+    asyncio.run(main(parser.parse_args()))
@@ -1,10 +1,82 @@
+"""
+ECDICT 词典导入：ecdict.csv -> word_game.db
+用法（仓库根目录）：
+    python data/csv2db.py                   # 全量重建
+    python data/csv2db.py --incremental     # 只改内容有变化的词条（按内容哈希），id 保持不变
+
+- 全程写临时文件（journal_mode=OFF / synchronous=OFF，一个事务），装完数据再建索引，最后 os.replace 原子替换；
+  机器人运行中也可以直接导入，它打开的旧文件不受影响，下一回合检测到文件变化后重新打开
+- 标签位图 / 难度分档 / 词形变化表的定义见 plugins/sys/word_tags.py
+- 顺带生成内存映射词典 word_game.dict（plugins/sys/word_dict.py），插件精确查词不用连库
+"""
+import argparse
 import csv
-import sqlite3
+import hashlib
+import operator
 import os
+import sqlite3
+import sys
+import time
+
+# 标签位图 / 难度分档和机器人共用一份定义（只依赖标准库，按文件路径加载，不触发插件包导入）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'plugins', 'sys'))
+from word_tags import TAG_BITS, inflections, parse_tags, word_level  # noqa: E402
+from word_dict import build_word_dict  # noqa: E402
+
+CSV_FILE = os.path.join(ROOT, 'data', 'ecdict.csv')
+DB_FILE = os.path.join(ROOT, 'config', 'db', 'word_game.db')
 
-# 配置文件名
-CSV_FILE = 'ecdict.csv'
-DB_FILE = 'word_game.db'
+# ecdict.csv 里用到的列（按表头名取下标，列顺序变了也没关系）
+CSV_COLUMNS = ('word', 'phonetic', 'definition', 'translation', 'pos',
+               'collins', 'oxford', 'tag', 'bnc', 'frq', 'exchange')
+DICT_COLUMNS = CSV_COLUMNS + ('tag_bits', 'level', 'content_hash')
+BATCH = 20000
+
+SCHEMA = '''
+CREATE TABLE dictionary (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    word TEXT NOT NULL,
+    phonetic TEXT,
+    definition TEXT,
+    translation TEXT,
+    pos TEXT,
+    collins INTEGER DEFAULT 0,
+    oxford INTEGER DEFAULT 0,
+    tag TEXT,
+    bnc INTEGER DEFAULT 99999999,
+    frq INTEGER DEFAULT 99999999,
+    exchange TEXT,
+    tag_bits INTEGER NOT NULL DEFAULT 0,
+    level INTEGER NOT NULL DEFAULT 5,
+    content_hash INTEGER NOT NULL DEFAULT 0
+);
+-- 标签 -> 位号，方便其它工具解读 tag_bits
+CREATE TABLE tags (name TEXT PRIMARY KEY, bit INTEGER NOT NULL) WITHOUT ROWID;
+-- 变形 -> 原形：游戏里“went”算答对“go”，走主键精确查找，不再 exchange LIKE '%...%'
+CREATE TABLE word_forms (
+    form TEXT NOT NULL,
+    lemma_id INTEGER NOT NULL,
+    PRIMARY KEY (form, lemma_id)
+) WITHOUT ROWID;
+'''
+
+# 装完数据再建：一次排序建好，比边插边维护 B 树快得多
+INDEXES = '''
+CREATE UNIQUE INDEX idx_word ON dictionary(word);
+-- 难度筛选的覆盖索引：条件里的列 + rowid 都在索引里，抽词建 id 表不回表
+CREATE INDEX idx_collins_tags ON dictionary(collins, tag_bits);
+CREATE INDEX idx_level_tags ON dictionary(level, tag_bits);
+CREATE INDEX idx_forms_lemma ON word_forms(lemma_id);
+'''
+
+BULK_PRAGMAS = '''
+PRAGMA journal_mode=OFF;
+PRAGMA synchronous=OFF;
+PRAGMA locking_mode=EXCLUSIVE;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-262144;
+'''
 
 
 def safe_int(value, default=0):
@@ -17,102 +89,192 @@ def safe_int(value, default=0):
         return default
 
 
-def create_database():
-    # 如果文件已存在，先删除（可选，为了每次运行都是新的）
-    if os.path.exists(DB_FILE):
-        os.remove(DB_FILE)
-
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    # 创建表结构
-    print("正在创建数据库表结构...")
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS dictionary (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        word TEXT NOT NULL UNIQUE,
-        phonetic TEXT,
-        definition TEXT,
-        translation TEXT,
-        pos TEXT,
-        collins INTEGER DEFAULT 0,
-        oxford INTEGER DEFAULT 0,
-        tag TEXT,
-        bnc INTEGER DEFAULT 99999999,
-        frq INTEGER DEFAULT 99999999,
-        exchange TEXT
-    );
-    ''')
-
-    # 创建索引以加速游戏时的随机抽取速度
-    cursor.execute('CREATE INDEX idx_collins ON dictionary(collins);')
-    cursor.execute('CREATE INDEX idx_tag ON dictionary(tag);')
-    cursor.execute('CREATE INDEX idx_word ON dictionary(word);')
-
-    conn.commit()
-    return conn
-
-
-def import_csv_to_db(conn):
-    cursor = conn.cursor()
-    print(f"正在读取 {CSV_FILE} 并导入数据，这可能需要几秒钟...")
-
-    # 这里的 encoding='utf-8' 非常重要
-    with open(CSV_FILE, 'r', encoding='utf-8') as f:
-        # 使用 DictReader 自动处理标题行
-        reader = csv.DictReader(f)
-
-        batch_data = []
-        count = 0
-
-        for row in reader:
-            # 数据清洗与准备
-            data = (
-                row.get('word'),
-                row.get('phonetic'),
-                row.get('definition'),
-                row.get('translation'),
-                row.get('pos'),
-                safe_int(row.get('collins'), 0),  # 转换为整数
-                safe_int(row.get('oxford'), 0),  # 转换为整数
-                row.get('tag'),
-                safe_int(row.get('bnc'), 0),
-                safe_int(row.get('frq'), 0),
-                row.get('exchange')
-            )
-            batch_data.append(data)
-
-            # 每 5000 条提交一次，提高速度
-            if len(batch_data) >= 5000:
-                cursor.executemany('''
-                    INSERT OR IGNORE INTO dictionary 
-                    (word, phonetic, definition, translation, pos, collins, oxford, tag, bnc, frq, exchange)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', batch_data)
-                conn.commit()
-                batch_data = []
-                count += 5000
-                print(f"已处理 {count} 条词条...")
-
-        # 处理剩余的数据
-        if batch_data:
-            cursor.executemany('''
-                INSERT OR IGNORE INTO dictionary 
-                (word, phonetic, definition, translation, pos, collins, oxford, tag, bnc, frq, exchange)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', batch_data)
-            conn.commit()
-
-    print("导入完成！")
+def content_hash(fields) -> int:
+    """词条内容的 64 位哈希（有符号，直接存 INTEGER）"""
+    digest = hashlib.blake2b('\x1f'.join(fields).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
 
 
-if __name__ == '__main__':
+def read_rows(csv_path: str):
+    """逐行产出 (word, ...DICT_COLUMNS 其余字段)；同一个词只取第一次出现的"""
+    seen = set()
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        index = [header.index(name) for name in CSV_COLUMNS]
+        pick = operator.itemgetter(*index)
+        width = max(index) + 1
+        for raw in reader:
+            if len(raw) < width:
+                continue
+            fields = pick(raw)
+            word, phonetic, definition, translation, pos, collins, oxford, tag, bnc, frq, exchange = fields
+            if not word or word in seen:
+                continue
+            seen.add(word)
+            h = content_hash(fields)
+            collins, oxford, bnc, frq = safe_int(collins), safe_int(oxford), safe_int(bnc), safe_int(frq)
+            yield (word, phonetic, definition, translation, pos, collins, oxford, tag, bnc, frq, exchange,
+                   parse_tags(tag), word_level(collins, oxford, bnc, frq), h)
+
+
+def _batches(iterable, size: int = BATCH):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+INSERT_SQL = f'INSERT INTO dictionary ({", ".join(DICT_COLUMNS)}) VALUES ({", ".join("?" * len(DICT_COLUMNS))})'
+
+
+def _run_script(conn: sqlite3.Connection, script: str) -> None:
+    """逐条执行（executescript 会先提交当前事务）"""
+    for statement in script.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def full_import(conn: sqlite3.Connection, csv_path: str) -> dict:
+    _run_script(conn, SCHEMA)
+    conn.executemany('INSERT INTO tags VALUES (?, ?)', TAG_BITS.items())
+    insert_sql = f'INSERT INTO dictionary (id, {", ".join(DICT_COLUMNS)}) VALUES (?, {", ".join("?" * len(DICT_COLUMNS))})'
+    inserted = forms = 0
+    for batch in _batches(read_rows(csv_path)):
+        # 新表的 id 自己按顺序分配，词形变化表在同一遍里生成，不用再扫一遍
+        rows, word_forms = [], []
+        for row in batch:
+            inserted += 1
+            rows.append((inserted,) + row)
+            word_forms.extend((form, inserted) for form in inflections(row[10]))
+        conn.executemany(insert_sql, rows)
+        conn.executemany('INSERT OR IGNORE INTO word_forms (form, lemma_id) VALUES (?, ?)', word_forms)
+        forms += len(word_forms)
+        print(f"已导入 {inserted} 条词条...", end='\r')
+    print()
+    _run_script(conn, INDEXES)
+    return {"inserted": inserted, "updated": 0, "deleted": 0, "unchanged": 0, "forms": forms}
+
+
+def incremental_import(conn: sqlite3.Connection, csv_path: str) -> dict:
+    """在旧库的副本上按内容哈希 upsert：没变的词条一个字节都不写，id 保持不变（牌堆 / id 表仍然有效）"""
+    existing = {word: (word_id, h) for word_id, word, h in conn.execute('SELECT id, word, content_hash FROM dictionary')}
+    seen = set()
+    inserted = updated = 0
+    changed_ids = []
+    set_clause = ', '.join(f'{c}=?' for c in DICT_COLUMNS)
+    for batch in _batches(read_rows(csv_path)):
+        inserts, updates = [], []
+        for row in batch:
+            word, h = row[0], row[-1]
+            seen.add(word)
+            old = existing.get(word)
+            if old is None:
+                inserts.append(row)
+            elif old[1] != h:
+                updates.append(row + (old[0],))
+                changed_ids.append(old[0])
+        conn.executemany(INSERT_SQL, inserts)
+        conn.executemany(f'UPDATE dictionary SET {set_clause} WHERE id=?', updates)
+        inserted += len(inserts)
+        updated += len(updates)
+
+    deleted_ids = [word_id for word, (word_id, _) in existing.items() if word not in seen]
+    conn.executemany('DELETE FROM dictionary WHERE id=?', ((i,) for i in deleted_ids))
+
+    # 词形变化：只重建改过 / 删掉 / 新增的词条
+    conn.execute('CREATE TEMP TABLE touched (id INTEGER PRIMARY KEY)')
+    conn.executemany('INSERT OR IGNORE INTO touched VALUES (?)', ((i,) for i in changed_ids + deleted_ids))
+    if inserted:
+        conn.execute('INSERT OR IGNORE INTO touched SELECT id FROM dictionary ORDER BY id DESC LIMIT ?', (inserted,))
+    conn.execute('DELETE FROM word_forms WHERE lemma_id IN (SELECT id FROM touched)')
+    forms = [(form, word_id) for word_id, exchange in conn.execute(
+        "SELECT id, exchange FROM dictionary WHERE id IN (SELECT id FROM touched) AND exchange != ''")
+        for form in inflections(exchange)]
+    conn.executemany('INSERT OR IGNORE INTO word_forms (form, lemma_id) VALUES (?, ?)', forms)
+    conn.execute('DROP TABLE touched')
+    return {"inserted": inserted, "updated": updated, "deleted": len(deleted_ids),
+            "unchanged": len(seen) - inserted - updated, "forms": len(forms)}
+
+
+def supports_incremental(db_path: str) -> bool:
+    if not os.path.exists(db_path):
+        return False
+    conn = sqlite3.connect(f'file:{os.path.abspath(db_path)}?mode=ro', uri=True)
     try:
-        conn = create_database()
-        import_csv_to_db(conn)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info('dictionary')")}
+        return {'content_hash', 'tag_bits', 'level'} <= columns
+    except sqlite3.DatabaseError:
+        return False
+    finally:
         conn.close()
-        print(f"数据库制作成功：{DB_FILE}")
+
+
+def build(csv_path: str, db_path: str, incremental: bool = False) -> dict:
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    tmp = db_path + '.importing'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    if incremental and not supports_incremental(db_path):
+        print("现有词典库不是新格式（缺 content_hash 等列），改为全量导入")
+        incremental = False
+
+    start = time.perf_counter()
+    if incremental:
+        # 先用 backup API 拷一份旧库（机器人可能正以 immutable 方式读它，原文件不动）
+        src = sqlite3.connect(f'file:{os.path.abspath(db_path)}?mode=ro', uri=True)
+        conn = sqlite3.connect(tmp, isolation_level=None)
+        src.backup(conn)
+        src.close()
+    else:
+        conn = sqlite3.connect(tmp, isolation_level=None)
+    try:
+        conn.executescript(BULK_PRAGMAS)
+        conn.execute('BEGIN')
+        stats = incremental_import(conn, csv_path) if incremental else full_import(conn, csv_path)
+        conn.execute('COMMIT')
+        conn.execute('PRAGMA optimize')
+        if not incremental:
+            conn.execute('ANALYZE')
+    except BaseException:
+        conn.close()
+        os.remove(tmp)
+        raise
+    conn.close()
+
+    os.replace(tmp, db_path)
+    # 机器人按难度缓存的单词 id 表（word_game.db.ids）跟着旧库一起作废
+    if os.path.exists(db_path + '.ids'):
+        os.remove(db_path + '.ids')
+    # 进程内精确查词用的内存映射词典（word_game.dict），头部记着新库的大小和 mtime
+    stats["dict_bytes"] = build_word_dict(db_path)["file_bytes"]
+    elapsed = time.perf_counter() - start
+    rows = stats["inserted"] + stats["updated"] + stats["unchanged"]
+    stats.update(mode='incremental' if incremental else 'full', seconds=round(elapsed, 2),
+                 rows_per_s=round(rows / elapsed) if elapsed else 0)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ECDICT CSV 导入为单词游戏词典库')
+    parser.add_argument('--csv', default=CSV_FILE, help='ecdict.csv 路径')
+    parser.add_argument('--db', default=DB_FILE, help='输出的词典库路径')
+    parser.add_argument('--incremental', action='store_true', help='按内容哈希只更新有变化的词条')
+    args = parser.parse_args()
+    try:
+        stats = build(args.csv, args.db, args.incremental)
     except FileNotFoundError:
-        print(f"错误：找不到文件 {CSV_FILE}，请确保它和脚本在同一目录下。")
-    except Exception as e:
-        print(f"发生错误：{e}")
\ No newline at end of file
+        print(f"错误：找不到文件 {args.csv}")
+        sys.exit(1)
+    print(f"数据库制作成功：{args.db}（{stats['mode']}）\n"
+          f"新增 {stats['inserted']} / 更新 {stats['updated']} / 删除 {stats['deleted']} / 未变 {stats['unchanged']}，"
+          f"词形变化 {stats['forms']} 条，用时 {stats['seconds']}s（{stats['rows_per_s']} 行/秒），"
+          f"内存映射词典 {stats['dict_bytes'] // 1024}KB")
+
+
+if __name__ == '__main__':
+    main()
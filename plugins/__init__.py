@@ -1,5 +1,5 @@
 # 导入所有插件模块
-from plugins.sys import AlivePlugin, WalletPlugin, TTLCleanerPlugin
+from plugins.sys import AlivePlugin, WalletPlugin, TTLCleanerPlugin, SearchPlugin
 from plugins.interaction import InteractionPlugin, SignInPlugin
 from plugins.game import NumberBombPlugin
 
@@ -8,6 +8,7 @@ __all__ = [
     'SignInPlugin',
     'WalletPlugin',
     'TTLCleanerPlugin',
+    'SearchPlugin',
     'InteractionPlugin',
     'NumberBombPlugin'
 ]
\ No newline at end of file
@@ -1,13 +1,12 @@
 import asyncio
 import time
 import random
-import aiosqlite  # ✅ 修复1: 添加导入
-from typing import Dict, List, Optional
+from typing import Dict, Optional
 
 from ncatbot.plugin_system import NcatBotPlugin, command_registry
 from ncatbot.core.event import GroupMessageEvent, BaseMessageEvent
 from ncatbot.utils import get_log
-from plugins.sys.core import dao, DB_PATH  # ✅ 修复2: 导入DB_PATH（模块级变量）
+from plugins.sys.core import dao
 
 LOG = get_log("WarmGroupPlugin")
 
@@ -56,24 +55,13 @@ class WarmGroupPlugin(NcatBotPlugin):
     async def _restore_group_activity(self):
         """✅ 修复6: 从数据库恢复群聊活跃状态"""
         try:
-            # ✅ 修复2: 使用 DB_PATH（模块级变量）
-            async with aiosqlite.connect(DB_PATH) as conn:
-                cursor = await conn.execute(
-                    'SELECT DISTINCT group_id, MAX(timestamp) '
-                    'FROM group_messages '
-                    'WHERE timestamp > ? '
-                    'GROUP BY group_id',
-                    (time.time() - 7 * 24 * 3600,)  # 最近7天
-                )
-                rows = await cursor.fetchall()
-
-                for row in rows:
-                    group_id = row[0]
-                    last_time = float(row[1])
-                    self.group_last_active[group_id] = last_time
-                    LOG.info(f"恢复群 {group_id} 活跃记录")
-
-                LOG.info(f"共恢复 {len(rows)} 个群的活跃记录")
+            active = await dao.get_active_groups(hours=7 * 24)  # 最近7天
+
+            for group_id, last_time in active.items():
+                self.group_last_active[group_id] = last_time
+                LOG.info(f"恢复群 {group_id} 活跃记录")
+
+            LOG.info(f"共恢复 {len(active)} 个群的活跃记录")
         except Exception as e:
             LOG.warning(f"恢复群聊状态失败: {e}，将开始新的追踪")
 
@@ -240,8 +228,7 @@ class WarmGroupPlugin(NcatBotPlugin):
 
     async def _get_recent_message_count(self, group_id: str, hours: float) -> int:
         """获取指定时间段内的消息数量"""
-        messages = await dao.get_messages_by_time_range(group_id, hours)
-        return len(messages)
+        return await dao.count_messages(group_id, hours)
 
     async def _get_last_trigger(self, group_id: str) -> Optional[float]:
         """获取上次触发暖群的时间"""
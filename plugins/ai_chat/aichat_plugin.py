@@ -260,20 +260,23 @@ class AIChatPlugin(NcatBotPlugin):
     async def _generate_and_send_summary(self, group_id: str):
         """生成并发送群聊总结"""
         try:
-            # 获取消息
-            messages = await dao.get_messages_by_time_range(
-                group_id,
-                self._float_config("summary_time_range")
-            )
+            hours = self._float_config("summary_time_range")
 
-            # 检查消息数量
+            # 先用 COUNT 检查消息数量，不够就不必把消息读出来
             min_msgs = self._int_config("summary_min_messages")
-            if len(messages) < min_msgs:
-                LOG.info(f"群 {group_id} 消息数不足({len(messages)} < {min_msgs})，跳过总结")
+            count = await dao.count_messages(group_id, hours)
+            if count < min_msgs:
+                LOG.info(f"群 {group_id} 消息数不足({count} < {min_msgs})，跳过总结")
                 return
 
+            # 流式读取并直接格式化成行，不再为每条消息建 dict
+            message_lines = [
+                self._format_summary_line(nickname, message, timestamp)
+                async for nickname, message, timestamp in dao.iter_messages(group_id, hours)
+            ]
+
             # 构建 AI prompt
-            prompt = self._build_summary_prompt(messages)
+            prompt = self._build_summary_prompt(message_lines)
 
             # 调用 AI
             async with self._session_lock:
@@ -297,15 +300,15 @@ class AIChatPlugin(NcatBotPlugin):
         except Exception as e:
             LOG.error(f"群 {group_id} 总结失败: {e}")
 
-    def _build_summary_prompt(self, messages: List[dict]) -> str:
+    @staticmethod
+    def _format_summary_line(nickname: str, message: str, timestamp: float) -> str:
+        time_str = time.strftime('%H:%M', time.localtime(timestamp))
+        return f"[{time_str}] {nickname}: {message}"
+
+    def _build_summary_prompt(self, message_lines: List[str]) -> str:
         """构建总结 prompt"""
 
         # 格式化消息记录
-        message_lines = []
-        for msg in messages:
-            time_str = time.strftime('%H:%M', time.localtime(msg["timestamp"]))
-            message_lines.append(f"[{time_str}] {msg['nickname']}: {msg['message']}")
-
         message_text = "\n".join(message_lines)
 
         return f"""请分析以下群聊记录，生成一份群聊总结报告：
@@ -553,7 +556,8 @@ class AIChatPlugin(NcatBotPlugin):
     async def _get_user_history(self, user_id: str) -> List[Dict[str, str]]:
         """获取用户对话历史"""
         key = self.ai_core.get_user_history_key(user_id)
-        history_data = await dao.get_key(key)
+        # 历史是用 set_key_ttl 存的，要用 get_key_ttl 取回原始 JSON 字符串
+        history_data = await dao.get_key_ttl(key)
 
         if history_data:
             try:
@@ -108,7 +108,7 @@ class ChengyuJielongPlugin(BaseGamePlugin[ChengyuState]):
         return GameState[ChengyuState](prefix="chengyu", ttl=86400)
 
     async def on_load(self) -> None:
-        LOG.info(f"插件 {self.name} 加载成功")
+        await super().on_load()
         self.hid = self.register_handler("ncatbot.group_message_event", self.jielong)
 
     @command_registry.command("成语接龙")
@@ -122,6 +122,9 @@ class ChengyuJielongPlugin(BaseGamePlugin[ChengyuState]):
         if rounds < 5 or rounds > 50:
             return await event.reply("❌ 回合数必须在 5-50 之间！")
 
+        await self.in_group(event.group_id, self._start_jielong, event, rounds)
+
+    async def _start_jielong(self, event: GroupMessageEvent, rounds: int):
         gid = event.group_id
         exist = await self.game_load(gid)
         if exist:
@@ -170,6 +173,13 @@ class ChengyuJielongPlugin(BaseGamePlugin[ChengyuState]):
         if not isinstance(event.data, GroupMessageEvent):
             return
 
+        gid = event.data.group_id
+        if not self.game_active(gid):
+            return
+        # 同一个群的接龙排队处理，避免两人同时接上同一个成语都拿奖励
+        await self.in_group(gid, self._jielong, event)
+
+    async def _jielong(self, event: NcatBotEvent):
         gid = event.data.group_id
         user_id = event.data.user_id
         text = event.data.raw_message.strip()
@@ -244,12 +254,9 @@ class ChengyuJielongPlugin(BaseGamePlugin[ChengyuState]):
         state["player_stats"][user_id]["count"] += 1
         state["player_stats"][user_id]["total_coins"] += this_reward
 
-        # ✅ 修复：立即将奖励写入数据库
-        try:
-            await dao.add_exp_coin(user_id, exp=0, coin=this_reward)
-            LOG.info(f"✅ 玩家 {user_id} 获得 {this_reward} 金币奖励已发放到数据库")
-        except Exception as e:
-            LOG.error(f"❌ 发放金币失败: {e}")
+        # 奖励先记进累加器（有日志兜底），游戏结束或定时批量落库
+        dao.rewards.add(user_id, coin=this_reward)
+        LOG.info(f"✅ 玩家 {user_id} 获得 {this_reward} 金币奖励")
 
         await self.game_save(gid, state)
 
@@ -332,6 +339,7 @@ class ChengyuJielongPlugin(BaseGamePlugin[ChengyuState]):
                 rank_msg += f"{i}. {name} - {count} 次（💰{total_coins}金币）\n"
             await self.api.post_group_msg(gid, text=rank_msg)
 
+        await dao.rewards.flush()
         await self.api.post_group_msg(gid, text="🎉 游戏结束！奖励已发放到各位账户～")
         await self.game_clear(gid)
 
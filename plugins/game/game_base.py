@@ -1,9 +1,13 @@
 # plugins/sys/game_base.py
-import json
+import asyncio
+import time
+import zlib
 from abc import ABC, abstractmethod
-from typing import TypeVar, Generic, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple, TypeVar, Generic, Optional
 from ncatbot.plugin_system import NcatBotPlugin
-from plugins.sys.core import dao
+from plugins.sys.core import dao, CoreDAO
+from plugins.sys.actor import ActorExecutor, MailboxFull
+from plugins.game import state_codec
 from ncatbot.utils import get_log
 
 T = TypeVar("T")   # 游戏状态的数据模型
@@ -11,47 +15,308 @@ T = TypeVar("T")   # 游戏状态的数据模型
 LOG = get_log("GameBase")
 
 
+class ActiveGames:
+    """
+    全部游戏插件共用的“哪些群有进行中的游戏”登记表，元素是 (前缀, 群号)
+    - GameState.save 登记、clear / 过期注销；启动时用 scan_keys 按前缀从 KV 重建
+    - 群消息处理器先查这里，没游戏的群 O(1) 返回，不碰存储
+    """
+    def __init__(self):
+        self._active: Set[Tuple[str, str]] = set()
+
+    def add(self, prefix: str, gid: str) -> None:
+        self._active.add((prefix, gid))
+
+    def discard(self, prefix: str, gid: str) -> None:
+        self._active.discard((prefix, gid))
+
+    def is_active(self, prefix: str, gid: str) -> bool:
+        return (prefix, gid) in self._active
+
+    def groups(self, prefix: str) -> List[str]:
+        return [gid for p, gid in self._active if p == prefix]
+
+    async def rebuild(self, prefix: str) -> int:
+        """从 KV 重建某个前缀的登记，返回进行中的局数"""
+        head = f"{prefix}:"
+        for key in self._active.copy():
+            if key[0] == prefix:
+                self._active.discard(key)
+        for key in await dao.scan_keys(head):
+            gid = key[len(head):]
+            if ":" not in gid:          # 同前缀下的其它数据（如 wordgame:deck:...）不是会话
+                self._active.add((prefix, gid))
+        return len(self.groups(prefix))
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+
+active_games = ActiveGames()
+
+
+# 补丁里记下它基于哪份快照（快照编码的 crc32），快照重写后旧补丁自动作废，不用另外删
+_PATCH_BASE = "\x00base"
+
+
+class _Persisted:
+    """会话当前在 KV 里的样子：快照各字段的编码 + 补丁里的字段，用来算字段级增量"""
+    __slots__ = ("base", "base_crc", "patch", "players", "base_expire")
+
+    def __init__(self, base: Dict[str, bytes], base_crc: bytes, patch: Dict[str, bytes],
+                 players: state_codec.Players, base_expire: float):
+        self.base = base
+        self.base_crc = base_crc
+        self.patch = patch
+        self.players = players
+        self.base_expire = base_expire  # 快照在 KV 里的过期时间；0 表示不知道（从库里读出来的），下次写全量
+
+
 class GameState(ABC, Generic[T]):
-    """插件内用，仅封装 KV 读写"""
-    def __init__(self, prefix: str, ttl: int = 86400):
+    """
+    插件内用，封装游戏状态读写
+    - 内存里的会话对象是权威版本：load 返回同一个对象，猜一次只改内存
+    - save 只标脏，flush_delay 秒内的多次修改合并成一次快照写入 KV（进程崩溃最多丢这么久的进度）
+    - 只在启动后首次访问 / 内存里没有时才从 KV 读
+    - 远程状态后端（多个机器人进程共享）下不做内存缓存，每次直读直写
+    - restore() 之后以 active_games 为准：没登记的群 load 直接返回 None
+    - compact=True 时快照用紧凑二进制编码（state_codec），写回只写和快照相比变了的字段：
+      变化部分不超过整体的 patch_ratio 就写到 <prefix>:<gid>:patch，否则重写快照（旧补丁随之作废）；
+      补丁的 TTL 不超过快照的剩余寿命（补丁不会比快照活得久）；快照剩余不足 ttl/2 时改写全量快照续期
+    - 远程后端的帧是 JSON，传不了二进制，仍然用 JSON 快照
+    """
+    def __init__(self, prefix: str, ttl: int = 86400, flush_delay: float = 2.0,
+                 compact: bool = True, patch_ratio: float = 0.5):
         self.prefix = prefix        # 例如 "bomb"
         self.ttl   = ttl            # 默认 24h
+        self.flush_delay = flush_delay
+        self.write_behind = isinstance(dao, CoreDAO)
+        self._sessions: Dict[str, T] = {}
+        self._expire_at: Dict[str, float] = {}
+        self._dirty: set = set()
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+        self._restored = False
+        self.compact = compact and self.write_behind
+        self.patch_ratio = patch_ratio
+        self._persisted: Dict[str, _Persisted] = {}
+        # 写回统计
+        self.snapshots = 0
+        self.patches = 0
+        self.unchanged = 0
+        self.bytes_written = 0
 
     def _key(self, gid: str) -> str:
         return f"{self.prefix}:{gid}"
 
+    def _patch_key(self, gid: str) -> str:
+        return f"{self.prefix}:{gid}:patch"
+
+    async def restore(self) -> int:
+        """启动时从 KV 重建本前缀的进行中会话登记；远程后端下别的进程也会开局，不启用登记"""
+        if not self.write_behind:
+            return 0
+        count = await active_games.rebuild(self.prefix)
+        self._restored = True
+        return count
+
+    def maybe_active(self, gid: str) -> bool:
+        """O(1)、无 I/O：False 表示本群肯定没有进行中的游戏"""
+        return not self._restored or active_games.is_active(self.prefix, gid)
+
     async def load(self, gid: str) -> Optional[T]:
-        return await dao.get_key_ttl(self._key(gid))
+        if not self.write_behind:
+            return await dao.get_key_ttl(self._key(gid))
+        if not self.maybe_active(gid):
+            return None
+        data = self._sessions.get(gid)
+        if data is not None:
+            if self._expire_at[gid] >= time.time():
+                return data
+            self._drop(gid)
+        data = await self._read(gid)
+        if data is None:
+            active_games.discard(self.prefix, gid)
+        elif gid not in self._sessions:
+            self._sessions[gid] = data
+            self._expire_at[gid] = time.time() + self.ttl
+            active_games.add(self.prefix, gid)
+        return self._sessions.get(gid, data)
 
     async def save(self, gid: str, data: T) -> None:
-        await dao.set_key_ttl(self._key(gid), data, self.ttl)
+        if not self.write_behind:
+            await dao.set_key_ttl(self._key(gid), data, self.ttl)
+            return
+        self._sessions[gid] = data
+        self._expire_at[gid] = time.time() + self.ttl
+        active_games.add(self.prefix, gid)
+        self._dirty.add(gid)
+        if gid not in self._flush_tasks:
+            self._flush_tasks[gid] = asyncio.create_task(self._flush_later(gid))
 
     async def clear(self, gid: str) -> None:
+        self._drop(gid)
         await dao.del_key(self._key(gid))
+        if self.compact:
+            await dao.del_key(self._patch_key(gid))
+
+    def _drop(self, gid: str) -> None:
+        active_games.discard(self.prefix, gid)
+        self._sessions.pop(gid, None)
+        self._expire_at.pop(gid, None)
+        self._persisted.pop(gid, None)
+        self._dirty.discard(gid)
+        task = self._flush_tasks.pop(gid, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    # ---------- 写回 ----------
+    async def _flush_later(self, gid: str) -> None:
+        try:
+            await asyncio.sleep(self.flush_delay)
+            self._flush_tasks.pop(gid, None)
+            await self.flush(gid)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            LOG.error(f"[{self.prefix}] 群 {gid} 状态写回失败: {e}")
+
+    async def flush(self, gid: Optional[str] = None) -> int:
+        """把脏会话写成快照（gid=None 写全部），返回写入条数"""
+        targets = [gid] if gid is not None else list(self._dirty)
+        written = 0
+        for g in targets:
+            if g not in self._dirty or g not in self._sessions:
+                continue
+            self._dirty.discard(g)
+            ttl = max(1, int(self._expire_at[g] - time.time()))
+            await self._write(g, self._sessions[g], ttl)
+            written += 1
+        return written
+
+    # ---------- 编码 ----------
+    async def _read(self, gid: str) -> Optional[T]:
+        if not self.compact:
+            return await dao.get_key_ttl(self._key(gid))
+        raw = await dao.get_key(self._key(gid))
+        if raw is None:
+            return None
+        if isinstance(raw, str):            # 旧的 JSON 快照，下次写回时换成紧凑编码
+            return await dao.get_key_ttl(self._key(gid))
+        base = state_codec.unpack(raw)
+        base_crc = zlib.crc32(raw).to_bytes(4, "little")
+        fields = dict(base)
+        patch: Dict[str, bytes] = {}
+        raw_patch = await dao.get_key(self._patch_key(gid))
+        if isinstance(raw_patch, bytes):
+            patch = state_codec.unpack(raw_patch)
+            if patch.pop(_PATCH_BASE, None) != base_crc:
+                patch = {}                  # 基于更早快照的残留补丁
+            for name, value in patch.items():
+                if value:
+                    fields[name] = value
+                else:
+                    fields.pop(name, None)
+        data, players = state_codec.decode_fields(fields)
+        self._persisted[gid] = _Persisted(base, base_crc, patch, players, 0.0)
+        return data
+
+    async def _write(self, gid: str, data: T, ttl: int) -> None:
+        if not self.compact:
+            await dao.set_key_ttl(self._key(gid), data, ttl)
+            return
+        persisted = self._persisted.get(gid)
+        players = persisted.players if persisted is not None else state_codec.Players()
+        fields = state_codec.encode_fields(data, players)
+        now = time.time()
+        if persisted is not None and persisted.base_expire - now >= ttl / 2:
+            base = persisted.base
+            diff = {name: value for name, value in fields.items() if base.get(name) != value}
+            diff.update({name: b"" for name in base if name not in fields})
+            if diff == persisted.patch:
+                self.unchanged += 1
+                return
+            if sum(map(len, diff.values())) <= self.patch_ratio * sum(map(len, fields.values())):
+                blob = state_codec.pack({**diff, _PATCH_BASE: persisted.base_crc})
+                patch_ttl = min(ttl, int(persisted.base_expire - now))
+                await dao.set_key_raw_ttl(self._patch_key(gid), blob, patch_ttl)
+                persisted.patch = diff
+                self.patches += 1
+                self.bytes_written += len(blob)
+                return
+        blob = state_codec.pack(fields)
+        await dao.set_key_raw_ttl(self._key(gid), blob, ttl)
+        self._persisted[gid] = _Persisted(fields, zlib.crc32(blob).to_bytes(4, "little"), {}, players,
+                                          int(now) + ttl)
+        self.snapshots += 1
+        self.bytes_written += len(blob)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "dirty": len(self._dirty),
+            "snapshots": self.snapshots,
+            "patches": self.patches,
+            "unchanged": self.unchanged,
+            "bytes_written": self.bytes_written,
+        }
+
+    async def close(self) -> None:
+        """插件卸载：取消定时写回，剩下的脏会话立即落库"""
+        for task in self._flush_tasks.values():
+            task.cancel()
+        self._flush_tasks.clear()
+        await self.flush()
 
 
 class BaseGamePlugin(NcatBotPlugin, Generic[T]):
     """
     所有游戏的统一模板：
     1. 分群隔离
-    2. 自动持久化 + TTL
+    2. 自动持久化 + TTL（内存会话 + 合并写回，见 GameState）
     3. 提供 load/save/clear 工具
+    4. 同一个群的读-改-写经 in_group 串行执行（每群一个 actor），不同群互不等待
     """
     def __init__(self, **kwargs):
         # 先让父类把注入的参数全吃掉
         super().__init__(**kwargs)
         # 再初始化我们自己的属性
         self.state: GameState[T] = self.init_state()
+        # 刷屏时一个群最多积压 64 条待处理消息，再多的直接丢弃
+        self.actors = ActorExecutor(self.name, mailbox_size=64, overflow="drop")
 
     async def on_load(self) -> None:
+        await dao.acquire()
+        await self.restore_sessions()
         LOG.info(f"插件 {self.name} 加载成功")
 
+    async def restore_sessions(self) -> None:
+        count = await self.state.restore()
+        if count:
+            LOG.info(f"插件 {self.name} 恢复了 {count} 个群的进行中游戏")
+
+    async def on_close(self) -> None:
+        await self.actors.close()
+        await self.state.close()
+        await dao.rewards.flush()
+        await dao.release()             # 会话和奖励都落库后才放开 DAO
+
     @abstractmethod
     def init_state(self) -> GameState[T]:
         """子类返回一个 GameState 实例，指定前缀与 TTL"""
         raise NotImplementedError
 
+    async def in_group(self, gid: str, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        """在本群的 actor 里执行 fn(*args)：同群按到达顺序逐个处理；邮箱满时丢弃返回 None"""
+        try:
+            return await self.actors.submit(str(gid), fn, *args)
+        except MailboxFull as e:
+            LOG.warning(f"{e}，丢弃本条消息")
+            return None
+
     # 快捷方法
+    def game_active(self, gid: str) -> bool:
+        return self.state.maybe_active(gid)
+
     async def game_load(self, gid: str) -> Optional[T]:
         return await self.state.load(gid)
 
@@ -59,4 +324,4 @@ class BaseGamePlugin(NcatBotPlugin, Generic[T]):
         await self.state.save(gid, data)
 
     async def game_clear(self, gid: str) -> None:
-        await self.state.clear(gid)
\ No newline at end of file
+        await self.state.clear(gid)
@@ -23,16 +23,14 @@ class NumberBombPlugin(BaseGamePlugin[BombData]):
     def init_state(self) -> GameState[BombData]:
         return GameState[BombData](prefix="bomb", ttl=86400)   # 24h 自动过期
 
-    # 可选：启动时打印恢复了多少局
-    async def on_load(self) -> None:
-        LOG.info(f"插件 {self.name} 加载成功")
-
-
     # ---------------- 命令 ----------------
     @command_registry.command("数字炸弹")
     async def start_bomb(self, event: BaseMessageEvent):
         if not isinstance(event, GroupMessageEvent):
             return await event.reply("⚠️ 该游戏只能在群聊中玩哦～")
+        await self.in_group(event.group_id, self._start_bomb, event)
+
+    async def _start_bomb(self, event: GroupMessageEvent):
         gid = event.group_id
         exist = await self.game_load(gid)
         if exist:
@@ -47,9 +45,16 @@ class NumberBombPlugin(BaseGamePlugin[BombData]):
         if not isinstance(event, GroupMessageEvent):
             return
         gid = event.group_id
+        if not self.game_active(gid):
+            return   # 本群没游戏（不查库）
+        # 同一个群的猜测排队处理：两人同时猜中也只有一个人炸、只发一次奖
+        await self.in_group(gid, self._guess, event)
+
+    async def _guess(self, event: GroupMessageEvent):
+        gid = event.group_id
         data = await self.game_load(gid)
         if not data:
-            return   # 本群没游戏
+            return
 
         text = event.raw_message.strip()
         if not text.isdigit():
@@ -0,0 +1,269 @@
+"""
+游戏状态的紧凑二进制编码（代替 JSON 快照）
+- 按顶层字段分别编码：一次只改了几个字段时，GameState 只写这几个字段的补丁
+- 值用带类型标记的变长编码（msgpack 风格）：整数 zigzag varint、浮点 8 字节；
+  同类型列表省掉逐项标记：bool 列表按位打包（单词掩码），整数列表 / 字符串列表连续存放
+- 纯数字字符串（QQ 号）登记进会话级的玩家表，各字段里只存 1~2 字节的表下标；
+  玩家表只追加不改写，旧字段的编码一直有效，玩家表本身作为名为 "" 的字段一起存
+- 存储格式：'SGS' | 版本 | 字段数 varint | 每个字段：名字长度 + 名字 + 编码长度 + 编码
+  编码长度为 0 表示该字段已删除（只出现在补丁里）
+"""
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+MAGIC = b'SGS'
+VERSION = 1
+PLAYERS_FIELD = ""
+
+# 值类型标记
+T_NONE, T_FALSE, T_TRUE, T_INT, T_FLOAT, T_STR, T_ID, T_LIST, T_DICT, T_BITS, T_INTS, T_STRS = range(12)
+
+_FLOAT = struct.Struct('<d')
+
+
+def _is_id(s: str) -> bool:
+    # 只登记能按整数无损还原的数字串（不带前导 0，不超过 int64）
+    return 5 <= len(s) <= 18 and s.isdigit() and s.isascii() and s[0] != '0'
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) if n >= 0 else ((-n << 1) - 1)
+
+
+def _unzigzag(n: int) -> int:
+    return (n >> 1) if not n & 1 else -((n + 1) >> 1)
+
+
+def _varint(buf: bytearray, n: int) -> None:
+    if n < 0x80:
+        buf.append(n)
+        return
+    while n > 0x7f:
+        buf.append((n & 0x7f) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    b = data[pos]
+    if b < 0x80:
+        return b, pos + 1
+    result = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+class Players:
+    """会话级玩家表：QQ 号 <-> 下标"""
+    __slots__ = ("ids", "index")
+
+    def __init__(self, ids: Optional[List[str]] = None):
+        self.ids: List[str] = ids or []
+        self.index: Dict[str, int] = {qq: i for i, qq in enumerate(self.ids)}
+
+    def ref(self, qq: str) -> int:
+        i = self.index.get(qq)
+        if i is None:
+            i = self.index[qq] = len(self.ids)
+            self.ids.append(qq)
+        return i
+
+    def encode(self) -> bytes:
+        buf = bytearray()
+        _varint(buf, len(self.ids))
+        for qq in self.ids:
+            _varint(buf, int(qq))
+        return bytes(buf)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "Players":
+        count, pos = _read_varint(data, 0)
+        ids = []
+        for _ in range(count):
+            n, pos = _read_varint(data, pos)
+            ids.append(str(n))
+        return cls(ids)
+
+
+# ---------- 值编码 ----------
+def _encode(buf: bytearray, value: Any, players: Players) -> None:
+    if value is None:
+        buf.append(T_NONE)
+    elif value is True:
+        buf.append(T_TRUE)
+    elif value is False:
+        buf.append(T_FALSE)
+    elif isinstance(value, int):
+        buf.append(T_INT)
+        _varint(buf, _zigzag(value))
+    elif isinstance(value, float):
+        buf.append(T_FLOAT)
+        buf += _FLOAT.pack(value)
+    elif isinstance(value, str):
+        if _is_id(value):
+            buf.append(T_ID)
+            _varint(buf, players.ref(value))
+        else:
+            raw = value.encode('utf-8')
+            buf.append(T_STR)
+            _varint(buf, len(raw))
+            buf += raw
+    elif isinstance(value, (list, tuple)):
+        kinds = {type(v) for v in value}
+        if kinds == {bool}:
+            buf.append(T_BITS)             # 例如单词掩码 current_mask
+            _varint(buf, len(value))
+            bits = bytearray((len(value) + 7) // 8)
+            for i, v in enumerate(value):
+                if v:
+                    bits[i >> 3] |= 1 << (i & 7)
+            buf += bits
+        elif kinds == {int}:
+            buf.append(T_INTS)             # 例如 word_ids
+            _varint(buf, len(value))
+            for v in value:
+                _varint(buf, _zigzag(v))
+        elif kinds == {str} and not any(_is_id(v) for v in value):
+            buf.append(T_STRS)             # 例如 used_words
+            _varint(buf, len(value))
+            for v in value:
+                raw = v.encode('utf-8')
+                _varint(buf, len(raw))
+                buf += raw
+        else:
+            buf.append(T_LIST)
+            _varint(buf, len(value))
+            for v in value:
+                _encode(buf, v, players)
+    elif isinstance(value, dict):
+        buf.append(T_DICT)
+        _varint(buf, len(value))
+        for k, v in value.items():
+            _encode(buf, k, players)
+            _encode(buf, v, players)
+    else:
+        raise TypeError(f"无法编码的游戏状态类型: {type(value).__name__}")
+
+
+def _decode(data: bytes, pos: int, players: Players) -> Tuple[Any, int]:
+    tag = data[pos]
+    pos += 1
+    if tag == T_NONE:
+        return None, pos
+    if tag == T_TRUE:
+        return True, pos
+    if tag == T_FALSE:
+        return False, pos
+    if tag == T_INT:
+        n, pos = _read_varint(data, pos)
+        return _unzigzag(n), pos
+    if tag == T_FLOAT:
+        return _FLOAT.unpack_from(data, pos)[0], pos + 8
+    if tag == T_STR:
+        size, pos = _read_varint(data, pos)
+        return data[pos:pos + size].decode('utf-8'), pos + size
+    if tag == T_ID:
+        i, pos = _read_varint(data, pos)
+        return players.ids[i], pos
+    if tag == T_LIST:
+        count, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            v, pos = _decode(data, pos, players)
+            items.append(v)
+        return items, pos
+    if tag == T_DICT:
+        count, pos = _read_varint(data, pos)
+        result = {}
+        for _ in range(count):
+            k, pos = _decode(data, pos, players)
+            result[k], pos = _decode(data, pos, players)
+        return result, pos
+    if tag == T_BITS:
+        count, pos = _read_varint(data, pos)
+        end = pos + (count + 7) // 8
+        return [bool(data[pos + (i >> 3)] >> (i & 7) & 1) for i in range(count)], end
+    if tag == T_INTS:
+        count, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            n, pos = _read_varint(data, pos)
+            items.append(_unzigzag(n))
+        return items, pos
+    if tag == T_STRS:
+        count, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            size, pos = _read_varint(data, pos)
+            items.append(data[pos:pos + size].decode('utf-8'))
+            pos += size
+        return items, pos
+    raise ValueError(f"未知的类型标记 {tag}")
+
+
+def encode_fields(state: Dict[str, Any], players: Players) -> Dict[str, bytes]:
+    """把顶层字段分别编码；玩家表放在最后（编码字段时可能登记了新玩家）"""
+    fields = {}
+    for name, value in state.items():
+        buf = bytearray()
+        _encode(buf, value, players)
+        fields[name] = bytes(buf)
+    fields[PLAYERS_FIELD] = players.encode()
+    return fields
+
+
+def decode_fields(fields: Dict[str, bytes]) -> Tuple[Dict[str, Any], Players]:
+    players = Players.decode(fields[PLAYERS_FIELD]) if PLAYERS_FIELD in fields else Players()
+    state = {}
+    for name, data in fields.items():
+        if name != PLAYERS_FIELD:
+            state[name] = _decode(data, 0, players)[0]
+    return state, players
+
+
+# ---------- 打包 ----------
+def pack(fields: Dict[str, bytes]) -> bytes:
+    buf = bytearray(MAGIC)
+    buf.append(VERSION)
+    _varint(buf, len(fields))
+    for name, data in fields.items():
+        raw = name.encode('utf-8')
+        _varint(buf, len(raw))
+        buf += raw
+        _varint(buf, len(data))
+        buf += data
+    return bytes(buf)
+
+
+def unpack(blob: bytes) -> Dict[str, bytes]:
+    if blob[:3] != MAGIC:
+        raise ValueError("不是游戏状态编码")
+    if blob[3] != VERSION:
+        raise ValueError(f"不支持的游戏状态编码版本 {blob[3]}")
+    count, pos = _read_varint(blob, 4)
+    fields = {}
+    for _ in range(count):
+        size, pos = _read_varint(blob, pos)
+        name = blob[pos:pos + size].decode('utf-8')
+        pos += size
+        size, pos = _read_varint(blob, pos)
+        fields[name] = blob[pos:pos + size]
+        pos += size
+    return fields
+
+
+def encode_state(state: Dict[str, Any]) -> bytes:
+    return pack(encode_fields(state, Players()))
+
+
+def decode_state(blob: bytes) -> Dict[str, Any]:
+    return decode_fields(unpack(blob))[0]
+
+
+__all__ = ["Players", "encode_fields", "decode_fields", "pack", "unpack",
+           "encode_state", "decode_state", "PLAYERS_FIELD", "VERSION"]
@@ -0,0 +1,128 @@
+"""
+单词猜猜乐牌堆：每个群、每个难度一副洗好的牌，跨局不重复
+- 一副牌 = 该难度全部单词 id 的一个随机排列；只持久化 (种子, 游标, 指纹)，排列按种子在内存里重建
+- 开局一次抽出整局要用的词（draw），配合 WordGameDAO.get_words_by_ids 一条查询取齐
+- 剩余不足 low_water 张时后台预先洗好下一副，抽完直接接上
+- 内存里只留最近用过的 max_cached 副排列（一副 = 4 字节 × 该难度词数），其余按种子重建
+- 词典库换了（该难度的 id 表指纹变化）就重新洗牌
+"""
+import asyncio
+import json
+import random
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ncatbot.utils import get_log
+from plugins.sys.core import dao, wordgame_dao
+
+LOG = get_log("WordDeck")
+
+
+def _shuffle(ids: array, seed: int) -> array:
+    order = list(ids)
+    random.Random(seed).shuffle(order)
+    return array('i', order)
+
+
+class _Deck:
+    __slots__ = ("seed", "cursor", "fingerprint", "order")
+
+    def __init__(self, seed: int, cursor: int, fingerprint: int, order: array):
+        self.seed = seed
+        self.cursor = cursor
+        self.fingerprint = fingerprint
+        self.order = order
+
+    @property
+    def remaining(self) -> int:
+        return len(self.order) - self.cursor
+
+
+class DeckManager:
+    def __init__(self, prefix: str = "wordgame:deck", low_water: int = 50, max_cached: int = 32):
+        self.prefix = prefix
+        self.low_water = low_water
+        self.max_cached = max_cached
+        self._decks: "OrderedDict[Tuple[str, str], _Deck]" = OrderedDict()
+        self._next: Dict[Tuple[str, str], asyncio.Task] = {}       # 后台预洗的下一副
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+    def _key(self, gid: str, difficulty: str) -> str:
+        return f"{self.prefix}:{gid}:{difficulty}"
+
+    async def _ids(self, difficulty: str) -> Tuple[array, int]:
+        ids = await wordgame_dao.difficulty_ids(difficulty)
+        return ids, zlib.crc32(ids)
+
+    async def _new_deck(self, difficulty: str, ids: Optional[array] = None, fingerprint: int = 0) -> _Deck:
+        if ids is None:
+            ids, fingerprint = await self._ids(difficulty)
+        seed = random.getrandbits(63)
+        return _Deck(seed, 0, fingerprint, await asyncio.to_thread(_shuffle, ids, seed))
+
+    async def _load(self, gid: str, difficulty: str) -> _Deck:
+        ids, fingerprint = await self._ids(difficulty)
+        deck = self._decks.get((gid, difficulty))
+        if deck is not None and deck.fingerprint == fingerprint:
+            self._decks.move_to_end((gid, difficulty))
+            return deck
+        raw = await dao.get_key(self._key(gid, difficulty))
+        saved = json.loads(raw) if raw else None
+        if saved and saved.get("fingerprint") == fingerprint:
+            order = await asyncio.to_thread(_shuffle, ids, saved["seed"])
+            deck = _Deck(saved["seed"], saved["cursor"], fingerprint, order)
+        else:
+            if saved:
+                LOG.info(f"群 {gid} {difficulty} 词库已变化，重新洗牌")
+            deck = await self._new_deck(difficulty, ids, fingerprint)
+        self._decks[(gid, difficulty)] = deck
+        while len(self._decks) > self.max_cached:
+            self._decks.popitem(last=False)
+        return deck
+
+    async def _save(self, gid: str, difficulty: str, deck: _Deck) -> None:
+        await dao.set_key(self._key(gid, difficulty), json.dumps(
+            {"seed": deck.seed, "cursor": deck.cursor, "fingerprint": deck.fingerprint}))
+
+    async def draw(self, gid: str, difficulty: str, count: int) -> List[int]:
+        """抽 count 个互不相同的单词 id（词库不够时返回更少），游标立即落库"""
+        key = (gid, difficulty)
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            deck = await self._load(gid, difficulty)
+            fingerprint = deck.fingerprint
+            drawn: List[int] = []
+            seen = set()
+            passes = 0
+            while len(drawn) < count and passes < 2:
+                if deck.remaining == 0:
+                    # 一副抽完：接上后台洗好的下一副（指纹不对就当场重洗）
+                    task = self._next.pop(key, None)
+                    deck = await task if task is not None else await self._new_deck(difficulty)
+                    if deck.fingerprint != fingerprint:
+                        deck = await self._new_deck(difficulty)
+                    self._decks[key] = deck
+                    passes += 1
+                    if not deck.order:
+                        break
+                word_id = deck.order[deck.cursor]
+                deck.cursor += 1
+                if word_id not in seen:            # 换副时可能和上一副末尾撞上
+                    seen.add(word_id)
+                    drawn.append(word_id)
+            await self._save(gid, difficulty, deck)
+            if deck.remaining < self.low_water and key not in self._next:
+                self._next[key] = asyncio.create_task(self._new_deck(difficulty))
+            return drawn
+
+    def stats(self) -> Dict[str, int]:
+        return {f"{gid}:{difficulty}": deck.remaining for (gid, difficulty), deck in self._decks.items()}
+
+    async def close(self) -> None:
+        for task in self._next.values():
+            task.cancel()
+        self._next.clear()
+
+
+__all__ = ["DeckManager"]
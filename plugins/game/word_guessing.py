@@ -1,14 +1,16 @@
 import asyncio
 import random
 import time
-from typing import TypedDict, Dict, List, Optional
+from typing import TypedDict, Dict, List, Optional, Set, Tuple
 from ncatbot.core import BaseMessageEvent, GroupMessageEvent
 from ncatbot.plugin_system import NcatBotPlugin, NcatBotEvent, command_registry, param, option
 from ncatbot.utils import get_log, OFFICIAL_GROUP_MESSAGE_EVENT
 from plugins.game.game_base import BaseGamePlugin, GameState
 from plugins.game.combo_manager import ComboManager
+from plugins.game.word_deck import DeckManager
 from plugins.sys.core import dao, wordgame_dao
 from plugins.sys.core import User
+from plugins.sys.word_tags import inflections
 
 LOG = get_log("WordGuessing")
 
@@ -29,6 +31,7 @@ class WordGameState(TypedDict):
     difficulty: str
     strict_mode: bool
     player_names: Dict[str, str]
+    word_ids: List[int]  # 开局从本群牌堆一次抽好的整局单词
 
 
 class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
@@ -43,6 +46,11 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
         self.hint_cost = 20  # 金币花费
         self.combo_manager = ComboManager(base_reward=10, combo_multiplier=1.5, combo_multiplier2=9.0)
         self.active_timers: Dict[str, asyncio.Task] = {}  # group_id -> timer task
+        # group_id -> (当前单词, 单词及其全部变形)，普通模式判题只查这里
+        self.word_families: Dict[str, Tuple[str, Set[str]]] = {}
+        # 每群每难度一副牌，跨局不重复；group_id -> 本局预取好的单词
+        self.decks = DeckManager()
+        self.prefetched: Dict[str, List[dict]] = {}
 
     def init_state(self) -> GameState[WordGameState]:
         return GameState[WordGameState](prefix="wordgame", ttl=86400)
@@ -51,10 +59,19 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
 
 
     async def on_load(self) -> None:
-        LOG.info(f"插件 {self.name} 加载成功")
+        await wordgame_dao.init()
+        await super().on_load()
         # 注册事件处理器
         self.hid = self.register_handler(OFFICIAL_GROUP_MESSAGE_EVENT, self.handle_group_message)
 
+    async def on_close(self) -> None:
+        for task in self.active_timers.values():
+            task.cancel()
+        self.active_timers.clear()
+        await self.decks.close()
+        await super().on_close()           # 未写回的会话快照落库
+        await wordgame_dao.close()
+
     @command_registry.command("guess", description="开始单词猜谜游戏")
     @param(name="difficulty", default="normal", help="难度等级(easy/normal/hard/hell)")
     @option(short_name="s", long_name="strict", help="严格模式(必须完全拼写正确)")
@@ -64,13 +81,18 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
             return await event.reply("⚠️ 该游戏只能在群聊中玩哦～")
 
         gid = event.group_id
-        user_id = event.user_id
 
         # 验证难度
         valid_difficulties = ["easy", "normal", "hard", "hell"]
         if difficulty not in valid_difficulties:
             return await event.reply(f"❌ 无效难度！请选择: {', '.join(valid_difficulties)}")
 
+        await self.in_group(gid, self._start_game, event, difficulty, strict)
+
+    async def _start_game(self, event: GroupMessageEvent, difficulty: str, strict: bool):
+        gid = event.group_id
+        user_id = event.user_id
+
         # 检查是否有进行中的游戏
         existing_state = await self.game_load(gid)
         if existing_state:
@@ -81,6 +103,11 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
         if not user:
             user = User(qq=user_id, nick=event.sender.card or event.sender.nickname or user_id)
 
+        # 从本群牌堆一次抽出整局的单词，一条查询取齐
+        words = await wordgame_dao.get_words_by_ids(await self.decks.draw(gid, difficulty, self.max_rounds_default))
+        if not words:
+            return await event.reply("❌ 单词库不足，无法开始游戏")
+
         # 创建新游戏状态
         state = WordGameState(
             current_word="",
@@ -91,16 +118,18 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
             player_combo={},
             last_player=None,
             round_number=1,
-            max_rounds=self.max_rounds_default,
+            max_rounds=len(words),
             start_time=time.time(),
             hint_used=False,
             hints_revealed={"phonetic": False, "definition": False},
             difficulty=difficulty,
             strict_mode=strict,
-            player_names={user_id: event.sender.card or event.sender.nickname or user_id}
+            player_names={user_id: event.sender.card or event.sender.nickname or user_id},
+            word_ids=[w["id"] for w in words]
         )
 
         await self.game_save(gid, state)
+        self.prefetched[gid] = words
 
 
 
@@ -113,18 +142,17 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
             f"⚡ 连续答对有连击加成！"
         )
 
-        await asyncio.sleep(1)
-
-
         # 开始第一回合
-        await self.start_new_round(gid)
+        self._schedule_round(gid, 1)
 
     @command_registry.command("猜不到", aliases=["hint", "h"], description="花费金币获取提示")
     async def get_hint(self, event: BaseMessageEvent):
         """获取提示"""
         if not isinstance(event, GroupMessageEvent):
             return
+        await self.in_group(event.group_id, self._get_hint, event)
 
+    async def _get_hint(self, event: GroupMessageEvent):
         gid = event.group_id
         user_id = event.user_id
 
@@ -132,22 +160,22 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
         if not state:
             return await event.reply("❌ 本群没有进行中的游戏")
 
-        # 扣除金币
-        user = await dao.get_user(user_id)
-        if not user or user.coin < self.hint_cost:
-            return await event.reply(f"❌ 金币不足！需要 {self.hint_cost} 金币")
-
-        await dao.add_exp_coin(user_id, exp=0, coin=-self.hint_cost)
-
         # 显示一个随机字母
         word = state["current_word"]
         mask = state["current_mask"]
 
+        if not word:
+            return await event.reply("❌ 下一回合马上开始，请稍等")
+
         # 找一个未显示的位置
         hidden_positions = [i for i, revealed in enumerate(mask) if not revealed]
         if not hidden_positions:
             return await event.reply("❌ 所有字母都已显示！")
 
+        # 扣除金币（余额不足时不扣）
+        if await dao.spend_coin(user_id, self.hint_cost, reason="word_hint") is None:
+            return await event.reply(f"❌ 金币不足！需要 {self.hint_cost} 金币")
+
         # 随机显示一个位置
         pos = random.choice(hidden_positions)
         mask[pos] = True
@@ -168,6 +196,13 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
         if not isinstance(event.data, GroupMessageEvent):
             return
 
+        gid = event.data.group_id
+        if not self.game_active(gid):       # 没游戏的群不碰存储
+            return
+        # 同一个群的答案排队判：同时答对只算第一个
+        await self.in_group(gid, self._handle_answer, event)
+
+    async def _handle_answer(self, event: NcatBotEvent):
         gid = event.data.group_id
         user_id = event.data.user_id
         text = event.data.raw_message.strip().lower()
@@ -195,10 +230,8 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
             # 普通模式：支持模糊匹配
             is_correct = (text == state["current_word"].lower())
             if not is_correct and len(text) >= 3:
-                # 尝试模糊匹配（使用exchange字段）
-                fuzzy_word = await wordgame_dao.get_word_by_fuzzy_match(text)
-                if fuzzy_word and fuzzy_word["word"].lower() == state["current_word"].lower():
-                    is_correct = True
+                # 单词的变形也算对（went -> go）
+                is_correct = text in await self._word_family(gid, state["current_word"])
 
         if not is_correct:
             return
@@ -206,6 +239,15 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
         # 处理正确答案
         await self._handle_correct_answer(gid, user_id, state)
 
+    async def _word_family(self, gid: str, word: str) -> Set[str]:
+        """当前单词的变形集合；回合开始时已填好，重启后首次判题才查一次词典"""
+        cached = self.word_families.get(gid)
+        if cached and cached[0] == word:
+            return cached[1]
+        family = await wordgame_dao.get_word_family(word)
+        self.word_families[gid] = (word, family)
+        return family
+
     async def _handle_correct_answer(self, gid: str, user_id: str, state: WordGameState):
         """处理正确答案"""
         word = state["current_word"]
@@ -232,8 +274,8 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
         state["player_stats"][user_id]["total_coins"] += reward
         state["last_player"] = user_id
 
-        # 发放奖励
-        await dao.add_exp_coin(user_id, exp=5, coin=reward)
+        # 发放奖励（累加器攒批落库）
+        dao.rewards.add(user_id, exp=5, coin=reward)
 
         # 显示结果
         word_info = await wordgame_dao.get_word_by_exact_match(word)
@@ -251,15 +293,15 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
                  f"💰 获得 {reward} 金币 + 5 经验"
         )
 
-        # 进入下一回合或结束游戏
+        # 进入下一回合或结束游戏；清空当前单词，回合间隔里再答不算数
         state["round_number"] += 1
+        state["current_word"] = ""
         await self.game_save(gid, state)  # 保存状态
 
         if state["round_number"] > state["max_rounds"]:
             await self._end_game(gid, state)
         else:
-            await asyncio.sleep(2)
-            await self.start_new_round(gid)
+            self._schedule_round(gid, 2)
 
 
     async def start_new_round(self, gid: str):
@@ -274,31 +316,17 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
         if gid in self.active_timers:
             self.active_timers[gid].cancel()
         print(f"取消计时器 {gid}")
-        # 获取新单词
-        word_data = await wordgame_dao.get_random_word(state["difficulty"])
-        print(f"获取新单词 {word_data}")
+        # 取本回合的单词：开局已预取，重启后按 id 补查（旧版状态没有 word_ids 时随机抽）
+        word_data = await self._round_word(gid, state)
         if not word_data:
-            print(f"获取单词失败")
             await self.api.post_group_msg(gid, text="❌ 获取单词失败，游戏结束")
-            print(f"清理游戏状态 {gid}")
             await self.game_clear(gid)
-            print(f"清理完成")
             return
-        print(f"获取单词 {word_data}")
 
         word = word_data["word"]
 
-        # 防止重复单词
-        if word in state["used_words"]:
-            # 重试一次
-            word_data = await wordgame_dao.get_random_word(state["difficulty"])
-            if not word_data or word_data["word"] in state["used_words"]:
-                await self.api.post_group_msg(gid, text="❌ 单词库不足，游戏结束")
-                await self.game_clear(gid)
-                return
-            word = word_data["word"]
-
         state["current_word"] = word
+        self.word_families[gid] = (word, {word.lower()} | inflections(word_data["exchange"]))
         state["current_mask"] = [False] * len(word)
         state["revealed_positions"] = 0
         state["used_words"].append(word)
@@ -321,13 +349,33 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
         # 启动计时器
         self.active_timers[gid] = asyncio.create_task(self._round_timer(gid, word_data))
 
+    async def _round_word(self, gid: str, state: WordGameState) -> Optional[dict]:
+        index = state["round_number"] - 1
+        words = self.prefetched.get(gid)
+        word_ids = state.get("word_ids")
+        if not word_ids:
+            return await wordgame_dao.get_random_word(state["difficulty"])
+        if index >= len(word_ids):
+            return None
+        if not words or [w["id"] for w in words] != word_ids:
+            words = self.prefetched[gid] = await wordgame_dao.get_words_by_ids(word_ids)
+        return next((w for w in words if w["id"] == word_ids[index]), None)
+
     async def _round_timer(self, gid: str, word_data: dict):
-        """回合计时器"""
+        """回合计时器：在 actor 外计时，到点后的检查和修改排进本群 actor，和答题串行"""
         await asyncio.sleep(60)
+        if not await self.in_group(gid, self._timer_phonetic, gid, word_data):
+            return
+        await asyncio.sleep(20)
+        if not await self.in_group(gid, self._timer_definition, gid, word_data):
+            return
+        await asyncio.sleep(20)
+        await self.in_group(gid, self._timer_timeout, gid, word_data)
 
+    async def _timer_phonetic(self, gid: str, word_data: dict) -> bool:
         state = await self.game_load(gid)
         if not state or state["current_word"] != word_data["word"]:
-            return
+            return False
 
         # 显示音标提示
         if word_data["phonetic"] and not state["hints_revealed"]["phonetic"]:
@@ -337,12 +385,12 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
                 gid,
                 text=f"💡 时间提示 (60秒): 音标 [{word_data['phonetic']}]"
             )
+        return True
 
-        await asyncio.sleep(20)
-
+    async def _timer_definition(self, gid: str, word_data: dict) -> bool:
         state = await self.game_load(gid)
         if not state or state["current_word"] != word_data["word"]:
-            return
+            return False
 
         # 显示英文释义提示
         if word_data["definition"] and not state["hints_revealed"]["definition"]:
@@ -355,9 +403,9 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
                 gid,
                 text=f"💡 时间提示 (80秒): 英文释义: {definition}"
             )
+        return True
 
-        await asyncio.sleep(20)
-
+    async def _timer_timeout(self, gid: str, word_data: dict) -> None:
         state = await self.game_load(gid)
         if not state or state["current_word"] != word_data["word"]:
             return
@@ -369,6 +417,7 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
         )
 
         state["round_number"] += 1
+        state["current_word"] = ""
         await self.game_save(gid, state)
 
         # ⭐ 关键修复：在调用 start_new_round 之前，先移除自己的引用
@@ -379,9 +428,20 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
         if state["round_number"] > state["max_rounds"]:
             await self._end_game(gid, state)
         else:
-            await asyncio.sleep(3)
-            await self.start_new_round(gid)
-            print(f"开始新回合 {gid} 完成")
+            self._schedule_round(gid, 3)
+
+    def _schedule_round(self, gid: str, delay: float) -> None:
+        """隔 delay 秒开新回合：在 actor 外等，等的时候本群消息照常处理，到点再排回 actor"""
+        if gid in self.active_timers:
+            self.active_timers[gid].cancel()
+        self.active_timers[gid] = asyncio.create_task(self._delayed_round(gid, delay))
+
+    async def _delayed_round(self, gid: str, delay: float):
+        await asyncio.sleep(delay)
+        # start_new_round 会取消 active_timers 里的任务，先摘掉自己
+        if self.active_timers.get(gid) is asyncio.current_task():
+            del self.active_timers[gid]
+        await self.in_group(gid, self.start_new_round, gid)
 
     def _get_display_word(self, word: str, mask: List[bool]) -> str:
         """获取显示的单词掩码"""
@@ -409,6 +469,8 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
         if gid in self.active_timers:
             self.active_timers[gid].cancel()
             del self.active_timers[gid]
+        self.word_families.pop(gid, None)
+        self.prefetched.pop(gid, None)
 
         # 生成排行榜
         if state["player_stats"]:
@@ -425,6 +487,7 @@ class WordGuessingPlugin(BaseGamePlugin[WordGameState]):
 
             await self.api.post_group_msg(gid, text=rank_msg)
 
+        await dao.rewards.flush()
         await self.api.post_group_msg(gid, text="🎉 游戏结束！感谢大家的参与～")
 
         # 清理游戏状态
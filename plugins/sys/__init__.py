@@ -1,6 +1,7 @@
 from .alive import AlivePlugin
 from .ttl_cleaner import TTLCleanerPlugin
 from .wallet import WalletPlugin
+from .search import SearchPlugin
 from .core import dao
 
-__all__ = ['AlivePlugin',  'WalletPlugin', "TTLCleanerPlugin"]
\ No newline at end of file
+__all__ = ['AlivePlugin',  'WalletPlugin', "TTLCleanerPlugin", 'SearchPlugin']
\ No newline at end of file
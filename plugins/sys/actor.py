@@ -0,0 +1,180 @@
+"""
+按 key（一般是群号）串行执行的 actor 执行器
+- 每个 key 一个邮箱 + 一个后台任务：同一个群的事件按到达顺序一个个处理，不同群之间并发
+- 邮箱有界：满了 overflow="block" 让调用方等（背压），"drop" 直接丢弃并计数
+- 邮箱空闲 idle_timeout 秒后回收该 actor，群再多也只有活跃的群占任务
+- 在 actor 里再提交到同一个 key 时直接内联执行，不会自己等自己
+- 调用方取消（例如计时器被 cancel）时，还没开始的任务直接跳过
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from ncatbot.utils import get_log
+
+LOG = get_log("Actor")
+
+
+class MailboxFull(Exception):
+    """overflow="drop" 时邮箱已满"""
+
+
+class _Job:
+    __slots__ = ("fn", "args", "future", "enqueued_at")
+
+    def __init__(self, fn: Callable[..., Awaitable[Any]], args: tuple, future: asyncio.Future):
+        self.fn = fn
+        self.args = args
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class _Actor:
+    __slots__ = ("mailbox", "task", "processed")
+
+    def __init__(self, mailbox_size: int):
+        self.mailbox: asyncio.Queue = asyncio.Queue(maxsize=mailbox_size)
+        self.task: Optional[asyncio.Task] = None
+        self.processed = 0
+
+
+class ActorExecutor:
+    def __init__(self, name: str, mailbox_size: int = 64, idle_timeout: float = 300.0,
+                 overflow: str = "block"):
+        if overflow not in ("block", "drop"):
+            raise ValueError(f"未知的 overflow 策略: {overflow}")
+        self.name = name
+        self.mailbox_size = mailbox_size
+        self.idle_timeout = idle_timeout
+        self.overflow = overflow
+        self._actors: Dict[str, _Actor] = {}
+        self._closed = False
+
+        # 计数器
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.backpressure_waits = 0
+        self.spawned = 0
+        self.evicted = 0
+        self.peak_actors = 0
+        self.peak_depth = 0
+        self.max_wait_ms = 0.0
+        self._total_wait_ms = 0.0
+        self._total_run_ms = 0.0
+
+    # ---------- 提交 ----------
+    async def submit(self, key: str, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        """把 fn(*args) 放进 key 的邮箱，等它执行完并返回结果（异常原样抛给调用方）"""
+        actor = self._actors.get(key)
+        if actor is not None and actor.task is asyncio.current_task():
+            return await fn(*args)          # 已经在这个 actor 里：内联执行
+        if self._closed:
+            raise RuntimeError(f"执行器 {self.name} 已关闭")
+        if actor is None:
+            actor = self._spawn(key)
+        job = _Job(fn, args, asyncio.get_running_loop().create_future())
+        if actor.mailbox.full():
+            if self.overflow == "drop":
+                self.dropped += 1
+                raise MailboxFull(f"{self.name}:{key} 邮箱已满（{self.mailbox_size}）")
+            self.backpressure_waits += 1
+        await actor.mailbox.put(job)
+        self.submitted += 1
+        self.peak_depth = max(self.peak_depth, actor.mailbox.qsize())
+        return await job.future
+
+    def _spawn(self, key: str) -> _Actor:
+        actor = _Actor(self.mailbox_size)
+        actor.task = asyncio.create_task(self._run(key, actor))
+        self._actors[key] = actor
+        self.spawned += 1
+        self.peak_actors = max(self.peak_actors, len(self._actors))
+        return actor
+
+    # ---------- actor 主循环 ----------
+    async def _run(self, key: str, actor: _Actor) -> None:
+        mailbox = actor.mailbox
+        while True:
+            try:
+                job = await asyncio.wait_for(mailbox.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                if mailbox.empty():
+                    # 从判断为空到删除之间没有 await，不会漏掉新投递的任务
+                    if self._actors.get(key) is actor:
+                        del self._actors[key]
+                    self.evicted += 1
+                    return
+                continue
+            if job is None:                 # close() 的停止信号
+                return
+            if job.future.cancelled():
+                self.skipped += 1
+                continue
+            start = time.perf_counter()
+            wait_ms = (start - job.enqueued_at) * 1000
+            self._total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            try:
+                result = await job.fn(*job.args)
+            except asyncio.CancelledError:
+                # actor 任务本身被取消：让出位置，下次提交重新创建
+                if not job.future.done():
+                    job.future.cancel()
+                if self._actors.get(key) is actor:
+                    del self._actors[key]
+                raise
+            except Exception as e:
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+                else:
+                    LOG.error(f"[{self.name}:{key}] 任务出错: {e}")
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            self._total_run_ms += (time.perf_counter() - start) * 1000
+            self.processed += 1
+            actor.processed += 1
+
+    # ---------- 指标 ----------
+    def depth(self, key: str) -> int:
+        actor = self._actors.get(key)
+        return actor.mailbox.qsize() if actor else 0
+
+    def stats(self, top: int = 5) -> dict:
+        depths = sorted(((a.mailbox.qsize(), k) for k, a in self._actors.items()), reverse=True)
+        done = self.processed or 1
+        return {
+            "actors": len(self._actors),
+            "peak_actors": self.peak_actors,
+            "queued": sum(d for d, _ in depths),
+            "deepest": {k: d for d, k in depths[:top] if d},
+            "peak_depth": self.peak_depth,
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+            "backpressure_waits": self.backpressure_waits,
+            "spawned": self.spawned,
+            "evicted": self.evicted,
+            "avg_wait_ms": round(self._total_wait_ms / done, 3),
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "avg_run_ms": round(self._total_run_ms / done, 3),
+        }
+
+    # ---------- 生命周期 ----------
+    async def close(self) -> None:
+        """不再接收新任务，等各 actor 处理完已入队的任务后退出"""
+        self._closed = True
+        actors = list(self._actors.values())
+        for actor in actors:
+            await actor.mailbox.put(None)
+        await asyncio.gather(*(a.task for a in actors), return_exceptions=True)
+        self._actors.clear()
+
+
+__all__ = ["ActorExecutor", "MailboxFull"]
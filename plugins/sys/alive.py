@@ -1,11 +1,13 @@
 """
 最轻量“活着”插件
 - /hello  命令
+- /dbstats 存储层运行指标（管理员）
 - 群消息日志
 """
-from ncatbot.plugin_system import NcatBotPlugin, command_registry, filter_registry
+from ncatbot.plugin_system import NcatBotPlugin, command_registry, filter_registry, admin_filter
 from ncatbot.core.event import BaseMessageEvent, GroupMessageEvent   # 记得导入子类
 from ncatbot.utils import get_log
+from .core import dao, CoreDAO
 
 LOG = get_log('AlivePlugin')
 
@@ -25,6 +27,35 @@ class AlivePlugin(NcatBotPlugin):
     async def hello(self, event: BaseMessageEvent):
         await event.reply('你好，SoraBot 已上线 🎉')
 
+    @admin_filter
+    @command_registry.command('dbstats', description='查看存储层运行指标')
+    async def db_stats(self, event: BaseMessageEvent):
+        lines = ['📦 存储层指标']
+        if not isinstance(dao, CoreDAO):
+            lines.append(f"远程状态后端 {dao.host}:{dao.port} 请求 {dao.requests} 批次 {dao.batches}")
+            await event.reply('\n'.join(lines))
+            return
+        if dao.cache is not None:
+            c = dao.cache.stats()
+            lines.append(f"KV 缓存: {c['size']}/{c['max_entries']} 命中率 {c['hit_rate']:.1%} "
+                         f"(命中 {c['hits']} 负命中 {c['negative_hits']} 未命中 {c['misses']} 淘汰 {c['evictions']})")
+        z = dao.codec.stats()
+        if z['method'] != 'none':
+            lines.append(f"KV 压缩({z['method']}): {z['compressed']} 次 {z['raw_bytes'] // 1024}KB -> "
+                         f"{z['stored_bytes'] // 1024}KB 压缩比 {z['ratio']} 省 {z['saved_pages']} 页 "
+                         f"压缩 {z['avg_encode_ms']}ms 解压 {z['avg_decode_ms']}ms")
+        q = dao.ingest.stats()
+        lines.append(f"消息队列: 积压 {q['pending']} 已落盘 {q['flushed_rows']} 批次 {q['flushes']} "
+                     f"平均 {q['avg_flush_ms']}ms 最大 {q['max_flush_ms']}ms")
+        for name, maintenance in dao.maintenance.items():
+            m = maintenance.last_report
+            if m:
+                vac = m.get('vacuum', {})
+                lines.append(f"上次维护[{name}]: {m['duration_ms']}ms 回收 {vac.get('reclaimed_pages', 0)} 页 "
+                             f"空闲 {vac.get('free_pages', 0)} 页"
+                             + (f" 备份 {m['backup']['bytes'] // 1024}KB" if 'backup' in m else ''))
+        await event.reply('\n'.join(lines))
+
     # ------ 日志 ------
     @filter_registry.group_filter                    # 只让群聊事件进来
     async def log_group_msg(self, event: BaseMessageEvent):
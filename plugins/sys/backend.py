@@ -0,0 +1,102 @@
+"""
+状态存储后端接口
+- 插件只依赖这里列出的方法：通用 KV（含前缀扫描）、TTL KV、用户/钱包、群消息
+- SqliteBackend = CoreDAO（本机 SQLite 文件，默认）
+- RemoteBackend（remote_state.py）：多个机器人进程通过 socket 共享同一个状态服务
+"""
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from .core import CoinReservation, User
+
+
+class StateBackend(ABC):
+    # ---------- 生命周期 ----------
+    @abstractmethod
+    async def init(self) -> None: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+    # 多个插件共用一个后端：加载时 acquire，卸载时 release，最后一个 release 才真正 close，
+    # 谁先卸载都不会在别的插件落库之前把连接关掉
+    async def acquire(self) -> None:
+        self._holders = getattr(self, '_holders', 0) + 1
+        await self.init()
+
+    async def release(self) -> None:
+        self._holders = getattr(self, '_holders', 0) - 1
+        if self._holders <= 0:
+            self._holders = 0
+            await self.close()
+
+    # ---------- 通用 KV ----------
+    @abstractmethod
+    async def get_key(self, key: str) -> Optional[str]: ...
+
+    @abstractmethod
+    async def set_key(self, key: str, value: str) -> None: ...
+
+    @abstractmethod
+    async def del_key(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def scan_keys(self, prefix: str, limit: Optional[int] = None) -> List[str]: ...
+
+    # ---------- TTL KV ----------
+    @abstractmethod
+    async def get_key_ttl(self, key: str) -> Any: ...
+
+    @abstractmethod
+    async def set_key_ttl(self, key: str, value: Any, ttl_seconds: int) -> None: ...
+
+    @abstractmethod
+    async def ttl_cleanup(self) -> int: ...
+
+    # ---------- 用户 / 钱包 ----------
+    @abstractmethod
+    async def get_user(self, qq: str) -> Optional['User']: ...
+
+    @abstractmethod
+    async def add_exp_coin(self, qq: str, exp: int = 0, coin: int = 0) -> None: ...
+
+    @abstractmethod
+    async def spend_coin(self, qq: str, amount: int, reason: str = '') -> Optional[int]: ...
+
+    @abstractmethod
+    async def reserve_coin(self, qq: str, amount: int, reason: str = '') -> Optional['CoinReservation']: ...
+
+    @abstractmethod
+    async def commit_coin(self, reservation: 'CoinReservation') -> None: ...
+
+    @abstractmethod
+    async def refund_coin(self, reservation: 'CoinReservation') -> bool: ...
+
+    # ---------- 群消息 ----------
+    @abstractmethod
+    async def store_group_message(self, group_id: str, user_id: str, nickname: str, message: str) -> None: ...
+
+    @abstractmethod
+    async def get_messages_by_time_range(self, group_id: str, hours: float) -> List[dict]: ...
+
+    @abstractmethod
+    def iter_messages(self, group_id: str, hours: float,
+                      columns: Sequence[str] = ('nickname', 'message', 'timestamp'),
+                      until: Optional[float] = None, page_size: int = 500) -> AsyncIterator[tuple]: ...
+
+    @abstractmethod
+    async def count_messages(self, group_id: str, hours: float) -> int: ...
+
+    @abstractmethod
+    async def get_active_groups(self, hours: float) -> Dict[str, float]: ...
+
+    @abstractmethod
+    async def cleanup_old_messages(self, group_id: str, max_age_days: int = 7) -> None: ...
+
+    @abstractmethod
+    async def search_messages(self, keyword: str, group_id: Optional[str] = None,
+                              hours: Optional[float] = None, limit: int = 10) -> List[dict]: ...
+
+
+__all__ = ["StateBackend"]
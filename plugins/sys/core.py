@@ -1,13 +1,33 @@
 """
 SoraBot 内核
 - 创建 SQLite 单文件 & 表
-- 提供 DAO 单例
+- 提供 DAO 单例（长连接池，显式 init()/close()）
 """
+import asyncio
 import os
+import sqlite3
+from array import array
 from datetime import datetime
 from pydantic import BaseModel
-import json, time, aiosqlite
-from typing import Any, List, Tuple, Optional
+import json, time
+from typing import Any, AsyncIterator, Dict, List, Sequence, Set, Tuple, Optional
+
+from ncatbot.utils import get_log
+
+from .backend import StateBackend
+from .db import ConnectionPool
+from .ingest import MessageIngestQueue
+from .expiry import ExpiryHeap
+from .kv_cache import KVCache
+from .kv_codec import KVCodec
+from .rewards import RewardAccumulator
+from .maintenance import DBMaintenance
+from .db_split import DB_DOMAINS, domain_db_path
+from .word_sampler import WordSampler
+from .word_tags import all_of, any_tag, inflections, min_collins
+from .word_dict import WordDict, dict_path as word_dict_path, source_id
+
+LOG = get_log("CoreDAO")
 
 # 确保目录存在
 DB_DIR = os.path.join('config', 'db')
@@ -20,35 +40,132 @@ DB_PATH = os.path.join(DB_DIR, 'sorabot.db')
 DB_DIR_WORDGAME = os.path.join('config', 'db')
 WORDGAME_DB_PATH = os.path.join(DB_DIR, 'word_game.db')
 
+# 群消息存储方式：none = 单表 group_messages；day = 按天分表（保留期清理直接 DROP 整张表）
+MESSAGE_PARTITION = os.environ.get('SORABOT_MESSAGE_PARTITION', 'none')
+
+# 库文件布局：single = 全部在 sorabot.db；split = 按域拆成 sorabot.{messages,kv,economy}.db
+# 老库拆分见 plugins/sys/db_split.py
+DB_LAYOUT = os.environ.get('SORABOT_DB_LAYOUT', 'single')
+
+# 状态后端：sqlite = 本进程直接读写库文件；remote = 连到共享状态服务（多个机器人进程共享钱包/游戏状态）
+STATE_BACKEND = os.environ.get('SORABOT_STATE_BACKEND', 'sqlite')
+STATE_SERVER = os.environ.get('SORABOT_STATE_SERVER', '127.0.0.1:7420')
+
+# 大 KV 值（AI 对话历史等）透明压缩：none / zlib / zstd（需安装 zstandard）
+# 默认不压缩：压缩后写出的 BLOB 老版本读不了，确认不再回滚后再打开
+KV_COMPRESSION = os.environ.get('SORABOT_KV_COMPRESSION', 'none')
+
+# 全文检索的最短关键词：trigram 分词器要求至少 3 个字符，更短的退化为 LIKE
+FTS_MIN_QUERY = 3
+
+
+# 单词游戏难度 -> 词典筛选条件（WordSampler 按这些条件预先算好 id 表）
+# 新版词典库（data/csv2db.py 导入时生成 tag_bits / level）走覆盖索引
+WORD_DIFFICULTY = {
+    "easy": all_of(min_collins(3), any_tag('gk')),
+    "normal": all_of(min_collins(2), any_tag('cet4', 'cet6', 'ky')),
+    "hard": all_of(min_collins(1), any_tag('tem4', 'ielts', 'toefl')),
+    "hell": any_tag('tem8', 'gre', 'sat'),
+    "default": min_collins(2),
+}
+# 旧词典库没有 tag_bits 列时的等价条件
+WORD_DIFFICULTY_LEGACY = {
+    "easy": "collins >= 3 AND (tag LIKE '%gk%')",
+    "normal": "collins >= 2 AND (tag LIKE '%cet4%' OR tag LIKE '%cet6%' OR tag LIKE '%ky%')",
+    "hard": "collins >= 1 AND (tag LIKE '%tem4%' OR tag LIKE '%ielts%' OR tag LIKE '%toefl%')",
+    "hell": "(tag LIKE '%tem8%' OR tag LIKE '%gre%' OR tag LIKE '%sat%')",
+    "default": "collins >= 2",
+}
+
 
 class WordGameDAO:
-    """单词游戏数据库访问对象"""
-    _instance = None
+    """
+    单词游戏数据库访问对象（词典只读，以 immutable 方式打开）
+    data/csv2db.py 导入时整文件原子替换，不会原地修改；每回合抽词前检查一次文件，换了就重新打开
+    精确查词优先走内存映射词典 word_game.dict（word_dict.py），和当前词典库对不上时退回 SQLite
+    """
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    def __init__(self, db_path: str = WORDGAME_DB_PATH, readers: int = 2):
+        self.db_path = db_path
+        self.readers = readers
+        self.pool = ConnectionPool(db_path, readers=readers, readonly=True, immutable=True)
+        self.sampler = WordSampler(db_path, WORD_DIFFICULTY, self._fetch_ids)
+        self.has_word_forms = False            # 新版词典库有 word_forms（变形 -> 原形）表
+        self.word_dict: Optional[WordDict] = None
+        self._file_id: Optional[Tuple[int, int, int, int]] = None
+        self._reload_lock = asyncio.Lock()
 
-    async def get_random_word(self, difficulty: str) -> Optional[dict]:
-        """
-        根据难度获取随机单词
-        difficulty: easy/normal/hard/hell
-        """
-        # 难度映射到SQL查询条件
-        difficulty_map = {
-            "easy": "collins >= 3 AND (tag LIKE '%gk%')",
-            "normal": "collins >= 2 AND (tag LIKE '%cet4%' OR tag LIKE '%cet6%' OR tag LIKE '%ky%')",
-            "hard": "collins >= 1 AND (tag LIKE '%tem4%' OR tag LIKE '%ielts%' OR tag LIKE '%toefl%')",
-            "hell": "(tag LIKE '%tem8%' OR tag LIKE '%gre%' OR tag LIKE '%sat%')"
-        }
+    def _stat(self) -> Optional[Tuple[int, int, int, int]]:
+        """词典库的 inode / 大小 / mtime，加上 .dict 的 mtime（导入脚本先换库、后生成 .dict）"""
+        try:
+            st = os.stat(self.db_path)
+        except OSError:
+            return None
+        try:
+            dict_mtime = os.stat(word_dict_path(self.db_path)).st_mtime_ns
+        except OSError:
+            dict_mtime = 0
+        return st.st_ino, st.st_size, st.st_mtime_ns, dict_mtime
 
-        where_clause = difficulty_map.get(difficulty, "collins >= 2")
+    async def reload_if_changed(self) -> bool:
+        """词典文件被替换过就换一个新连接池（旧池等借出的连接归还后关闭），返回是否重新打开"""
+        current = self._stat()
+        if current is None or current == self._file_id:
+            return False
+        async with self._reload_lock:
+            if self._stat() == self._file_id:
+                return False
+            old = self.pool
+            self.pool = ConnectionPool(self.db_path, readers=self.readers, readonly=True, immutable=True)
+            self.sampler.invalidate()
+            await self.init()
+            await old.close()
+        LOG.info(f"词典库 {self.db_path} 已更新，重新打开")
+        return True
 
-        async with aiosqlite.connect(WORDGAME_DB_PATH) as conn:
-            cursor = await conn.execute(
-                f"SELECT * FROM dictionary WHERE {where_clause} ORDER BY RANDOM() LIMIT 1"
-            )
+    def _open_word_dict(self) -> None:
+        if self.word_dict is not None:
+            self.word_dict.close()
+            self.word_dict = None
+        path = word_dict_path(self.db_path)
+        try:
+            word_dict = WordDict(path)
+        except (OSError, ValueError):
+            return
+        if word_dict.source != source_id(self.db_path):
+            LOG.info(f"{path} 和当前词典库不匹配，精确查词走 SQLite；重新运行 data/csv2db.py 生成")
+            word_dict.close()
+            return
+        self.word_dict = word_dict
+
+    async def init(self) -> None:
+        self._file_id = self._stat()
+        await self.pool.init()
+        self._open_word_dict()
+        self.sampler.predicates = WORD_DIFFICULTY
+        async with self.pool.reader() as conn:
+            cursor = await conn.execute("SELECT name FROM pragma_table_info('dictionary')")
+            columns = {row[0] for row in await cursor.fetchall()}
+            cursor = await conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='word_forms'")
+            self.has_word_forms = await cursor.fetchone() is not None
+        if 'tag_bits' not in columns:
+            LOG.warning("词典库没有 tag_bits/level 列，难度筛选退化为 LIKE；请用 data/csv2db.py 重新导入")
+            self.sampler.predicates = WORD_DIFFICULTY_LEGACY
+
+    async def close(self) -> None:
+        await self.pool.close()
+        if self.word_dict is not None:
+            self.word_dict.close()
+            self.word_dict = None
+
+    async def _fetch_ids(self, where: str) -> List[int]:
+        async with self.pool.reader() as conn:
+            cursor = await conn.execute(f"SELECT id FROM dictionary WHERE {where} ORDER BY id")
+            return [row[0] for row in await cursor.fetchall()]
+
+    async def get_word_by_id(self, word_id: int) -> Optional[dict]:
+        async with self.pool.reader() as conn:
+            cursor = await conn.execute("SELECT * FROM dictionary WHERE id = ?", (word_id,))
             row = await cursor.fetchone()
 
             if row:
@@ -57,9 +174,46 @@ class WordGameDAO:
                 return dict(zip(columns, row))
             return None
 
+    async def difficulty_ids(self, difficulty: str) -> array:
+        """某个难度的全部单词 id（有序 array('i')），牌堆在这上面洗牌"""
+        await self.reload_if_changed()
+        if difficulty not in self.sampler.predicates:
+            difficulty = "default"
+        return await self.sampler.ids(difficulty)
+
+    async def get_random_word(self, difficulty: str) -> Optional[dict]:
+        """
+        根据难度获取随机单词
+        difficulty: easy/normal/hard/hell（其它值按 default）
+        随机下标取 id + 主键查询，id 表见 word_sampler.py
+        """
+        await self.reload_if_changed()
+        if difficulty not in self.sampler.predicates:
+            difficulty = "default"
+        word_id = await self.sampler.pick(difficulty)
+        if word_id is None:
+            return None
+        return await self.get_word_by_id(word_id)
+
+    async def get_words_by_ids(self, word_ids: Sequence[int]) -> List[dict]:
+        """一次查询取一批单词，按传入的 id 顺序返回（查不到的跳过）"""
+        if not word_ids:
+            return []
+        columns = ['id', 'word', 'phonetic', 'definition', 'translation',
+                   'pos', 'collins', 'oxford', 'tag', 'bnc', 'frq', 'exchange']
+        async with self.pool.reader() as conn:
+            cursor = await conn.execute(
+                f"SELECT {', '.join(columns)} FROM dictionary WHERE id IN ({', '.join('?' * len(word_ids))})",
+                tuple(word_ids)
+            )
+            rows = {row[0]: dict(zip(columns, row)) for row in await cursor.fetchall()}
+        return [rows[i] for i in word_ids if i in rows]
+
     async def get_word_by_exact_match(self, word: str) -> Optional[dict]:
         """精确匹配单词"""
-        async with aiosqlite.connect(WORDGAME_DB_PATH) as conn:
+        if self.word_dict is not None:
+            return self.word_dict.lookup(word)
+        async with self.pool.reader() as conn:
             cursor = await conn.execute(
                 "SELECT * FROM dictionary WHERE word = ? LIMIT 1",
                 (word,)
@@ -73,12 +227,18 @@ class WordGameDAO:
             return None
 
     async def get_word_by_fuzzy_match(self, word: str) -> Optional[dict]:
-        """模糊匹配（使用exchange字段）"""
-        async with aiosqlite.connect(WORDGAME_DB_PATH) as conn:
-            cursor = await conn.execute(
-                "SELECT * FROM dictionary WHERE exchange LIKE ? LIMIT 1",
-                (f"%{word}%",)
-            )
+        """按词形变化匹配原形（went -> go）；旧词典库没有 word_forms 表时退化为 exchange LIKE"""
+        async with self.pool.reader() as conn:
+            if self.has_word_forms:
+                cursor = await conn.execute(
+                    "SELECT d.* FROM word_forms f JOIN dictionary d ON d.id = f.lemma_id WHERE f.form = ? LIMIT 1",
+                    (word.lower(),)
+                )
+            else:
+                cursor = await conn.execute(
+                    "SELECT * FROM dictionary WHERE exchange LIKE ? LIMIT 1",
+                    (f"%{word}%",)
+                )
             row = await cursor.fetchone()
 
             if row:
@@ -87,8 +247,57 @@ class WordGameDAO:
                 return dict(zip(columns, row))
             return None
 
+    async def get_word_family(self, word: str) -> Set[str]:
+        """单词本身 + 全部变形（小写），游戏每回合缓存一份，判题不再查库"""
+        word_info = await self.get_word_by_exact_match(word)
+        family = {word.lower()}
+        if word_info:
+            family |= inflections(word_info["exchange"])
+        return family
+
+
+# 群消息单表 / 按天分表的表名（UTC 日期，表名字典序即时间序）
+MESSAGE_TABLE = 'group_messages'
+_PARTITION_PREFIX = 'group_messages_d'
+
+
+def _partition_name(ts: float) -> str:
+    return _PARTITION_PREFIX + time.strftime('%Y%m%d', time.gmtime(ts))
+
 
+# 分表名：group_messages_dYYYYMMDD（排除 _fts 之类的附属表）
+_PARTITION_GLOB = _PARTITION_PREFIX + '[0-9]' * 8
 
+# iter_messages 允许投影的列
+MESSAGE_COLUMNS = ('id', 'group_id', 'user_id', 'nickname', 'message', 'timestamp')
+
+
+def _table_order(table: str) -> Tuple[bool, str]:
+    """消息表的时间先后：旧版单表最早，分表按日期"""
+    return table != MESSAGE_TABLE, table
+
+
+def _is_missing_table(e: Exception) -> bool:
+    return 'no such table' in str(e)
+
+
+# 旧版 set_key_ttl 把过期时间包在 JSON 里：{"v": 值, "expire": 时间戳}
+_LEGACY_TTL_WHERE = "expire_at IS NULL AND store_value LIKE '{\"v\": %'"
+
+
+def _decode_legacy_ttl(raw: Any) -> Optional[Tuple[Any, int]]:
+    """识别旧格式 TTL 信封，返回 (值, 过期时间)；不是旧格式返回 None
+    只能用在 expire_at 为空的行上：新格式的值也可能恰好长成 {"v", "expire"}
+    """
+    if not isinstance(raw, str) or not raw.startswith('{"v": '):
+        return None
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    if isinstance(data, dict) and data.keys() == {"v", "expire"}:
+        return data["v"], int(data["expire"])
+    return None
 
 
 # ---------- 数据模型 ----------
@@ -100,34 +309,119 @@ class User(BaseModel):
     created_at: datetime = datetime.now()
 
 
+class CoinReservation(BaseModel):
+    """预扣的金币：先扣后调用付费接口，成功 commit、失败 refund"""
+    ledger_id: int
+    qq: str
+    amount: int
+    balance: int          # 预扣后的余额
+
+
+# 流水状态
+LEDGER_RESERVED = 0
+LEDGER_COMMITTED = 1
+LEDGER_REFUNDED = 2
+
+
 # ---------- DAO ----------
-class CoreDAO:
-    """单例 DAO：用户/群组 基础 CURD"""
-    _instance = None
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            # 异步初始化表（只跑一次）
-            import asyncio
-            asyncio.create_task(cls._instance._init_schema())
-        return cls._instance
-
-    async def _init_schema(self):
-        async with aiosqlite.connect(DB_PATH) as conn:
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    qq         TEXT PRIMARY KEY,
-                    nick       TEXT,
-                    exp        INTEGER DEFAULT 0,
-                    coin       INTEGER DEFAULT 0,
-                    created_at TEXT
-                );
-            ''')
+class CoreDAO(StateBackend):
+    """DAO：用户/群组 基础 CURD（本地 SQLite 后端），模块底部的 dao 是全局单例"""
+
+    def __init__(self, db_path: str = DB_PATH, readers: int = 3,
+                 ingest_batch_size: int = 200, ingest_flush_ms: int = 500, ingest_max_pending: int = 5000,
+                 kv_without_rowid: bool = False, kv_cache_size: int = 4096, reward_flush_interval: float = 5.0,
+                 message_partitioning: str = 'none', message_search: bool = True, layout: str = 'single',
+                 kv_compression: str = 'none', kv_compress_min: int = 1024):
+        if message_partitioning not in ('none', 'day'):
+            raise ValueError(f'未知的消息分表方式: {message_partitioning}')
+        if layout not in ('single', 'split'):
+            raise ValueError(f'未知的库文件布局: {layout}')
+        self.db_path = db_path
+        self.layout = layout
+        self.message_partitioning = message_partitioning
+        self._partitions: set = set()          # 已存在的按天分表
+        self._legacy_messages = False          # 分表模式下旧单表里是否还有数据
+        self.message_search = message_search
+        self.fts_enabled = False               # 运行时 SQLite 支持 FTS5 trigram 才开启
+        self._fts_tables: set = set()          # 已建好全文索引的消息表
+        self.kv_without_rowid = kv_without_rowid
+        # 每个业务域一个连接池；single 布局下三个域共用同一个池
+        if layout == 'single':
+            pool = ConnectionPool(db_path, readers=readers, on_init=self._init_schema)
+            self.pools: Dict[str, ConnectionPool] = {domain: pool for domain in DB_DOMAINS}
+        else:
+            paths = {domain: domain_db_path(db_path, domain) for domain in DB_DOMAINS}
+            self.pools = {
+                domain: ConnectionPool(
+                    paths[domain], readers=readers, on_init=getattr(self, f'_init_{domain}_schema'),
+                    # 读连接挂上其它域的库，跨域查询直接写不带前缀的表名即可
+                    attach={other: paths[other] for other in DB_DOMAINS if other != domain}
+                )
+                for domain in DB_DOMAINS
+            }
+        self.msg_pool = self.pools['messages']
+        self.kv_pool = self.pools['kv']
+        self.eco_pool = self.pools['economy']
+        # 在线维护（vacuum / optimize / checkpoint / 备份），由 TTLCleaner 调度；键为库文件名
+        self.maintenance: Dict[str, DBMaintenance] = {
+            os.path.splitext(os.path.basename(pool.path))[0]: DBMaintenance(pool)
+            for pool in self._distinct_pools()
+        }
+        # 群消息写入队列：攒批后一次事务落盘
+        self.ingest = MessageIngestQueue(self._insert_messages, batch_size=ingest_batch_size,
+                                         flush_interval_ms=ingest_flush_ms, max_pending=ingest_max_pending)
+        # 即将过期的 KV，TTLCleaner 据此决定睡多久
+        self.expiry = ExpiryHeap()
+        # KV 读穿透缓存，kv_cache_size=0 关闭
+        self.cache: Optional[KVCache] = KVCache(kv_cache_size) if kv_cache_size > 0 else None
+        # 超过 kv_compress_min 字节的值压缩后存 BLOB；缓存里存的始终是解压后的字符串
+        self.codec = KVCodec(kv_compression, min_size=kv_compress_min,
+                             zdict_dir=os.path.dirname(self.kv_pool.path) or '.')
+        self._migration_task: Optional[asyncio.Task] = None
+        # 游戏奖励累加器：内存攒增量 + 追加日志，定时批量落库
+        self.rewards = RewardAccumulator(self._apply_rewards, journal_prefix=f'{db_path}.rewards',
+                                         flush_interval=reward_flush_interval)
+
+    def _distinct_pools(self) -> List[ConnectionPool]:
+        pools: List[ConnectionPool] = []
+        for pool in self.pools.values():
+            if pool not in pools:
+                pools.append(pool)
+        return pools
 
-            # 在 CoreDAO._init_schema() 中添加：
-            # ✅ 修复：先创建群聊消息表（不含 INDEX 定义）
-            await conn.execute('''
+    async def init(self) -> None:
+        """打开连接池并建表（幂等），插件 on_load 时调用；未调用时首次访问也会兜底初始化"""
+        if (self.layout == 'split' and os.path.exists(self.db_path)
+                and not any(os.path.exists(pool.path) for pool in self._distinct_pools())):
+            LOG.warning(f"split 布局下没有找到拆分后的库，{self.db_path} 里的旧数据不会被读取；"
+                        f"请先停机执行 python plugins/sys/db_split.py --db {self.db_path}")
+        for pool in self._distinct_pools():
+            await pool.init()
+        self.ingest.start()
+        self.rewards.start()
+
+    async def close(self) -> None:
+        # 先把队列里的消息刷完再关连接
+        await self.ingest.stop()
+        await self.rewards.stop()
+        if self._migration_task and not self._migration_task.done():
+            self._migration_task.cancel()
+            try:
+                await self._migration_task
+            except asyncio.CancelledError:
+                pass
+        for pool in self._distinct_pools():
+            await pool.close()
+
+    async def _init_schema(self, conn):
+        """single 布局：所有域建在同一个库里"""
+        await self._init_economy_schema(conn)
+        await self._init_messages_schema(conn)
+        await self._init_kv_schema(conn)
+
+    async def _init_messages_schema(self, conn):
+        # ✅ 修复：先创建群聊消息表（不含 INDEX 定义）
+        await conn.execute('''
                         CREATE TABLE IF NOT EXISTS group_messages (
                             id         INTEGER PRIMARY KEY AUTOINCREMENT,
                             group_id   TEXT NOT NULL,
@@ -138,91 +432,292 @@ class CoreDAO:
                         );
                     ''')
 
-            # ✅ 修复：单独创建索引
-            await conn.execute('''
+        # ✅ 修复：单独创建索引
+        await conn.execute('''
                         CREATE INDEX IF NOT EXISTS idx_group_time 
                         ON group_messages(group_id, timestamp);
                     ''')
 
-            # 新增 kv 表（只跑一次）
-            await conn.execute('''
+        cur = await conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name GLOB ?",
+            (_PARTITION_GLOB,)
+        )
+        self._partitions = {row[0] for row in await cur.fetchall()}
+        if self.message_partitioning == 'day':
+            cur = await conn.execute(f'SELECT 1 FROM {MESSAGE_TABLE} LIMIT 1')
+            self._legacy_messages = await cur.fetchone() is not None
+
+        # 全文索引：每张消息表一张 FTS5 外部内容表（不重复存正文）
+        if self.message_search:
+            self.fts_enabled = await self._probe_fts(conn)
+            if self.fts_enabled:
+                for table in [MESSAGE_TABLE, *sorted(self._partitions)]:
+                    await self._ensure_fts(conn, table)
+
+        # 群活跃汇总：写入时增量维护，启动恢复/暖群判断不再 GROUP BY 全部历史
+        # 只记最后发言时间；条数随清理 / 整表 DROP 变化，需要时按时间窗现数（count_messages）
+        await conn.execute('''
+                CREATE TABLE IF NOT EXISTS group_activity(
+                    group_id       TEXT PRIMARY KEY,
+                    last_ts        REAL NOT NULL
+                )
+            ''')
+        cur = await conn.execute('PRAGMA table_info(group_activity)')
+        if 'message_count' in [row[1] for row in await cur.fetchall()] and sqlite3.sqlite_version_info >= (3, 35):
+            # 早期版本多一列只增不减的 message_count，删掉免得被误用（老 SQLite 不支持 DROP COLUMN，留着也不读）
+            await conn.execute('ALTER TABLE group_activity DROP COLUMN message_count')
+        cur = await conn.execute('SELECT 1 FROM group_activity LIMIT 1')
+        if await cur.fetchone() is None:
+            # 首次升级：从已有消息回填一次
+            rows = await self._query_tables(
+                conn, self._message_tables(0),
+                'SELECT group_id, MAX(timestamp) FROM {table} GROUP BY group_id', ()
+            )
+            await self._bump_activity(conn, rows)
+
+    async def _init_kv_schema(self, conn):
+        # 新增 kv 表（只跑一次）；expire_at 为空表示永不过期
+        layout = ' WITHOUT ROWID' if self.kv_without_rowid else ''
+        await conn.execute(f'''
                 CREATE TABLE IF NOT EXISTS kv(
                     store_key   TEXT PRIMARY KEY,
-                    store_value TEXT
+                    store_value TEXT,
+                    expire_at   INTEGER
+                ){layout};
+            ''')
+        await self._migrate_kv_schema(conn)
+        await conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_kv_expire
+                ON kv(expire_at) WHERE expire_at IS NOT NULL;
+            ''')
+
+        cur = await conn.execute(
+            'SELECT store_key, expire_at FROM kv WHERE expire_at IS NOT NULL '
+            'ORDER BY expire_at LIMIT ?', (self.expiry.max_entries + 1,)
+        )
+        self.expiry.seed(await cur.fetchall())
+
+        # 旧版 TTL 信封 {"v":..., "expire":...} 放到后台分批迁移，迁移完成前读路径兼容旧格式
+        cur = await conn.execute(f'SELECT 1 FROM kv WHERE {_LEGACY_TTL_WHERE} LIMIT 1')
+        if await cur.fetchone():
+            self._migration_task = asyncio.create_task(self._migrate_ttl_envelopes())
+
+    async def _init_economy_schema(self, conn):
+        await conn.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    qq         TEXT PRIMARY KEY,
+                    nick       TEXT,
+                    exp        INTEGER DEFAULT 0,
+                    coin       INTEGER DEFAULT 0,
+                    created_at TEXT
+                );
+            ''')
+
+        # 金币流水（只记消费）
+        await conn.execute('''
+                CREATE TABLE IF NOT EXISTS coin_ledger(
+                    id     INTEGER PRIMARY KEY,
+                    qq     TEXT NOT NULL,
+                    delta  INTEGER NOT NULL,
+                    state  INTEGER NOT NULL,
+                    reason TEXT,
+                    ts     INTEGER NOT NULL
+                );
+            ''')
+        await conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_ledger_reserved
+                ON coin_ledger(id) WHERE state = 0;
+            ''')
+        # 上次进程退出时还挂着的预扣一律退回
+        cur = await conn.execute('SELECT id, qq, delta FROM coin_ledger WHERE state = ?', (LEDGER_RESERVED,))
+        stale = await cur.fetchall()
+        if stale:
+            await conn.executemany('UPDATE users SET coin = coin - ? WHERE qq = ?',
+                                   [(delta, qq) for _, qq, delta in stale])
+            await conn.executemany('UPDATE coin_ledger SET state = ? WHERE id = ?',
+                                   [(LEDGER_REFUNDED, ledger_id) for ledger_id, _, _ in stale])
+
+        # 奖励累加器最后一次落库的批次号，重放日志时据此去重
+        await conn.execute('''
+                CREATE TABLE IF NOT EXISTS reward_flush(
+                    id  INTEGER PRIMARY KEY CHECK (id = 1),
+                    seq INTEGER NOT NULL
                 );
             ''')
-            await conn.commit()
+        cur = await conn.execute('SELECT seq FROM reward_flush WHERE id = 1')
+        row = await cur.fetchone()
+        if self.rewards.recover(row[0] if row else 0):
+            asyncio.create_task(self.rewards.flush())
+
+    async def _migrate_kv_schema(self, conn):
+        """老库的 kv 表补 expire_at 列；需要时重建为 WITHOUT ROWID"""
+        cur = await conn.execute('PRAGMA table_info(kv)')
+        columns = [row[1] for row in await cur.fetchall()]
+        if 'expire_at' not in columns:
+            await conn.execute('ALTER TABLE kv ADD COLUMN expire_at INTEGER')
+
+        if self.kv_without_rowid:
+            cur = await conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='kv'")
+            sql = (await cur.fetchone())[0]
+            if 'WITHOUT ROWID' not in sql.upper():
+                await conn.execute('''
+                    CREATE TABLE kv_new(
+                        store_key   TEXT PRIMARY KEY,
+                        store_value TEXT,
+                        expire_at   INTEGER
+                    ) WITHOUT ROWID;
+                ''')
+                await conn.execute('INSERT INTO kv_new SELECT store_key, store_value, expire_at FROM kv')
+                await conn.execute('DROP TABLE kv')
+                await conn.execute('ALTER TABLE kv_new RENAME TO kv')
+
+    async def _migrate_ttl_envelopes(self, batch: int = 200):
+        """把旧格式的 TTL 值拆成 store_value + expire_at，每批一个短事务，不阻塞其它写入"""
+        last_key = None
+        migrated = 0
+        while True:
+            async with self.kv_pool.writer() as conn:
+                cur = await conn.execute(
+                    f'SELECT store_key, store_value FROM kv WHERE {_LEGACY_TTL_WHERE} '
+                    'AND (? IS NULL OR store_key > ?) ORDER BY store_key LIMIT ?', (last_key, last_key, batch)
+                )
+                rows = await cur.fetchall()
+                updates = []
+                for key, raw in rows:
+                    legacy = _decode_legacy_ttl(raw)
+                    if legacy is not None:
+                        value, expire_at = legacy
+                        updates.append((json.dumps(value), expire_at, key))
+                if updates:
+                    await conn.executemany('UPDATE kv SET store_value=?, expire_at=? WHERE store_key=?', updates)
+            for _, expire_at, key in updates:
+                self.expiry.push(key, expire_at)
+                if self.cache is not None:
+                    self.cache.invalidate(key)
+            migrated += len(updates)
+            if len(rows) < batch:
+                break
+            last_key = rows[-1][0]
+            await asyncio.sleep(0)
+        return migrated
 
     # 查用户（None 表示未注册）
     async def get_user(self, qq: str) -> User | None:
-        async with aiosqlite.connect(DB_PATH) as conn:
+        async with self.eco_pool.reader() as conn:
             cur = await conn.execute('SELECT * FROM users WHERE qq=?', (qq,))
             row = await cur.fetchone()
-            if not row:
+        # 合并还没落库的游戏奖励，/账户 看到的余额保持准确
+        exp, coin = self.rewards.pending_for(qq)
+        if not row:
+            if not exp and not coin:
                 return None
-            return User(
-                qq=row[0],
-                nick=row[1] or '',
-                exp=row[2],
-                coin=row[3],
-                created_at=datetime.fromisoformat(row[4])
-            )
+            return User(qq=qq, exp=exp, coin=coin)
+        return User(
+            qq=row[0],
+            nick=row[1] or '',
+            exp=row[2] + exp,
+            coin=row[3] + coin,
+            created_at=datetime.fromisoformat(row[4])
+        )
 
     # ===== 通用 KV =====
     async def set_key(self, key: str, value: str) -> None:
-        async with aiosqlite.connect(DB_PATH) as conn:
-            await conn.execute('INSERT OR REPLACE INTO kv(store_key, store_value) VALUES(?,?)', (key, value))
-            await conn.commit()
+        await self._put(key, value, None)
+
+    async def get_key(self, key: str) -> str | bytes | None:
+        return (await self._get_entry(key))[0]
 
-    async def get_key(self, key: str) -> str | None:
-        async with aiosqlite.connect(DB_PATH) as conn:
-            cur = await conn.execute('SELECT store_value FROM kv WHERE store_key=?', (key,))
+    async def _get_entry(self, key: str) -> Tuple[str | bytes | None, Optional[int]]:
+        """返回 (值, expire_at)，不存在 / 已过期为 (None, None)"""
+        if self.cache is not None:
+            hit, value, expire_at = self.cache.lookup_entry(key)
+            if hit:
+                return value, expire_at
+            seq = self.cache.begin_fill()
+        async with self.kv_pool.reader() as conn:
+            cur = await conn.execute(
+                'SELECT store_value, expire_at FROM kv WHERE store_key=? AND (expire_at IS NULL OR expire_at >= ?)',
+                (key, int(time.time()))
+            )
             row = await cur.fetchone()
-            return row[0] if row else None
+        value, expire_at = (self.codec.decode(row[0]), row[1]) if row else (None, None)
+        if self.cache is not None:
+            self.cache.fill(key, value, expire_at, seq)
+        return value, expire_at
 
     async def del_key(self, key: str) -> None:
-        async with aiosqlite.connect(DB_PATH) as conn:
+        async with self.kv_pool.writer() as conn:
             await conn.execute('DELETE FROM kv WHERE store_key=?', (key,))
-            await conn.commit()
+        self.expiry.discard(key)
+        if self.cache is not None:
+            self.cache.store(key, None)
+
+    async def _put(self, key: str, value: str | bytes, expire_at: Optional[int]) -> None:
+        stored = self.codec.encode(value)      # 在写锁外压缩
+        async with self.kv_pool.writer() as conn:
+            await conn.execute(
+                'INSERT OR REPLACE INTO kv(store_key, store_value, expire_at) VALUES(?,?,?)',
+                (key, stored, expire_at)
+            )
+        if expire_at is None:
+            self.expiry.discard(key)
+        else:
+            self.expiry.push(key, expire_at)
+        if self.cache is not None:
+            self.cache.store(key, value, expire_at)
+
+    async def scan_keys(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """列出以 prefix 开头且未过期的键（主键上的范围扫描，不读值）"""
+        if not prefix:
+            raise ValueError('prefix 不能为空')
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        async with self.kv_pool.reader() as conn:
+            cur = await conn.execute(
+                'SELECT store_key FROM kv WHERE store_key >= ? AND store_key < ? '
+                'AND (expire_at IS NULL OR expire_at >= ?) ORDER BY store_key LIMIT ?',
+                (prefix, upper, int(time.time()), -1 if limit is None else limit)
+            )
+            return [row[0] for row in await cur.fetchall()]
 
     # ===== TTL 版 =====
     async def set_key_ttl(self, key: str, value: Any, ttl_seconds: int) -> None:
         expire_at = int(time.time()) + ttl_seconds
-        await self.set_key(key, json.dumps({"v": value, "expire": expire_at}))
+        await self._put(key, json.dumps(value), expire_at)
+
+    async def set_key_raw_ttl(self, key: str, value: str | bytes, ttl_seconds: int) -> None:
+        """不做 JSON 编码的 TTL 写入；bytes 原样存成 BLOB，get_key 读回来还是 bytes"""
+        await self._put(key, value, int(time.time()) + ttl_seconds)
 
     async def get_key_ttl(self, key: str) -> Any | None:
-        raw = await self.get_key(key)
+        raw, stored_expire = await self._get_entry(key)     # 过期判断已在 SQL 里完成
         if not raw:
             return None
-        data = json.loads(raw)
-        if data.get("expire", 0) < int(time.time()):
-            await self.del_key(key)          # 惰性删除
-            return None
-        return data["v"]
+        # 只有 expire_at 为空的行（迁移前写入）才可能是旧信封；新格式的值长成 {"v", "expire"} 也按原样返回
+        legacy = _decode_legacy_ttl(raw) if stored_expire is None else None
+        if legacy is not None:
+            value, expire_at = legacy
+            return None if expire_at < int(time.time()) else value
+        return json.loads(raw)
 
     # ===== 批量清理 =====
     async def ttl_cleanup(self) -> int:
-        """返回被删除的过期键数量"""
-        async with aiosqlite.connect(DB_PATH) as conn:
-            cur = await conn.execute('SELECT store_key, store_value FROM kv')
-            rows = await cur.fetchall()
-            to_del: List[str] = []
-            for k, v in rows:
-                try:
-                    if json.loads(v).get("expire", 0) < int(time.time()):
-                        to_del.append(k)
-                except Exception:
-                    continue
-            if to_del:
-                placeholders = ",".join("?" * len(to_del))
-                await conn.execute(f'DELETE FROM kv WHERE store_key IN ({placeholders})', to_del)
-                await conn.commit()
-            return len(to_del)
-
+        """返回被删除的过期键数量（走 idx_kv_expire 部分索引）"""
+        now = int(time.time())
+        async with self.kv_pool.writer() as conn:
+            cur = await conn.execute('DELETE FROM kv WHERE expire_at < ?', (now,))
+            deleted = cur.rowcount
+            self.expiry.pop_due(now)
+            if self.expiry.truncated or not len(self.expiry):
+                cur = await conn.execute(
+                    'SELECT store_key, expire_at FROM kv WHERE expire_at IS NOT NULL '
+                    'ORDER BY expire_at LIMIT ?', (self.expiry.max_entries + 1,)
+                )
+                self.expiry.seed(await cur.fetchall())
+        return deleted
 
     # 增加经验/金币（自动 INSERT OR IGNORE）
     async def add_exp_coin(self, qq: str, exp: int = 0, coin: int = 0):
-        async with aiosqlite.connect(DB_PATH) as conn:
+        async with self.eco_pool.writer() as conn:
             await conn.execute(
                 'INSERT OR IGNORE INTO users(qq, created_at) VALUES(?, ?)',
                 (qq, datetime.now().isoformat())
@@ -231,55 +726,421 @@ class CoreDAO:
                 'UPDATE users SET exp = exp + ?, coin = coin + ? WHERE qq = ?',
                 (exp, coin, qq)
             )
-            await conn.commit()
 
-    # 存储群聊消息
+    # ===== 钱包 =====
+    async def spend_coin(self, qq: str, amount: int, reason: str = '') -> Optional[int]:
+        """余额足够才扣，返回扣后余额；余额不足/未注册返回 None。一次事务完成"""
+        if self.rewards.has_pending(qq):
+            await self.rewards.flush()
+        async with self.eco_pool.writer() as conn:
+            balance = await self._debit(conn, qq, amount)
+            if balance is not None:
+                await conn.execute(
+                    'INSERT INTO coin_ledger(qq, delta, state, reason, ts) VALUES(?,?,?,?,?)',
+                    (qq, -amount, LEDGER_COMMITTED, reason, int(time.time()))
+                )
+            return balance
+
+    async def reserve_coin(self, qq: str, amount: int, reason: str = '') -> Optional[CoinReservation]:
+        """预扣金币，余额不足返回 None；之后必须 commit_coin 或 refund_coin"""
+        if self.rewards.has_pending(qq):
+            await self.rewards.flush()
+        async with self.eco_pool.writer() as conn:
+            balance = await self._debit(conn, qq, amount)
+            if balance is None:
+                return None
+            cur = await conn.execute(
+                'INSERT INTO coin_ledger(qq, delta, state, reason, ts) VALUES(?,?,?,?,?)',
+                (qq, -amount, LEDGER_RESERVED, reason, int(time.time()))
+            )
+            return CoinReservation(ledger_id=cur.lastrowid, qq=qq, amount=amount, balance=balance)
+
+    async def commit_coin(self, reservation: CoinReservation) -> None:
+        async with self.eco_pool.writer() as conn:
+            await conn.execute('UPDATE coin_ledger SET state = ? WHERE id = ? AND state = ?',
+                               (LEDGER_COMMITTED, reservation.ledger_id, LEDGER_RESERVED))
+
+    async def refund_coin(self, reservation: CoinReservation) -> bool:
+        """退回预扣；已确认/已退回的不会重复退"""
+        async with self.eco_pool.writer() as conn:
+            cur = await conn.execute('UPDATE coin_ledger SET state = ? WHERE id = ? AND state = ?',
+                                     (LEDGER_REFUNDED, reservation.ledger_id, LEDGER_RESERVED))
+            if cur.rowcount == 0:
+                return False
+            await conn.execute('UPDATE users SET coin = coin + ? WHERE qq = ?',
+                               (reservation.amount, reservation.qq))
+            return True
+
+    @staticmethod
+    async def _debit(conn, qq: str, amount: int) -> Optional[int]:
+        cur = await conn.execute(
+            'UPDATE users SET coin = coin - ? WHERE qq = ? AND coin >= ? RETURNING coin',
+            (amount, qq, amount)
+        )
+        rows = await cur.fetchall()
+        return rows[0][0] if rows else None
+
+    async def _apply_rewards(self, rows: List[Tuple[str, int, int]], seq: int) -> None:
+        """奖励累加器的落库回调：增量 upsert + 记录批次号，同一事务"""
+        now = datetime.now().isoformat()
+        async with self.eco_pool.writer() as conn:
+            await conn.executemany(
+                'INSERT INTO users(qq, created_at, exp, coin) VALUES(?, ?, ?, ?) '
+                'ON CONFLICT(qq) DO UPDATE SET exp = exp + excluded.exp, coin = coin + excluded.coin',
+                [(qq, now, exp, coin) for qq, exp, coin in rows]
+            )
+            await conn.execute(
+                'INSERT INTO reward_flush(id, seq) VALUES(1, ?) ON CONFLICT(id) DO UPDATE SET seq = excluded.seq',
+                (seq,)
+            )
+
+    # 存储群聊消息（进写入队列，批量落盘）
     async def store_group_message(self, group_id: str, user_id: str,
                                   nickname: str, message: str):
-        async with aiosqlite.connect(DB_PATH) as conn:
+        await self.ingest.put((group_id, user_id, nickname, message, time.time()))
+
+    async def _insert_messages(self, rows: List[tuple]) -> None:
+        if self.message_partitioning != 'day':
+            batches = {MESSAGE_TABLE: rows}
+        else:
+            batches: Dict[str, List[tuple]] = {}
+            for row in rows:
+                batches.setdefault(_partition_name(row[4]), []).append(row)
+        async with self.msg_pool.writer() as conn:
+            for table, batch in batches.items():
+                if table != MESSAGE_TABLE and table not in self._partitions:
+                    await self._create_partition(conn, table)
+                indexed = table in self._fts_tables
+                if indexed:
+                    cur = await conn.execute(f'SELECT IFNULL(MAX(id), 0) FROM {table}')
+                    (last_id,) = await cur.fetchone()
+                await conn.executemany(
+                    f'INSERT INTO {table} (group_id, user_id, nickname, message, timestamp) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    batch
+                )
+                if indexed:
+                    # 整批一条语句补全文索引，而不是每行一个触发器
+                    await conn.execute(
+                        f'INSERT INTO {table}_fts(rowid, message) SELECT id, message FROM {table} WHERE id > ?',
+                        (last_id,)
+                    )
+            activity: Dict[str, float] = {}
+            for row in rows:
+                activity[row[0]] = max(activity.get(row[0], 0.0), row[4])
+            await self._bump_activity(conn, list(activity.items()))
+
+    @staticmethod
+    async def _bump_activity(conn, rows: List[tuple]) -> None:
+        """rows = [(group_id, last_ts), ...]，和消息写入在同一事务"""
+        await conn.executemany(
+            'INSERT INTO group_activity(group_id, last_ts) VALUES(?, ?) '
+            'ON CONFLICT(group_id) DO UPDATE SET last_ts = MAX(last_ts, excluded.last_ts)',
+            rows
+        )
+
+    async def _create_partition(self, conn, table: str) -> None:
+        await conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                id         INTEGER PRIMARY KEY,
+                group_id   TEXT NOT NULL,
+                user_id    TEXT NOT NULL,
+                nickname   TEXT,
+                message    TEXT NOT NULL,
+                timestamp  REAL NOT NULL
+            )
+        ''')
+        await conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_group_time ON {table}(group_id, timestamp)')
+        if self.fts_enabled:
+            await self._ensure_fts(conn, table)
+        self._partitions.add(table)
+
+    # ---------- 全文索引 ----------
+    @staticmethod
+    async def _probe_fts(conn) -> bool:
+        try:
+            await conn.execute("CREATE VIRTUAL TABLE temp._fts_probe USING fts5(x, tokenize='trigram')")
+            await conn.execute('DROP TABLE temp._fts_probe')
+            return True
+        except Exception as e:
+            LOG.warning(f"SQLite 不支持 FTS5 trigram，聊天记录搜索退化为 LIKE: {e}")
+            return False
+
+    async def _ensure_fts(self, conn, table: str) -> None:
+        """建 {table}_fts（外部内容表）和删除同步触发器；新建时从现有数据重建索引"""
+        if table in self._fts_tables:
+            return
+        fts = f'{table}_fts'
+        cur = await conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,))
+        if await cur.fetchone() is None:
             await conn.execute(
-                'INSERT INTO group_messages (group_id, user_id, nickname, message, timestamp) '
-                'VALUES (?, ?, ?, ?, ?)',
-                (group_id, user_id, nickname, message, time.time())
+                f"CREATE VIRTUAL TABLE {fts} USING fts5("
+                f"message, content='{table}', content_rowid='id', tokenize='trigram')"
             )
-            await conn.commit()
+            await conn.execute(f"INSERT INTO {fts}({fts}) VALUES('rebuild')")
+        # 插入走批量 INSERT ... SELECT；删除（清理/保留期）靠触发器同步
+        await conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, message) VALUES('delete', old.id, old.message);
+            END
+        ''')
+        self._fts_tables.add(table)
+
+    def _message_tables(self, since: float, until: Optional[float] = None) -> List[str]:
+        """时间范围 [since, until] 涉及的消息表，按时间先后排列"""
+        if self.message_partitioning != 'day':
+            return [MESSAGE_TABLE]
+        lo = _partition_name(max(since, 0))
+        hi = _partition_name(time.time() if until is None else until)
+        tables = sorted(t for t in self._partitions if lo <= t <= hi)
+        if self._legacy_messages:
+            tables.insert(0, MESSAGE_TABLE)
+        return tables
+
+    async def _query_tables(self, conn, tables: List[str], sql: str, params: tuple) -> List[tuple]:
+        """对每张表执行同一条 SQL（{table} 占位）并拼接结果；查询期间被保留期任务删掉的分表直接跳过"""
+        rows: List[tuple] = []
+        for table in tables:
+            try:
+                cur = await conn.execute(sql.format(table=table), params)
+            except Exception as e:
+                if _is_missing_table(e):
+                    continue
+                raise
+            rows.extend(await cur.fetchall())
+        return rows
 
     # 按时间范围获取消息
     async def get_messages_by_time_range(self, group_id: str,
                                          hours: float) -> List[dict]:
-        """获取过去N小时的消息"""
-        async with aiosqlite.connect(DB_PATH) as conn:
-            cursor = await conn.execute(
-                'SELECT user_id, nickname, message, timestamp '
-                'FROM group_messages '
-                'WHERE group_id = ? AND timestamp > ? '
-                'ORDER BY timestamp ASC',
-                (group_id, time.time() - hours * 3600)
+        """获取过去N小时的消息（一次性取完；大范围请用 iter_messages）"""
+        columns = ('user_id', 'nickname', 'message', 'timestamp')
+        return [dict(zip(columns, row))
+                async for row in self.iter_messages(group_id, hours, columns=columns)]
+
+    async def iter_messages(self, group_id: str, hours: float,
+                            columns: Sequence[str] = ('nickname', 'message', 'timestamp'),
+                            until: Optional[float] = None,
+                            page_size: int = 500) -> AsyncIterator[tuple]:
+        """
+        按时间顺序流式读取过去N小时的消息，逐条产出 columns 对应的元组
+        - 按 (timestamp, id) 键集分页，每页单独借一次读连接，不会长时间占着连接
+        - 分表模式按时间顺序逐张表读
+        """
+        after = None
+        while True:
+            rows, after = await self.message_page(group_id, hours, columns, until, page_size, after)
+            for row in rows:
+                yield row
+            if after is None:
+                return
+
+    async def message_page(self, group_id: str, hours: float, columns: Sequence[str],
+                           until: Optional[float] = None, page_size: int = 500,
+                           after: Optional[list] = None) -> Tuple[List[tuple], Optional[list]]:
+        """
+        iter_messages 的一页，返回 (行, 下一页游标)，游标为 None 表示读完
+        - 游标 [since, 表名, timestamp, id]：起点在第一页定下，之后按游标续读，远程后端靠它逐页取
+        - 一页不够时接着读下一张分表；读到一半被保留期任务删掉的分表直接跳过
+        """
+        for col in columns:
+            if col not in MESSAGE_COLUMNS:
+                raise ValueError(f'未知的消息列: {col}')
+        if after is None:
+            await self.ingest.flush()
+            since = time.time() - hours * 3600
+        else:
+            since, cursor_table, cursor_ts, cursor_id = after
+        width = len(columns)
+        select = ', '.join(columns)
+        upper = '' if until is None else ' AND timestamp <= ?'
+        tail = () if until is None else (until,)
+
+        tables = self._message_tables(since, until)
+        if after is not None:
+            # 从游标所在的表接着读（排序同 _message_tables）
+            tables = [t for t in tables if _table_order(t) >= _table_order(cursor_table)]
+
+        page: List[tuple] = []
+        for table in tables:
+            if after is not None and table == cursor_table:
+                last_ts, last_id = cursor_ts, cursor_id
+            else:
+                last_ts, last_id = since, 0
+            sql = (f'SELECT {select}, timestamp, id FROM {table} '
+                   f'WHERE group_id = ? AND timestamp > ?{upper} AND (timestamp, id) > (?, ?) '
+                   'ORDER BY timestamp, id LIMIT ?')
+            async with self.msg_pool.reader() as conn:
+                try:
+                    cur = await conn.execute(sql, (group_id, since, *tail, last_ts, last_id, page_size - len(page)))
+                except Exception as e:
+                    if _is_missing_table(e):
+                        continue
+                    raise
+                rows = await cur.fetchall()
+            page.extend(row[:width] for row in rows)
+            if len(page) >= page_size:
+                return page, [since, table, rows[-1][width], rows[-1][width + 1]]
+        return page, None
+
+    # ---------- 全文搜索 ----------
+    async def search_messages(self, keyword: str, group_id: Optional[str] = None,
+                              hours: Optional[float] = None, limit: int = 10) -> List[dict]:
+        """
+        搜索聊天记录：空格分隔的多个词需同时命中
+        - 每个词都 >= 3 个字符时走 FTS5，按 bm25 相关度排序
+        - 否则退化为 LIKE，按时间倒序
+        """
+        terms = keyword.split()
+        if not terms:
+            return []
+        await self.ingest.flush()
+        since = 0 if hours is None else time.time() - hours * 3600
+        use_fts = self.fts_enabled and all(len(t) >= FTS_MIN_QUERY for t in terms)
+
+        where, params = [], []
+        if group_id is not None:
+            where.append('m.group_id = ?')
+            params.append(group_id)
+        if since:
+            where.append('m.timestamp > ?')
+            params.append(since)
+
+        if use_fts:
+            match = ' AND '.join('"' + t.replace('"', '""') + '"' for t in terms)
+            cond = ''.join(f' AND {w}' for w in where)
+            sql = ('SELECT m.group_id, m.user_id, m.nickname, m.message, m.timestamp, bm25({table}_fts) AS rank '
+                   'FROM {table}_fts JOIN {table} m ON m.id = {table}_fts.rowid '
+                   f'WHERE {{table}}_fts MATCH ?{cond} ORDER BY rank LIMIT ?')
+            params = [match, *params, limit]
+        else:
+            for t in terms:
+                where.append("m.message LIKE ? ESCAPE '\\'")
+                params.append('%' + t.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+            sql = ('SELECT m.group_id, m.user_id, m.nickname, m.message, m.timestamp, -m.timestamp AS rank '
+                   f'FROM {{table}} m WHERE {" AND ".join(where)} ORDER BY m.timestamp DESC LIMIT ?')
+            params.append(limit)
+
+        tables = self._message_tables(since)
+        if use_fts:
+            tables = [t for t in tables if t in self._fts_tables]
+        async with self.msg_pool.reader() as conn:
+            rows = await self._query_tables(conn, tables, sql, tuple(params))
+        rows.sort(key=lambda r: r[5])
+        return [{
+            "group_id": row[0],
+            "user_id": row[1],
+            "nickname": row[2],
+            "message": row[3],
+            "timestamp": row[4]
+        } for row in rows[:limit]]
+
+    # ---------- 聚合查询（只走 (group_id, timestamp) 索引，不把消息取回来） ----------
+    async def _sum_tables(self, sql: str, group_id: str, since: float) -> int:
+        await self.ingest.flush()
+        async with self.msg_pool.reader() as conn:
+            rows = await self._query_tables(conn, self._message_tables(since), sql, (group_id, since))
+        return sum(row[0] for row in rows)
+
+    async def count_messages(self, group_id: str, hours: float) -> int:
+        """过去N小时的消息条数"""
+        since = time.time() - hours * 3600
+        return await self._sum_tables(
+            'SELECT COUNT(*) FROM {table} WHERE group_id = ? AND timestamp > ?', group_id, since
+        )
+
+    async def count_speakers(self, group_id: str, hours: float) -> int:
+        """过去N小时发过言的人数"""
+        await self.ingest.flush()
+        since = time.time() - hours * 3600
+        async with self.msg_pool.reader() as conn:
+            rows = await self._query_tables(
+                conn, self._message_tables(since),
+                'SELECT DISTINCT user_id FROM {table} WHERE group_id = ? AND timestamp > ?',
+                (group_id, since)
             )
-            rows = await cursor.fetchall()
+        return len({row[0] for row in rows})
 
-            return [{
-                "user_id": row[0],
-                "nickname": row[1],
-                "message": row[2],
-                "timestamp": row[3]
-            } for row in rows]
+    async def hourly_counts(self, group_id: str, hours: float) -> List[Tuple[int, int]]:
+        """过去N小时按整点分桶的消息数 [(桶起始时间戳, 条数), ...]，没有消息的小时不返回"""
+        await self.ingest.flush()
+        since = time.time() - hours * 3600
+        async with self.msg_pool.reader() as conn:
+            rows = await self._query_tables(
+                conn, self._message_tables(since),
+                'SELECT CAST(timestamp / 3600 AS INTEGER) AS bucket, COUNT(*) FROM {table} '
+                'WHERE group_id = ? AND timestamp > ? GROUP BY bucket',
+                (group_id, since)
+            )
+        buckets: Dict[int, int] = {}
+        for bucket, n in rows:
+            buckets[bucket] = buckets.get(bucket, 0) + n
+        return [(bucket * 3600, buckets[bucket]) for bucket in sorted(buckets)]
 
-    # 清理过期消息（如7天前）
-    async def cleanup_old_messages(self, group_id: str, max_age_days: int = 7):
-        async with aiosqlite.connect(DB_PATH) as conn:
-            await conn.execute(
-                'DELETE FROM group_messages '
-                'WHERE group_id = ? AND timestamp < ?',
-                (group_id, time.time() - max_age_days * 86400)
+    async def last_active(self, group_id: str) -> Optional[float]:
+        """群最后一条消息的时间（汇总表，O(1)）"""
+        await self.ingest.flush()
+        async with self.msg_pool.reader() as conn:
+            cur = await conn.execute('SELECT last_ts FROM group_activity WHERE group_id = ?', (group_id,))
+            row = await cur.fetchone()
+        return row[0] if row else None
+
+    async def get_active_groups(self, hours: float) -> Dict[str, float]:
+        """过去N小时有消息的群 -> 最后一条消息时间（读汇总表）"""
+        await self.ingest.flush()
+        since = time.time() - hours * 3600
+        async with self.msg_pool.reader() as conn:
+            cur = await conn.execute(
+                'SELECT group_id, last_ts FROM group_activity WHERE last_ts > ?', (since,)
             )
-            await conn.commit()
+            rows = await cur.fetchall()
+        return {group_id: last_ts for group_id, last_ts in rows}
 
+    # 清理过期消息（如7天前）
+    async def cleanup_old_messages(self, group_id: str, max_age_days: int = 7):
+        await self.ingest.flush()
+        cutoff = time.time() - max_age_days * 86400
+        async with self.msg_pool.writer() as conn:
+            for table in self._message_tables(0, cutoff):
+                await conn.execute(
+                    f'DELETE FROM {table} '
+                    'WHERE group_id = ? AND timestamp < ?',
+                    (group_id, cutoff)
+                )
 
+    async def purge_messages(self, max_age_days: float) -> Dict[str, int]:
+        """全局保留期清理（所有群）：分表模式整表 DROP，只有跨界那天按行删"""
+        await self.ingest.flush()
+        cutoff = time.time() - max_age_days * 86400
+        dropped = deleted = 0
+        async with self.msg_pool.writer() as conn:
+            if self.message_partitioning == 'day':
+                cutoff_table = _partition_name(cutoff)
+                for table in sorted(self._partitions):
+                    if table < cutoff_table:
+                        await conn.execute(f'DROP TABLE IF EXISTS {table}_fts')
+                        await conn.execute(f'DROP TABLE IF EXISTS {table}')
+                        self._partitions.discard(table)
+                        self._fts_tables.discard(table)
+                        dropped += 1
+                    elif table == cutoff_table:
+                        cur = await conn.execute(f'DELETE FROM {table} WHERE timestamp < ?', (cutoff,))
+                        deleted += cur.rowcount
+            if self.message_partitioning != 'day' or self._legacy_messages:
+                cur = await conn.execute(f'DELETE FROM {MESSAGE_TABLE} WHERE timestamp < ?', (cutoff,))
+                deleted += cur.rowcount
+                if self._legacy_messages:
+                    cur = await conn.execute(f'SELECT 1 FROM {MESSAGE_TABLE} LIMIT 1')
+                    self._legacy_messages = await cur.fetchone() is not None
+        return {"dropped_partitions": dropped, "deleted_rows": deleted}
 
 
 # ---------- 单例 ----------
-dao = CoreDAO()
+if STATE_BACKEND == 'remote':
+    from .remote_state import RemoteBackend
+    dao: StateBackend = RemoteBackend.from_address(STATE_SERVER)
+else:
+    dao = CoreDAO(message_partitioning=MESSAGE_PARTITION, layout=DB_LAYOUT, kv_compression=KV_COMPRESSION)
 
 # 创建WordGameDAO单例
 wordgame_dao = WordGameDAO()
\ No newline at end of file
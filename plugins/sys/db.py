@@ -0,0 +1,161 @@
+"""
+SQLite 连接池
+- 一个长期持有的写连接 + 少量读连接（aiosqlite 每个连接一个工作线程，只建一次）
+- WAL / synchronous=NORMAL / mmap / cache_size，新库 auto_vacuum=INCREMENTAL
+- 显式 init()/close() 生命周期；close() 之后再借连接直接报错，不会悄悄重开（重开须显式 init）
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import aiosqlite
+
+# 读写连接共用的 PRAGMA
+MMAP_SIZE = 256 * 1024 * 1024       # 256MB 映射，读多的表走页缓存
+CACHE_SIZE_KIB = 16 * 1024          # 每个连接 16MB page cache
+BUSY_TIMEOUT_MS = 5000
+
+
+class ConnectionPool:
+    """
+    一个写连接 + N 个读连接
+    - writer(): 独占写连接，退出时提交，异常时回滚
+    - reader(): 从读连接池借一个连接，用完归还
+    - readonly=True 时不开写连接，读连接以 mode=ro 打开；immutable=True 额外声明文件不会被修改
+    - on_init(conn) 在写连接打开后执行一次（建表/迁移），随后提交
+    - attach={别名: 路径} 会 ATTACH 到每个读连接上，用于跨库只读查询
+    """
+
+    def __init__(self, path: str, readers: int = 3, readonly: bool = False, immutable: bool = False,
+                 on_init: Optional[Callable[[aiosqlite.Connection], Awaitable[None]]] = None,
+                 attach: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.attach = dict(attach or {})
+        self.readers = max(1, readers)
+        self.readonly = readonly
+        self.immutable = immutable
+        self.on_init = on_init
+
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._init_lock = asyncio.Lock()
+        self._idle: Optional[asyncio.Queue] = None
+        self._all_readers: List[aiosqlite.Connection] = []
+        self._ready = False
+        self._closed = False
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    # ---------- 生命周期 ----------
+    async def init(self) -> None:
+        """打开全部连接（幂等）"""
+        if self._ready:
+            return
+        async with self._init_lock:
+            if self._ready:
+                return
+            self._closed = False
+            if not self.readonly:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._writer = await aiosqlite.connect(self.path)
+                await self._setup_writer(self._writer)
+                if self.on_init is not None:
+                    await self.on_init(self._writer)
+                    await self._writer.commit()
+
+            self._idle = asyncio.Queue()
+            for _ in range(self.readers):
+                conn = await self._open_reader()
+                self._all_readers.append(conn)
+                self._idle.put_nowait(conn)
+            self._ready = True
+
+    async def close(self) -> None:
+        """关闭全部连接；写连接会等待进行中的事务结束"""
+        async with self._init_lock:
+            if not self._ready:
+                return
+            self._ready = False
+            self._closed = True
+            # 等借出去的读连接都归还后再关
+            for _ in range(len(self._all_readers)):
+                conn = await self._idle.get()
+                await conn.close()
+            self._all_readers.clear()
+            self._idle = None
+            if self._writer is not None:
+                async with self._write_lock:
+                    await self._writer.close()
+                self._writer = None
+
+    async def _setup_writer(self, conn: aiosqlite.Connection) -> None:
+        # 新库用增量 vacuum，删掉的数据可以分片归还给文件系统（必须在建第一张表之前设置）
+        cur = await conn.execute('SELECT count(*) FROM sqlite_master')
+        if (await cur.fetchone())[0] == 0:
+            await conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        # journal_mode 是持久化到文件的，只需写连接设置一次
+        await conn.execute('PRAGMA journal_mode=WAL')
+        await conn.execute('PRAGMA synchronous=NORMAL')
+        await conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        await conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+        await conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KIB}')
+        await conn.execute('PRAGMA temp_store=MEMORY')
+        await conn.execute('PRAGMA foreign_keys=ON')
+
+    async def _open_reader(self) -> aiosqlite.Connection:
+        if self.readonly:
+            uri = f'file:{os.path.abspath(self.path)}?mode=ro'
+            if self.immutable:
+                uri += '&immutable=1'
+            conn = await aiosqlite.connect(uri, uri=True)
+        else:
+            conn = await aiosqlite.connect(self.path)
+            for alias, path in self.attach.items():
+                await conn.execute(f'ATTACH DATABASE ? AS {alias}', (path,))
+            await conn.execute('PRAGMA query_only=ON')
+        await conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        await conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+        await conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KIB}')
+        await conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    async def _lazy_init(self) -> None:
+        if self._closed:
+            raise RuntimeError(f'{self.path} 的连接池已关闭')
+        await self.init()
+
+    # ---------- 借用连接 ----------
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """借一个读连接；从没初始化过时自动 init（兜底，正常应在插件加载时显式 init）"""
+        if not self._ready:
+            await self._lazy_init()
+        idle = self._idle
+        conn = await idle.get()
+        try:
+            yield conn
+        finally:
+            idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """独占写连接，块内语句在同一事务里：正常退出提交，异常回滚"""
+        if self.readonly:
+            raise RuntimeError(f'{self.path} 以只读方式打开，不能写入')
+        if not self._ready:
+            await self._lazy_init()
+        async with self._write_lock:
+            conn = self._writer
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+
+
+__all__ = ['ConnectionPool']
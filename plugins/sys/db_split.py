@@ -0,0 +1,118 @@
+"""
+按业务域拆库
+- messages：群消息（含按天分表、活跃汇总）
+- kv：通用 KV / 游戏状态 / AI 历史
+- economy：用户、金币流水、奖励批次号
+拆分后每个域一个库文件、一个写连接，消息写入不再和钱包提交抢同一把写锁。
+
+迁移工具（只依赖标准库，机器人停机时执行；原库保持不动）：
+    python plugins/sys/db_split.py [--db config/db/sorabot.db] [--force]
+全文索引（*_fts）和触发器不拷贝，CoreDAO 启动时会自动重建。
+"""
+import argparse
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+DB_DOMAINS = ('messages', 'kv', 'economy')
+
+# 表名 -> 所属域（按天分表用正则匹配）
+_DOMAIN_TABLES = {
+    'group_messages': 'messages',
+    'group_activity': 'messages',
+    'kv': 'kv',
+    'users': 'economy',
+    'coin_ledger': 'economy',
+    'reward_flush': 'economy',
+}
+_PARTITION_RE = re.compile(r'^group_messages_d\d{8}$')
+
+
+def domain_db_path(db_path: str, domain: str) -> str:
+    """config/db/sorabot.db -> config/db/sorabot.messages.db"""
+    base, ext = os.path.splitext(db_path)
+    return f'{base}.{domain}{ext or ".db"}'
+
+
+def table_domain(name: str) -> Optional[str]:
+    if name in _DOMAIN_TABLES:
+        return _DOMAIN_TABLES[name]
+    if _PARTITION_RE.match(name):
+        return 'messages'
+    return None
+
+
+def split_database(db_path: str, force: bool = False) -> Dict[str, int]:
+    """把单库拆成三个域库，返回 {域: 拷贝行数}"""
+    targets = {d: domain_db_path(db_path, d) for d in DB_DOMAINS}
+    existing = [p for p in targets.values() if os.path.exists(p)]
+    if existing and not force:
+        raise FileExistsError(f'目标库已存在: {", ".join(existing)}（确认覆盖请加 --force）')
+
+    src = sqlite3.connect(f'file:{os.path.abspath(db_path)}?mode=ro', uri=True)
+    try:
+        tables = src.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type='table' AND sql IS NOT NULL "
+            "AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL TABLE%'"
+        ).fetchall()
+        indexes = src.execute(
+            "SELECT tbl_name, sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL"
+        ).fetchall()
+    finally:
+        src.close()
+
+    plan: Dict[str, List[tuple]] = {d: [] for d in DB_DOMAINS}
+    for name, sql in tables:
+        domain = table_domain(name)
+        if domain is None:
+            if name.endswith(('_fts_data', '_fts_idx', '_fts_docsize', '_fts_config')):
+                continue        # FTS5 影子表
+            print(f'跳过未知表: {name}')
+            continue
+        plan[domain].append((name, sql))
+
+    copied: Dict[str, int] = {}
+    for domain, items in plan.items():
+        target = targets[domain]
+        tmp = f'{target}.tmp'
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        dst = sqlite3.connect(tmp)
+        try:
+            dst.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            dst.execute('ATTACH DATABASE ? AS src', (db_path,))
+            rows = 0
+            names = {name for name, _ in items}
+            for name, sql in items:
+                dst.execute(sql)
+                rows += dst.execute(f'INSERT INTO main.{name} SELECT * FROM src.{name}').rowcount
+            for tbl_name, sql in indexes:
+                if tbl_name in names:
+                    dst.execute(sql)
+            dst.commit()
+            dst.execute('DETACH DATABASE src')
+            dst.execute('PRAGMA journal_mode=WAL')
+        finally:
+            dst.close()
+        os.replace(tmp, target)
+        copied[domain] = rows
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把 sorabot.db 按业务域拆成多个库文件')
+    parser.add_argument('--db', default=os.path.join('config', 'db', 'sorabot.db'), help='原库路径')
+    parser.add_argument('--force', action='store_true', help='覆盖已存在的目标库')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    copied = split_database(args.db, force=args.force)
+    for domain, rows in copied.items():
+        print(f'{domain:<10} {rows:>8} 行 -> {domain_db_path(args.db, domain)}')
+    print(f'完成，用时 {time.perf_counter() - start:.2f}s；设置 SORABOT_DB_LAYOUT=split 后重启机器人')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+KV 过期时间最小堆
+- 记录即将过期的 (expire_at, key)，让 TTLCleaner 睡到下一次真实过期，而不是固定轮询
+- 同一个 key 被重复设置时旧条目惰性作废，堆过大时自动压缩
+"""
+import asyncio
+import heapq
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class ExpiryHeap:
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._heap: List[Tuple[int, str]] = []
+        self._deadline: Dict[str, int] = {}     # key -> 当前有效的 expire_at
+        self._changed = asyncio.Event()
+        self.truncated = False                  # 是否有 key 因容量上限没进堆（需要回库补种）
+
+    def __len__(self) -> int:
+        return len(self._deadline)
+
+    def seed(self, items: Iterable[Tuple[str, int]]) -> None:
+        """用库里现有的 (key, expire_at) 重建堆"""
+        self._heap.clear()
+        self._deadline.clear()
+        self.truncated = False
+        for key, expire_at in items:
+            if len(self._deadline) >= self.max_entries:
+                self.truncated = True
+                break
+            self._deadline[key] = expire_at
+            self._heap.append((expire_at, key))
+        heapq.heapify(self._heap)
+        self._changed.set()
+
+    def push(self, key: str, expire_at: int) -> None:
+        if key not in self._deadline and len(self._deadline) >= self.max_entries:
+            # 堆满就不记了，下次清理后回库按 expire_at 补种；最差退化成 max_sleep 轮询
+            self.truncated = True
+            return
+        earlier = self.next_deadline()
+        self._deadline[key] = expire_at
+        heapq.heappush(self._heap, (expire_at, key))
+        if len(self._heap) > 2 * max(len(self._deadline), 64):
+            self._compact()
+        if earlier is None or expire_at < earlier:
+            self._changed.set()      # 出现更早的过期时间，唤醒等待者重新计时
+
+    def discard(self, key: str) -> None:
+        self._deadline.pop(key, None)
+
+    def next_deadline(self) -> Optional[int]:
+        if not self._deadline:
+            return None
+        return self._peek_valid()
+
+    def pop_due(self, now: Optional[int] = None) -> List[str]:
+        """弹出所有已过期的 key（expire_at < now）"""
+        now = int(time.time()) if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] < now:
+            expire_at, key = heapq.heappop(self._heap)
+            if self._deadline.get(key) == expire_at:
+                del self._deadline[key]
+                due.append(key)
+        return due
+
+    async def wait(self, max_sleep: float) -> None:
+        """睡到下一个 key 过期（最多 max_sleep 秒），期间有更早的过期时间加入会提前醒来重新计时"""
+        loop = asyncio.get_running_loop()
+        end = loop.time() + max_sleep
+        while True:
+            self._changed.clear()
+            deadline = self.next_deadline()
+            timeout = end - loop.time()
+            if deadline is not None:
+                # expire_at < now 才算过期，所以要等到 expire_at + 1
+                timeout = min(timeout, deadline + 1 - time.time())
+            if timeout <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return
+
+    def _peek_valid(self) -> int:
+        while self._heap:
+            expire_at, key = self._heap[0]
+            if self._deadline.get(key) == expire_at:
+                return expire_at
+            heapq.heappop(self._heap)
+        return 0
+
+    def _compact(self) -> None:
+        self._heap = [(v, k) for k, v in self._deadline.items()]
+        heapq.heapify(self._heap)
+
+
+__all__ = ["ExpiryHeap"]
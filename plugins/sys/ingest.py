@@ -0,0 +1,183 @@
+"""
+群消息写入队列（group commit / write-behind）
+- 消息先进有界内存队列，后台任务攒批后一次 executemany + 一次提交
+- 满 batch_size 条或等够 flush_interval_ms 毫秒，先到先刷
+- 队列满时 put() 阻塞调用方（背压），stop() 保证把剩余消息刷完
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+from ncatbot.utils import get_log
+
+LOG = get_log("MessageIngest")
+
+Row = Sequence
+FlushFn = Callable[[List[Row]], Awaitable[None]]
+
+
+class _Marker:
+    """插进队列的控制信号：flush() / stop() 等待它被处理"""
+    __slots__ = ('future', 'stop')
+
+    def __init__(self, future: asyncio.Future, stop: bool = False):
+        self.future = future
+        self.stop = stop
+
+
+class MessageIngestQueue:
+    def __init__(self, flush_fn: FlushFn, batch_size: int = 200,
+                 flush_interval_ms: int = 500, max_pending: int = 5000, max_retries: int = 3):
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # 计数器
+        self.enqueued = 0
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+        self.flushes = 0
+        self.backpressure_waits = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    @property
+    def pending(self) -> int:
+        """已入队但还没落盘（含正在刷的一批）的行数"""
+        return self.enqueued - self.flushed_rows - self.dropped_rows
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "pending": self.pending,
+            "enqueued": self.enqueued,
+            "flushed_rows": self.flushed_rows,
+            "dropped_rows": self.dropped_rows,
+            "flushes": self.flushes,
+            "backpressure_waits": self.backpressure_waits,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            "avg_batch_rows": round(self.flushed_rows / self.flushes, 1) if self.flushes else 0.0,
+        }
+
+    # ---------- 生命周期 ----------
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """刷完队列里剩下的消息后退出后台任务"""
+        if not self.running:
+            return
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Marker(future, stop=True))
+        await future
+        await self._task
+        self._task = None
+
+    # ---------- 写入 ----------
+    async def put(self, row: Row) -> None:
+        if not self.running:
+            self.start()
+        if self._queue.full():
+            self.backpressure_waits += 1
+        await self._queue.put(row)
+        self.enqueued += 1
+
+    async def flush(self) -> None:
+        """立刻把已入队的消息落盘（读之前调用可保证读到自己写的）"""
+        if not self.running or self.pending == 0:
+            return
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Marker(future))
+        await future
+
+    # ---------- 后台任务 ----------
+    async def _loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            batch: List[Row] = []
+            markers: List[_Marker] = []
+            if isinstance(item, _Marker):
+                markers.append(item)
+            else:
+                batch.append(item)
+                deadline = loop.time() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            break
+                        try:
+                            item = await asyncio.wait_for(self._queue.get(), remaining)
+                        except asyncio.TimeoutError:
+                            break
+                    if isinstance(item, _Marker):
+                        markers.append(item)
+                        break
+                    batch.append(item)
+
+            if batch:
+                await self._flush_batch(batch)
+
+            stop = False
+            for marker in markers:
+                if marker.stop:
+                    # 停止前把剩余的也刷掉
+                    rest = []
+                    while not self._queue.empty():
+                        extra = self._queue.get_nowait()
+                        if isinstance(extra, _Marker):
+                            extra.future.set_result(None)
+                        else:
+                            rest.append(extra)
+                    for i in range(0, len(rest), self.batch_size):
+                        await self._flush_batch(rest[i:i + self.batch_size])
+                    stop = True
+                if not marker.future.done():
+                    marker.future.set_result(None)
+            if stop:
+                return
+
+    async def _flush_batch(self, batch: List[Row]) -> None:
+        for attempt in range(1, self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                await self.flush_fn(batch)
+            except Exception as e:
+                LOG.error(f"消息批量写入失败（第 {attempt} 次，{len(batch)} 条）: {e}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(0.2 * attempt)
+                continue
+            cost = (time.perf_counter() - start) * 1000
+            self.flushes += 1
+            self.flushed_rows += len(batch)
+            self.last_flush_ms = cost
+            self.max_flush_ms = max(self.max_flush_ms, cost)
+            self._total_flush_ms += cost
+            return
+        self.dropped_rows += len(batch)
+        LOG.error(f"放弃写入 {len(batch)} 条群消息")
+
+
+__all__ = ["MessageIngestQueue"]
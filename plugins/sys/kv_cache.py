@@ -0,0 +1,93 @@
+"""
+KV 读穿透缓存（进程内）
+- OrderedDict 实现的定长 LRU
+- 负缓存：库里没有的 key 也记一条，游戏插件每条群消息查 "本群有没有游戏" 不再回库
+- 条目带 expire_at，过了库里的过期时间自动视为不存在
+- 写穿透：CoreDAO 写库成功后同步更新缓存
+仅适用于单进程独占数据库的场景
+"""
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class KVCache:
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[Optional[str], Optional[int]]]" = OrderedDict()
+        # 每次写入/失效 +1；回库读期间有写入就放弃回填，避免旧值覆盖新值
+        self._seq = 0
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def lookup(self, key: str) -> Tuple[bool, Optional[str]]:
+        """返回 (是否命中, 值)；命中且值为 None 表示确定不存在"""
+        hit, value, _ = self.lookup_entry(key)
+        return hit, value
+
+    def lookup_entry(self, key: str) -> Tuple[bool, Optional[str], Optional[int]]:
+        """同 lookup，另外带上过期时间（None 表示永不过期 / 不存在）"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None, None
+        value, expire_at = entry
+        if value is not None and expire_at is not None and expire_at < int(time.time()):
+            # 已过期：和 SQL 的判断一致，按不存在处理
+            value = expire_at = None
+            self._data[key] = (None, None)
+        self._data.move_to_end(key)
+        if value is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return True, value, expire_at
+
+    def begin_fill(self) -> int:
+        return self._seq
+
+    def fill(self, key: str, value: Optional[str], expire_at: Optional[int], seq: int) -> None:
+        """回库读到的结果写回缓存；期间发生过写入则丢弃"""
+        if seq == self._seq:
+            self._set(key, value, expire_at)
+
+    def store(self, key: str, value: Optional[str], expire_at: Optional[int] = None) -> None:
+        """写穿透：库写成功后调用；value=None 表示已删除"""
+        self._seq += 1
+        self._set(key, value, expire_at)
+
+    def invalidate(self, key: str) -> None:
+        self._seq += 1
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._seq += 1
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def _set(self, key: str, value: Optional[str], expire_at: Optional[int]) -> None:
+        self._data[key] = (value, expire_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+__all__ = ["KVCache"]
@@ -0,0 +1,206 @@
+"""
+KV 值透明压缩
+- 超过 min_size 字节的值压缩后以 BLOB 存储，短值和旧数据仍是 TEXT，读的时候按类型区分
+- BLOB 头两个字节是格式标记：
+    FF 5A  zlib
+    FF 44  zlib + 预置字典（后跟 4 字节字典 id）
+    FF 53  zstd（装了 zstandard 才可选）
+    FF 52  调用方自己编码好的二进制值（如游戏状态的紧凑编码），原样存取，读出来是 bytes
+- 预置字典从库里现有的大值（主要是 AI 对话历史）里抽取高频片段，放在库文件旁边 kv_zdict.<id>.bin，
+  旧字典文件不要删，老数据解压要用
+
+训练字典（停机或运行中都可以，新字典下次启动生效）：
+    python plugins/sys/kv_codec.py --db config/db/sorabot.db
+"""
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import struct
+import time
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, Optional, Union
+
+try:
+    import zstandard
+except ImportError:          # 可选依赖
+    zstandard = None
+
+MARK_ZLIB = b'\xffZ'
+MARK_ZLIB_DICT = b'\xffD'
+MARK_ZSTD = b'\xffS'
+MARK_RAW = b'\xffR'
+_DICT_ID = struct.Struct('>I')
+ZDICT_MAX = 32 * 1024            # zlib 窗口 32KB，更长的字典没用
+
+
+def zdict_path(directory: str, dict_id: int) -> str:
+    return os.path.join(directory, f'kv_zdict.{dict_id:08x}.bin')
+
+
+class KVCodec:
+    def __init__(self, method: str = 'zlib', min_size: int = 1024, level: int = 6,
+                 zdict_dir: Optional[str] = None):
+        if method == 'zstd' and zstandard is None:
+            raise ValueError('kv_compression=zstd 需要安装 zstandard')
+        if method not in ('none', 'zlib', 'zstd'):
+            raise ValueError(f'未知的 KV 压缩方式: {method}')
+        self.method = method
+        self.min_size = min_size
+        self.level = level
+
+        # 全部历史字典（解压用），最新的一个用于压缩
+        self._zdicts: Dict[int, bytes] = {}
+        self._zdict_id: Optional[int] = None
+        if zdict_dir:
+            newest = -1.0
+            for path in glob.glob(os.path.join(glob.escape(zdict_dir), 'kv_zdict.*.bin')):
+                with open(path, 'rb') as f:
+                    data = f.read()
+                dict_id = zlib.adler32(data)
+                self._zdicts[dict_id] = data
+                if os.path.getmtime(path) > newest:
+                    newest, self._zdict_id = os.path.getmtime(path), dict_id
+        self._zstd_c = zstandard.ZstdCompressor(level=3) if method == 'zstd' else None
+        self._zstd_d = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+        # 统计
+        self.compressed = 0
+        self.skipped = 0            # 超过阈值但压缩后没变小，按原文存
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.encode_ms = 0.0
+        self.decoded = 0
+        self.decode_ms = 0.0
+
+    # ---------- 编码 ----------
+    def encode(self, value: Union[str, bytes, None]) -> Union[str, bytes, None]:
+        if isinstance(value, bytes):
+            return MARK_RAW + value
+        if value is None or self.method == 'none':
+            return value
+        raw = value.encode('utf-8')
+        if len(raw) < self.min_size:
+            return value
+        start = time.perf_counter()
+        if self.method == 'zstd':
+            blob = MARK_ZSTD + self._zstd_c.compress(raw)
+        elif self._zdict_id is not None:
+            c = zlib.compressobj(self.level, zdict=self._zdicts[self._zdict_id])
+            blob = MARK_ZLIB_DICT + _DICT_ID.pack(self._zdict_id) + c.compress(raw) + c.flush()
+        else:
+            blob = MARK_ZLIB + zlib.compress(raw, self.level)
+        self.encode_ms += (time.perf_counter() - start) * 1000
+        if len(blob) >= len(raw):
+            self.skipped += 1
+            return value
+        self.compressed += 1
+        self.raw_bytes += len(raw)
+        self.stored_bytes += len(blob)
+        return blob
+
+    def decode(self, stored: Union[str, bytes, None]) -> Union[str, bytes, None]:
+        if stored is None or isinstance(stored, str):
+            return stored
+        mark = stored[:2]
+        if mark == MARK_RAW:
+            return bytes(stored[2:])
+        start = time.perf_counter()
+        if mark == MARK_ZLIB:
+            raw = zlib.decompress(stored[2:])
+        elif mark == MARK_ZLIB_DICT:
+            (dict_id,) = _DICT_ID.unpack(stored[2:6])
+            zdict = self._zdicts.get(dict_id)
+            if zdict is None:
+                raise ValueError(f'缺少 KV 压缩字典 {dict_id:08x}')
+            d = zlib.decompressobj(zdict=zdict)
+            raw = d.decompress(stored[6:]) + d.flush()
+        elif mark == MARK_ZSTD:
+            if self._zstd_d is None:
+                raise ValueError('该值用 zstd 压缩，需要安装 zstandard')
+            raw = self._zstd_d.decompress(stored[2:])
+        else:
+            raw = bytes(stored)         # 非本模块写入的 BLOB，按 UTF-8 原文处理
+        self.decoded += 1
+        self.decode_ms += (time.perf_counter() - start) * 1000
+        return raw.decode('utf-8')
+
+    def stats(self, page_size: int = 4096) -> dict:
+        saved = self.raw_bytes - self.stored_bytes
+        return {
+            "method": self.method + ('+dict' if self.method == 'zlib' and self._zdict_id is not None else ''),
+            "compressed": self.compressed,
+            "skipped": self.skipped,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "ratio": round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else 0.0,
+            # 少写进库 / 少占页缓存的页数（按值大小粗估）
+            "saved_pages": saved // page_size,
+            "avg_encode_ms": round(self.encode_ms / (self.compressed + self.skipped), 4)
+            if self.compressed + self.skipped else 0.0,
+            "avg_decode_ms": round(self.decode_ms / self.decoded, 4) if self.decoded else 0.0,
+        }
+
+
+def train_zdict(samples: Iterable[str], size: int = ZDICT_MAX) -> bytes:
+    """
+    从样本里挑出反复出现的片段拼成 zlib 预置字典
+    zlib 越靠近窗口末尾的内容匹配代价越低，所以收益最高的片段放最后
+    """
+    counter: Counter = Counter()
+    for text in samples:
+        for piece in re.split(r'(?<=[，。！？,.!?\n"])', text):
+            piece = piece.strip()
+            if 4 <= len(piece) <= 200:
+                counter[piece] += 1
+    scored = sorted(((n * len(p.encode('utf-8')), p) for p, n in counter.items() if n >= 2))
+    out, used = [], 0
+    for _, piece in reversed(scored):
+        data = piece.encode('utf-8')
+        if used + len(data) > size:
+            continue
+        out.append(data)
+        used += len(data)
+    return b''.join(reversed(out))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从 kv 表训练压缩字典')
+    parser.add_argument('--db', default=os.path.join('config', 'db', 'sorabot.db'), help='库路径（split 布局用 *.kv.db）')
+    parser.add_argument('--min-size', type=int, default=1024, help='只用这么大以上的值做样本')
+    parser.add_argument('--limit', type=int, default=2000, help='最多取多少个样本')
+    args = parser.parse_args()
+
+    directory = os.path.dirname(args.db) or '.'
+    codec = KVCodec('zlib', zdict_dir=directory)
+    conn = sqlite3.connect(f'file:{os.path.abspath(args.db)}?mode=ro', uri=True)
+    rows = conn.execute(
+        'SELECT store_value FROM kv WHERE length(store_value) >= ? LIMIT ?',
+        (args.min_size // 3, args.limit)
+    ).fetchall()
+    conn.close()
+    samples = [s for s in (codec.decode(v) for (v,) in rows) if isinstance(s, str)]   # 跳过二进制值
+    zdict = train_zdict(samples)
+    if not zdict:
+        print(f'样本不足（{len(samples)} 个），没有生成字典')
+        return
+    path = zdict_path(directory, zlib.adler32(zdict))
+    with open(path, 'wb') as f:
+        f.write(zdict)
+
+    plain = sum(len(zlib.compress(s.encode('utf-8'))) for s in samples)
+    with_dict = 0
+    for s in samples:
+        c = zlib.compressobj(6, zdict=zdict)
+        with_dict += len(c.compress(s.encode('utf-8')) + c.flush())
+    print(f'{len(samples)} 个样本 -> {path}（{len(zdict)} 字节），'
+          f'压缩后 {plain} -> {with_dict} 字节（{(1 - with_dict / plain) * 100 if plain else 0:.1f}% 更小）')
+
+
+if __name__ == '__main__':
+    main()
+
+
+__all__ = ["KVCodec", "train_zdict", "zdict_path"]
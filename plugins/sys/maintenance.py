@@ -0,0 +1,134 @@
+"""
+数据库在线维护
+- incremental_vacuum：按小片归还空闲页，每片之间让出写连接
+- PRAGMA optimize / ANALYZE：刷新查询规划器统计信息
+- wal_checkpoint：把 WAL 合回主库，防止 -wal 文件无限增长
+- backup：用 SQLite backup API 分页拷贝在线快照，期间不阻塞写入
+每个操作返回一份报告（耗时、回收页数等），由 TTLCleaner 定时调度
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from typing import Optional
+
+import aiosqlite
+
+from .db import ConnectionPool
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+class DBMaintenance:
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self.last_report: dict = {}
+
+    async def _pragma(self, conn, name: str) -> int:
+        cur = await conn.execute(f'PRAGMA {name}')
+        row = await cur.fetchone()
+        return row[0] if row else 0
+
+    # ---------- 空间回收 ----------
+    async def incremental_vacuum(self, slice_pages: int = 256, max_pages: int = 4096,
+                                 pause: float = 0.05) -> dict:
+        """每次最多归还 slice_pages 页，总量不超过 max_pages；库不是 INCREMENTAL 模式时什么也不做"""
+        start = time.perf_counter()
+        async with self.pool.writer() as conn:
+            mode = await self._pragma(conn, 'auto_vacuum')
+            page_size = await self._pragma(conn, 'page_size')
+            free_before = await self._pragma(conn, 'freelist_count')
+        if mode != 2:
+            return {"skipped": "auto_vacuum 不是 INCREMENTAL", "free_pages": free_before,
+                    "duration_ms": _ms(start)}
+
+        reclaimed = slices = 0
+        free = free_before
+        while free > 0 and reclaimed < max_pages:
+            n = min(slice_pages, max_pages - reclaimed)
+            async with self.pool.writer() as conn:
+                # executescript 会一直 step 到结束；普通 execute 只 step 一次，只回收 1 页
+                await conn.executescript(f'PRAGMA incremental_vacuum({n})')
+                after = await self._pragma(conn, 'freelist_count')
+            slices += 1
+            if after >= free:
+                break
+            reclaimed += free - after
+            free = after
+            await asyncio.sleep(pause)      # 片与片之间让其他写入插队
+        return {"reclaimed_pages": reclaimed, "reclaimed_bytes": reclaimed * page_size,
+                "free_pages": free, "slices": slices, "duration_ms": _ms(start)}
+
+    async def enable_incremental_vacuum(self) -> dict:
+        """把老库切到 auto_vacuum=INCREMENTAL（需要一次完整 VACUUM，会阻塞写入，只应手动/低峰执行）"""
+        start = time.perf_counter()
+        async with self.pool.writer() as conn:
+            if await self._pragma(conn, 'auto_vacuum') == 2:
+                return {"skipped": "已经是 INCREMENTAL", "duration_ms": _ms(start)}
+            before = await self._pragma(conn, 'page_count')
+            await conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            await conn.execute('VACUUM')
+            after = await self._pragma(conn, 'page_count')
+        return {"pages_before": before, "pages_after": after, "duration_ms": _ms(start)}
+
+    # ---------- 统计信息 ----------
+    async def optimize(self, analyze: bool = False) -> dict:
+        """默认 PRAGMA optimize（只分析统计过期的表，很便宜）；analyze=True 全量 ANALYZE"""
+        start = time.perf_counter()
+        async with self.pool.writer() as conn:
+            if analyze:
+                await conn.execute('ANALYZE')
+            else:
+                await conn.execute('PRAGMA analysis_limit=1000')
+                await conn.execute('PRAGMA optimize')
+        return {"analyze": analyze, "duration_ms": _ms(start)}
+
+    # ---------- WAL ----------
+    async def checkpoint(self, mode: str = 'PASSIVE') -> dict:
+        """PASSIVE 不等待读者，不会卡住机器人；TRUNCATE 顺便把 -wal 文件截断"""
+        start = time.perf_counter()
+        async with self.pool.writer() as conn:
+            cur = await conn.execute(f'PRAGMA wal_checkpoint({mode})')
+            busy, log_frames, checkpointed = await cur.fetchone()
+        return {"mode": mode, "busy": busy, "wal_frames": log_frames,
+                "checkpointed_frames": checkpointed, "duration_ms": _ms(start)}
+
+    # ---------- 热备份 ----------
+    async def backup(self, dest: str, pages: int = 256, sleep: float = 0.01) -> dict:
+        """
+        在线快照到 dest：单独开一个源连接并持有读事务（WAL 下是固定快照，写入照常进行、备份不会重启），
+        每次拷 pages 页后 sleep，先写临时文件再原子替换
+        """
+        start = time.perf_counter()
+        os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+        tmp = f'{dest}.tmp'
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+        source = await aiosqlite.connect(self.pool.path, isolation_level=None)
+        target: Optional[sqlite3.Connection] = None
+        try:
+            await source.execute('BEGIN')
+            page_count = await self._pragma(source, 'page_count')   # 开启读事务，固定快照
+            target = sqlite3.connect(tmp, check_same_thread=False)
+            await source.backup(target, pages=pages, sleep=sleep)
+            await source.execute('COMMIT')
+        except BaseException:
+            if target is not None:
+                target.close()
+                target = None
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        finally:
+            if target is not None:
+                target.close()
+            await source.close()
+        os.replace(tmp, dest)
+        return {"dest": dest, "pages": page_count, "bytes": os.path.getsize(dest),
+                "duration_ms": _ms(start)}
+
+
+__all__ = ["DBMaintenance"]
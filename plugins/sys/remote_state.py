@@ -0,0 +1,372 @@
+"""
+共享状态服务 + 远程后端
+- StateServer：包一个本地 CoreDAO，对外提供 socket 服务，多个机器人进程共享钱包 / 游戏状态 / 消息
+- RemoteBackend：StateBackend 的网络实现
+  同一轮事件循环里发起的请求合并成一帧发出（批量），不等上一批响应就继续发（流水线）
+- 帧格式：4 字节大端长度 + UTF-8 JSON
+  请求帧 [[id, op, args], ...]，响应帧 [[id, ok, result], ...]
+  同一连接内的请求按顺序执行，先 set 后 get 一定读到新值
+
+独立运行状态服务：
+    python -m plugins.sys.remote_state [--db config/db/sorabot.db] [--host 127.0.0.1] [--port 7420]
+机器人进程设置 SORABOT_STATE_BACKEND=remote、SORABOT_STATE_SERVER=host:port 即可连过去
+"""
+import argparse
+import asyncio
+import json
+import struct
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from ncatbot.utils import get_log
+
+from .backend import StateBackend
+from .core import CoreDAO, CoinReservation, User, DB_PATH
+
+LOG = get_log("RemoteState")
+
+_HEADER = struct.Struct('>I')
+MAX_FRAME = 64 * 1024 * 1024
+
+
+class RemoteStateError(RuntimeError):
+    """状态服务端执行失败 / 连接断开"""
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Any:
+    header = await reader.readexactly(_HEADER.size)
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise RemoteStateError(f'帧过大: {size}')
+    return json.loads(await reader.readexactly(size))
+
+
+def _encode_frame(payload: Any) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return _HEADER.pack(len(body)) + body
+
+
+# ---------- 服务端 ----------
+class StateServer:
+    # 允许远程调用的 CoreDAO 方法
+    OPS = frozenset({
+        'get_key', 'set_key', 'del_key', 'scan_keys', 'get_key_ttl', 'set_key_ttl', 'ttl_cleanup',
+        'get_user', 'add_exp_coin', 'spend_coin', 'reserve_coin', 'commit_coin', 'refund_coin',
+        'store_group_message', 'get_messages_by_time_range', 'count_messages', 'count_speakers',
+        'hourly_counts', 'last_active', 'get_active_groups', 'cleanup_old_messages', 'purge_messages',
+        'search_messages', 'message_page',
+    })
+
+    def __init__(self, dao: CoreDAO):
+        self.dao = dao
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.requests = 0
+        self.batches = 0
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> None:
+        """port=0 随机端口（本地测试用），实际端口见 self.port"""
+        await self.dao.init()
+        self._server = await asyncio.start_server(self._handle, host, port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.dao.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    batch = await _read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                results = []
+                for req_id, op, args in batch:
+                    try:
+                        results.append([req_id, True, await self._dispatch(op, args)])
+                    except Exception as e:
+                        results.append([req_id, False, f'{type(e).__name__}: {e}'])
+                self.requests += len(batch)
+                self.batches += 1
+                writer.write(_encode_frame(results))
+                await writer.drain()
+        except (ConnectionError, RemoteStateError) as e:
+            LOG.warning(f"状态服务连接异常: {e}")
+        finally:
+            writer.close()
+
+    async def _dispatch(self, op: str, args: list) -> Any:
+        dao = self.dao
+        if op == 'rewards_add':
+            dao.rewards.add(*args)
+            return None
+        if op == 'rewards_flush':
+            return await dao.rewards.flush()
+        if op not in self.OPS:
+            raise RemoteStateError(f'不支持的操作: {op}')
+        if op in ('commit_coin', 'refund_coin'):
+            args = [CoinReservation(**args[0])]
+        result = await getattr(dao, op)(*args)
+        if isinstance(result, (User, CoinReservation)):
+            return result.model_dump(mode='json')
+        return result
+
+
+# ---------- 客户端 ----------
+class _RemoteRewards:
+    """和 RewardAccumulator 同名的 add / flush，奖励在服务端累加"""
+
+    def __init__(self, backend: 'RemoteBackend'):
+        self._backend = backend
+
+    def add(self, qq: str, exp: int = 0, coin: int = 0) -> None:
+        if not exp and not coin:
+            return
+        # 不等响应，和后续请求一起批量发送；失败只记日志
+        future = self._backend._submit('rewards_add', [qq, exp, coin])
+        future.add_done_callback(
+            lambda f: f.cancelled() or f.exception() is None
+            or LOG.error(f"远程发奖失败: {f.exception()}")
+        )
+
+    async def flush(self) -> int:
+        return await self._backend._call('rewards_flush')
+
+
+class RemoteBackend(StateBackend):
+    def __init__(self, host: str = '127.0.0.1', port: int = 7420, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.rewards = _RemoteRewards(self)
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._recv_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._outbox: List[list] = []
+        self._flush_scheduled = False
+        self._next_id = 0
+
+        self.requests = 0
+        self.batches = 0
+
+    @classmethod
+    def from_address(cls, address: str) -> 'RemoteBackend':
+        host, _, port = address.rpartition(':')
+        return cls(host or '127.0.0.1', int(port))
+
+    # ---------- 连接 ----------
+    async def init(self) -> None:
+        await self._ensure_connected()
+
+    async def close(self) -> None:
+        if self._pending:
+            await asyncio.gather(*self._pending.values(), return_exceptions=True)
+        if self._recv_task is not None:
+            self._recv_task.cancel()
+            try:
+                await self._recv_task
+            except asyncio.CancelledError:
+                pass
+            self._recv_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._reader = None
+
+    async def _ensure_connected(self) -> None:
+        if self._writer is not None:
+            return
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self._recv_task = asyncio.create_task(self._recv_loop(self._reader))
+
+    async def _recv_loop(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                for req_id, ok, result in await _read_frame(reader):
+                    future = self._pending.pop(req_id, None)
+                    if future is None or future.done():
+                        continue
+                    if ok:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(RemoteStateError(result))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            LOG.error(f"状态服务连接断开: {e}")
+        finally:
+            # 连接断了：未完成的请求全部失败，下次调用重新连接
+            self._writer = None
+            self._reader = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(RemoteStateError('状态服务连接断开'))
+            self._pending.clear()
+
+    # ---------- 批量 + 流水线 ----------
+    def _submit(self, op: str, args: list) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        self._next_id += 1
+        future = loop.create_future()
+        self._pending[self._next_id] = future
+        self._outbox.append([self._next_id, op, args])
+        if not self._flush_scheduled:
+            # 本轮事件循环里的其它请求都会进同一帧
+            self._flush_scheduled = True
+            loop.create_task(self._send_outbox())
+        return future
+
+    async def _send_outbox(self) -> None:
+        try:
+            await self._ensure_connected()
+        except OSError as e:
+            self._flush_scheduled = False
+            batch, self._outbox = self._outbox, []
+            for req_id, _, _ in batch:
+                future = self._pending.pop(req_id, None)
+                if future is not None and not future.done():
+                    future.set_exception(RemoteStateError(f'连不上状态服务: {e}'))
+            return
+        self._flush_scheduled = False
+        batch, self._outbox = self._outbox, []
+        if not batch:
+            return
+        self.requests += len(batch)
+        self.batches += 1
+        self._writer.write(_encode_frame(batch))
+        await self._writer.drain()
+
+    async def _call(self, op: str, *args) -> Any:
+        return await asyncio.wait_for(self._submit(op, list(args)), self.timeout)
+
+    # ---------- 通用 KV ----------
+    async def get_key(self, key: str) -> Optional[str]:
+        return await self._call('get_key', key)
+
+    async def set_key(self, key: str, value: str) -> None:
+        await self._call('set_key', key, value)
+
+    async def del_key(self, key: str) -> None:
+        await self._call('del_key', key)
+
+    async def scan_keys(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        return await self._call('scan_keys', prefix, limit)
+
+    # ---------- TTL KV ----------
+    async def get_key_ttl(self, key: str) -> Any:
+        return await self._call('get_key_ttl', key)
+
+    async def set_key_ttl(self, key: str, value: Any, ttl_seconds: int) -> None:
+        await self._call('set_key_ttl', key, value, ttl_seconds)
+
+    async def ttl_cleanup(self) -> int:
+        return await self._call('ttl_cleanup')
+
+    # ---------- 用户 / 钱包 ----------
+    async def get_user(self, qq: str) -> Optional[User]:
+        data = await self._call('get_user', qq)
+        return User(**data) if data else None
+
+    async def add_exp_coin(self, qq: str, exp: int = 0, coin: int = 0) -> None:
+        await self._call('add_exp_coin', qq, exp, coin)
+
+    async def spend_coin(self, qq: str, amount: int, reason: str = '') -> Optional[int]:
+        return await self._call('spend_coin', qq, amount, reason)
+
+    async def reserve_coin(self, qq: str, amount: int, reason: str = '') -> Optional[CoinReservation]:
+        data = await self._call('reserve_coin', qq, amount, reason)
+        return CoinReservation(**data) if data else None
+
+    async def commit_coin(self, reservation: CoinReservation) -> None:
+        await self._call('commit_coin', reservation.model_dump(mode='json'))
+
+    async def refund_coin(self, reservation: CoinReservation) -> bool:
+        return await self._call('refund_coin', reservation.model_dump(mode='json'))
+
+    # ---------- 群消息 ----------
+    async def store_group_message(self, group_id: str, user_id: str, nickname: str, message: str) -> None:
+        await self._call('store_group_message', group_id, user_id, nickname, message)
+
+    async def get_messages_by_time_range(self, group_id: str, hours: float) -> List[dict]:
+        return await self._call('get_messages_by_time_range', group_id, hours)
+
+    async def iter_messages(self, group_id: str, hours: float,
+                            columns: Sequence[str] = ('nickname', 'message', 'timestamp'),
+                            until: Optional[float] = None, page_size: int = 500) -> AsyncIterator[tuple]:
+        """远程版逐页取：每次请求带上一页的游标，服务端只读一页（含 until 上界）"""
+        after = None
+        while True:
+            rows, after = await self._call('message_page', group_id, hours, list(columns), until, page_size, after)
+            for row in rows:
+                yield tuple(row)
+            if after is None:
+                return
+
+    async def count_messages(self, group_id: str, hours: float) -> int:
+        return await self._call('count_messages', group_id, hours)
+
+    async def count_speakers(self, group_id: str, hours: float) -> int:
+        return await self._call('count_speakers', group_id, hours)
+
+    async def hourly_counts(self, group_id: str, hours: float) -> List[Tuple[int, int]]:
+        return [tuple(row) for row in await self._call('hourly_counts', group_id, hours)]
+
+    async def last_active(self, group_id: str) -> Optional[float]:
+        return await self._call('last_active', group_id)
+
+    async def get_active_groups(self, hours: float) -> Dict[str, float]:
+        return await self._call('get_active_groups', hours)
+
+    async def cleanup_old_messages(self, group_id: str, max_age_days: int = 7) -> None:
+        await self._call('cleanup_old_messages', group_id, max_age_days)
+
+    async def purge_messages(self, max_age_days: float) -> Dict[str, int]:
+        return await self._call('purge_messages', max_age_days)
+
+    async def search_messages(self, keyword: str, group_id: Optional[str] = None,
+                              hours: Optional[float] = None, limit: int = 10) -> List[dict]:
+        return await self._call('search_messages', keyword, group_id, hours, limit)
+
+
+async def _serve(db_path: str, host: str, port: int) -> None:
+    server = StateServer(CoreDAO(db_path))
+    await server.start(host, port)
+    LOG.info(f"状态服务已启动 {host}:{server.port}（{db_path}）")
+    dao = server.dao
+    try:
+        # 服务端负责过期清理；vacuum / 备份等仍可在此进程外用 TTLCleaner 的逻辑另行调度
+        while True:
+            await dao.expiry.wait(max_sleep=3600)
+            await dao.ttl_cleanup()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SoraBot 共享状态服务')
+    parser.add_argument('--db', default=DB_PATH, help='SQLite 库路径')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7420)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.db, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+__all__ = ["StateServer", "RemoteBackend", "RemoteStateError"]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+游戏奖励累加器（write-back）
+- 答题奖励先累加在内存里（每人一条 exp/coin 增量），定时 / 游戏结束 / 关闭时一次 executemany 落库
+- 每次 add() 追加一行到日志文件，进程崩溃后重放未落库的部分
+- 日志按批次号轮转：落库事务里同时记下批次号，重放时跳过已落库的批次，不会重复发奖
+"""
+import asyncio
+import glob
+import os
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ncatbot.utils import get_log
+
+LOG = get_log("RewardAccumulator")
+
+# flush_fn(rows=[(qq, exp, coin), ...], seq) 必须在同一事务里写入增量和批次号
+FlushFn = Callable[[List[Tuple[str, int, int]], int], Awaitable[None]]
+
+
+class RewardAccumulator:
+    def __init__(self, flush_fn: FlushFn, journal_prefix: str, flush_interval: float = 5.0):
+        self.flush_fn = flush_fn
+        self.journal_prefix = journal_prefix      # 日志文件：{prefix}.{seq}.journal
+        self.flush_interval = flush_interval
+
+        self._pending: Dict[str, List[int]] = {}  # qq -> [exp, coin]
+        self._seq = 1
+        self._journal = None
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.flushes = 0
+        self.flushed_users = 0
+
+    # ---------- 记账 ----------
+    def add(self, qq: str, exp: int = 0, coin: int = 0) -> None:
+        if not exp and not coin:
+            return
+        self._write_journal(f"{qq}\t{exp}\t{coin}\n")
+        delta = self._pending.setdefault(qq, [0, 0])
+        delta[0] += exp
+        delta[1] += coin
+
+    def pending_for(self, qq: str) -> Tuple[int, int]:
+        """还没落库的 (exp, coin) 增量，读余额时要合并进去"""
+        delta = self._pending.get(qq)
+        return (delta[0], delta[1]) if delta else (0, 0)
+
+    def has_pending(self, qq: Optional[str] = None) -> bool:
+        return bool(self._pending) if qq is None else qq in self._pending
+
+    # ---------- 落库 ----------
+    async def flush(self) -> int:
+        """把累积的增量一次写进库，返回涉及的用户数"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            seq = self._seq
+            self._rotate()
+            rows = [(qq, exp, coin) for qq, (exp, coin) in batch.items()]
+            try:
+                await self.flush_fn(rows, seq)
+            except Exception as e:
+                # 放回内存，日志文件还在，下次一起落库
+                for qq, (exp, coin) in batch.items():
+                    delta = self._pending.setdefault(qq, [0, 0])
+                    delta[0] += exp
+                    delta[1] += coin
+                LOG.error(f"奖励落库失败，稍后重试: {e}")
+                return 0
+            self._remove_journals(upto=seq)
+            self.flushes += 1
+            self.flushed_users += len(rows)
+            return len(rows)
+
+    # ---------- 生命周期 ----------
+    def recover(self, committed_seq: int) -> int:
+        """启动时重放已落库批次之后的日志，返回恢复的条数"""
+        recovered = 0
+        max_seq = committed_seq
+        for seq, path in self._journal_files():
+            max_seq = max(max_seq, seq)
+            if seq <= committed_seq:
+                os.remove(path)
+                continue
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) != 3:
+                        continue        # 崩溃时写了半行
+                    qq, exp, coin = parts[0], int(parts[1]), int(parts[2])
+                    delta = self._pending.setdefault(qq, [0, 0])
+                    delta[0] += exp
+                    delta[1] += coin
+                    recovered += 1
+        self._seq = max_seq + 1
+        if recovered:
+            LOG.warning(f"从奖励日志恢复 {recovered} 条未落库记录")
+        return recovered
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # ---------- 日志文件 ----------
+    def _write_journal(self, line: str) -> None:
+        if self._journal is None:
+            os.makedirs(os.path.dirname(self.journal_prefix) or '.', exist_ok=True)
+            self._journal = open(f"{self.journal_prefix}.{self._seq}.journal", 'a', encoding='utf-8')
+        self._journal.write(line)
+        self._journal.flush()        # 进程崩溃不丢；掉电保护交给 OS
+
+    def _rotate(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._seq += 1
+
+    def _journal_files(self) -> List[Tuple[int, str]]:
+        files = []
+        for path in glob.glob(f"{glob.escape(self.journal_prefix)}.*.journal"):
+            seq = path[len(self.journal_prefix) + 1:-len('.journal')]
+            if seq.isdigit():
+                files.append((int(seq), path))
+        return sorted(files)
+
+    def _remove_journals(self, upto: int) -> None:
+        for seq, path in self._journal_files():
+            if seq <= upto:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+__all__ = ["RewardAccumulator"]
@@ -0,0 +1,88 @@
+"""
+聊天记录搜索
+- /搜索 <关键词…> [N天 | --days=N]   在本群最近 N 天的记录里搜（默认 7 天，0 = 不限）
+- 命令后面的整段文字都是关键词，空格分隔表示同时包含；天数只认末尾的「N天」或 --days=N，
+  所以「/搜索 2024 年报」搜的是两个词，不会把 2024 当成天数
+- >= 3 个字走全文索引按相关度排序，更短的按时间倒序
+- 命令框架按空格逐个绑定位置参数，装不下不定个数的关键词，所以这里用群消息过滤器自己解析整条消息
+"""
+import re
+import time
+from typing import Optional, Tuple
+
+from ncatbot.plugin_system import NcatBotPlugin, command_registry, filter_registry
+from ncatbot.core.event import BaseMessageEvent, GroupMessageEvent
+from ncatbot.utils import get_log
+from .core import dao
+
+LOG = get_log("Search")
+
+COMMAND = '搜索'
+DEFAULT_DAYS = 7
+_DAYS = re.compile(r'(?:--days=|-d=)(\d+)|(\d+)天')
+
+
+def parse_query(text: str) -> Optional[Tuple[str, int]]:
+    """'/搜索 词1 词2 30天' -> ('词1 词2', 30)；不是搜索命令返回 None，没写关键词时关键词为空"""
+    head, _, rest = text.strip().partition(' ')
+    if head not in [prefix + COMMAND for prefix in command_registry.prefixes]:
+        return None
+    words = rest.split()
+    days = DEFAULT_DAYS
+    if words:
+        m = _DAYS.fullmatch(words[-1])
+        if m:
+            days = int(m.group(1) or m.group(2))
+            words.pop()
+    return ' '.join(words), days
+
+
+class SearchPlugin(NcatBotPlugin):
+    name = 'Search'
+    version = '1.0'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    async def on_load(self):
+        self.register_config("max_results", "5")
+        LOG.info(f"插件 {self.name} 加载成功")
+
+    @filter_registry.group_filter
+    async def search(self, event: BaseMessageEvent):
+        if not isinstance(event, GroupMessageEvent):
+            return
+        query = parse_query(event.raw_message)
+        if query is None:
+            return
+        keyword, days = query
+        if not keyword:
+            await event.reply(f'用法：/{COMMAND} <关键词…> [N天]，例如 /{COMMAND} 周末 聚餐 30天')
+            return
+
+        try:
+            limit = max(1, int(self.config.get("max_results", 5)))
+        except (ValueError, TypeError):
+            limit = 5
+        hours = days * 24 if days > 0 else None
+
+        try:
+            results = await dao.search_messages(keyword, group_id=str(event.group_id), hours=hours, limit=limit)
+        except Exception as e:
+            LOG.error(f"搜索失败: {e}")
+            await event.reply('❌ 搜索失败，请换个关键词试试')
+            return
+
+        if not results:
+            await event.reply(f'🔍 没有找到包含「{keyword}」的记录')
+            return
+
+        lines = [f'🔍 「{keyword}」的搜索结果：']
+        for msg in results:
+            time_str = time.strftime('%m-%d %H:%M', time.localtime(msg["timestamp"]))
+            text = msg["message"] if len(msg["message"]) <= 60 else msg["message"][:60] + '…'
+            lines.append(f'[{time_str}] {msg["nickname"]}: {text}')
+        await event.reply('\n'.join(lines))
+
+
+__all__ = ['SearchPlugin', 'parse_query']
@@ -1,40 +1,149 @@
 # plugins/sys/ttl_cleaner.py
 import asyncio
-from asyncio import sleep
+import os
+import glob
+import time
 from ncatbot.plugin_system import NcatBotPlugin
 from ncatbot.utils import get_log          # 引入官方日志
-from plugins.sys.core import dao
+from plugins.sys.core import dao, CoreDAO, DB_DIR
 
 LOG = get_log("TTLCleaner")                # 显式 logger
 
 
 class TTLCleanerPlugin(NcatBotPlugin):
+    """KV 过期清理 + 数据库维护调度（消息保留期、增量 vacuum、统计信息、checkpoint、热备份）"""
     name = "TTLCleaner"
-    version = "1.0"
+    version = "1.1"
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._run = True                     # 在 __init__ 里定义
+        self._last_purge = 0.0
+        self._last_analyze = 0.0
+        self._last_backup = 0.0
 
     async def on_load(self):
+        # 群消息全局保留天数（所有群，不依赖总结是否成功）
+        self.register_config("message_retention_days", "7")
+        # 维护任务：间隔（分钟），每次最多归还的页数，每片页数
+        self.register_config("maintenance_interval_min", "60")
+        self.register_config("vacuum_max_pages", "4096")
+        self.register_config("vacuum_slice_pages", "256")
+        # 全量 ANALYZE 间隔（小时），平时只跑便宜的 PRAGMA optimize
+        self.register_config("analyze_interval_hours", "24")
+        # 热备份：间隔（小时，0 关闭）、保留份数、目录
+        self.register_config("backup_interval_hours", "24")
+        self.register_config("backup_keep", "3")
+        self.register_config("backup_dir", os.path.join(DB_DIR, "backup"))
+        # 数据库连接池按引用计数共用：最后一个释放的插件负责关闭
+        await dao.acquire()
+        self.task = self.maint_task = None
+        if not isinstance(dao, CoreDAO):
+            # 远程状态后端：过期清理和库维护由状态服务进程负责
+            LOG.info(f"插件 {self.name} 加载成功（远程状态后端，不调度本地维护）")
+            return
         # 用官方提供的调度器（如果版本没有，就用手动 asyncio.create_task）
         self.task = asyncio.create_task(self._loop())
+        self.maint_task = asyncio.create_task(self._maintenance_loop())
         LOG.info(f"插件 {self.name} 加载成功")
 
+    def _num(self, key: str, default: float) -> float:
+        try:
+            return float(self.config.get(key, default))
+        except (ValueError, TypeError):
+            return default
+
     async def _loop(self):
         while self._run:
-            await sleep(3600)
-            cleaned = await dao.ttl_cleanup()
-            if cleaned:
-                LOG.info(f"[TTLCleaner] 清理 {cleaned} 条过期 KV")
+            # 睡到下一个 KV 真正过期（最多 1 小时），不再固定轮询
+            await dao.expiry.wait(max_sleep=3600)
+            try:
+                cleaned = await dao.ttl_cleanup()
+                if cleaned:
+                    LOG.info(f"[TTLCleaner] 清理 {cleaned} 条过期 KV")
+                if time.time() - self._last_purge >= 86400:
+                    await self._purge_messages()
+            except Exception as e:
+                LOG.error(f"[TTLCleaner] 清理失败: {e}")
+                # 过期的 key 还在堆里，wait 会立刻返回；歇一会儿再试，免得空转刷日志
+                await asyncio.sleep(60)
+
+    async def _purge_messages(self):
+        self._last_purge = time.time()
+        days = self._num("message_retention_days", 7)
+        result = await dao.purge_messages(days)
+        if result["dropped_partitions"] or result["deleted_rows"]:
+            LOG.info(f"[TTLCleaner] 群消息保留 {days} 天：删除分表 {result['dropped_partitions']} 张，"
+                     f"删除消息 {result['deleted_rows']} 条")
+
+    # ---------- 数据库维护 ----------
+    async def _maintenance_loop(self):
+        while self._run:
+            await asyncio.sleep(max(1.0, self._num("maintenance_interval_min", 60)) * 60)
+            try:
+                await self.run_maintenance()
+            except Exception as e:
+                LOG.error(f"[Maintenance] 维护失败: {e}")
+
+    async def run_maintenance(self) -> dict:
+        """执行一轮维护（split 布局下逐个库），返回 {库名: 报告}，同时记到各自的 last_report"""
+        full = time.time() - self._last_analyze >= self._num("analyze_interval_hours", 24) * 3600
+        backup_hours = self._num("backup_interval_hours", 24)
+        backup = backup_hours > 0 and time.time() - self._last_backup >= backup_hours * 3600
+
+        reports = {}
+        for name, m in dao.maintenance.items():
+            start = time.perf_counter()
+            report = {"at": time.time()}
+            report["vacuum"] = await m.incremental_vacuum(
+                slice_pages=int(self._num("vacuum_slice_pages", 256)),
+                max_pages=int(self._num("vacuum_max_pages", 4096)),
+            )
+            report["optimize"] = await m.optimize(analyze=full)
+            report["checkpoint"] = await m.checkpoint('PASSIVE')
+            if backup:
+                report["backup"] = await self._backup(name, m)
+            report["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            m.last_report = report
+            reports[name] = report
+
+            vac = report["vacuum"]
+            LOG.info(f"[Maintenance] {name} 完成，用时 {report['duration_ms']}ms，"
+                     f"回收 {vac.get('reclaimed_pages', 0)} 页，剩余空闲 {vac.get('free_pages', 0)} 页，"
+                     f"checkpoint {report['checkpoint']['checkpointed_frames']}/{report['checkpoint']['wal_frames']} 帧"
+                     + (f"，备份 {report['backup']['dest']}" if "backup" in report else ""))
+
+        if full:
+            self._last_analyze = time.time()
+        if backup:
+            self._last_backup = time.time()
+        return reports
+
+    async def _backup(self, name: str, m) -> dict:
+        backup_dir = self.config.get("backup_dir") or os.path.join(DB_DIR, "backup")
+        dest = os.path.join(backup_dir, f"{name}.{time.strftime('%Y%m%d-%H%M%S')}.db")
+        result = await m.backup(dest)
+        # 只保留最近 N 份（文件名带时间戳，字典序即时间序）
+        keep = max(1, int(self._num("backup_keep", 3)))
+        old = sorted(glob.glob(os.path.join(glob.escape(backup_dir), f"{glob.escape(name)}.[0-9]*-[0-9]*.db")))
+        for path in old[:-keep]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return result
 
     async def on_close(self):
         self._run = False
-        self.task.cancel()                   # 优雅停任务
-        try:
-            await self.task
-        except asyncio.CancelledError:
-            pass
+        for task in (self.task, self.maint_task):
+            if task is None:
+                continue
+            task.cancel()                    # 优雅停任务
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await dao.release()
 
 
-__all__ = ["TTLCleanerPlugin"]
\ No newline at end of file
+__all__ = ["TTLCleanerPlugin"]
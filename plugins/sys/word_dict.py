@@ -0,0 +1,178 @@
+"""
+内存映射的只读词典（ECDICT 精确查词不走 SQLite）
+- data/csv2db.py 导入后顺带生成 word_game.dict，机器人用 mmap 打开，多个进程共享同一份页缓存
+- 文件布局（小端）：
+    头部       magic 'SWD1' | 词数 n | 每块词数 | 块数 m | 源词典库大小 | 源词典库 mtime_ns
+    词偏移表   uint32 × (n + 1)，指向词堆
+    块偏移表   uint64 × (m + 1)，指向压缩块区
+    词堆       按 UTF-8 字节序排好的单词首尾相接
+    压缩块区   每块 zlib 压缩 BLOCK_WORDS 个词条的其余字段（\x1f 分隔字段，\x1e 分隔词条）
+- 查词：在词堆上二分（O(log n)，只切很短的单词片段），命中后解压所在的块（最近用过的块有小缓存）
+- 头部记录了生成时源词典库的大小和修改时间，和当前词典库对不上就不用（WordGameDAO 退回 SQLite）
+只依赖标准库，data/csv2db.py 导入时直接加载本文件
+"""
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b'SWD1'
+_HEADER = struct.Struct('<4sIIIQQ')
+BLOCK_WORDS = 8                 # 块越小单次解压越快，文件越大；8 个词一块约为词典库的 1/3
+BLOCK_CACHE = 64
+
+# 块里每个词条存的字段（word 在词堆里）；查出来的 dict 和 WordGameDAO 的 SQLite 结果同样的键
+RECORD_FIELDS = ('id', 'phonetic', 'definition', 'translation', 'pos',
+                 'collins', 'oxford', 'tag', 'bnc', 'frq', 'exchange')
+_INT_FIELDS = {'id', 'collins', 'oxford', 'bnc', 'frq'}
+
+
+def dict_path(db_path: str) -> str:
+    return os.path.splitext(db_path)[0] + '.dict'
+
+
+def source_id(db_path: str) -> Tuple[int, int]:
+    st = os.stat(db_path)
+    return st.st_size, st.st_mtime_ns
+
+
+def build_word_dict(db_path: str, out_path: Optional[str] = None, block_words: int = BLOCK_WORDS) -> dict:
+    """从词典库生成 .dict 文件（写临时文件后原子替换），返回大小统计"""
+    out_path = out_path or dict_path(db_path)
+    conn = sqlite3.connect(f'file:{os.path.abspath(db_path)}?mode=ro', uri=True)
+    try:
+        # SQLite 的 BINARY 排序就是 UTF-8 字节序，和查找时的 bytes 比较一致
+        rows = conn.execute(
+            f"SELECT word, {', '.join(RECORD_FIELDS)} FROM dictionary ORDER BY word"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    word_offsets = [0]
+    heap = bytearray()
+    blocks: List[bytes] = []
+    raw_bytes = 0
+    for start in range(0, len(rows), block_words):
+        records = []
+        for row in rows[start:start + block_words]:
+            word = row[0].encode('utf-8')
+            heap += word
+            word_offsets.append(len(heap))
+            records.append('\x1f'.join('' if v is None else str(v) for v in row[1:]))
+        raw = '\x1e'.join(records).encode('utf-8')
+        raw_bytes += len(raw)
+        blocks.append(zlib.compress(raw, 9))
+    block_offsets = [0]
+    for block in blocks:
+        block_offsets.append(block_offsets[-1] + len(block))
+
+    size, mtime_ns = source_id(db_path)
+    tmp = out_path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(rows), block_words, len(blocks), size, mtime_ns))
+        f.write(struct.pack(f'<{len(word_offsets)}I', *word_offsets))
+        f.write(struct.pack(f'<{len(block_offsets)}Q', *block_offsets))
+        f.write(heap)
+        for block in blocks:
+            f.write(block)
+    os.replace(tmp, out_path)
+    return {"words": len(rows), "blocks": len(blocks), "raw_bytes": raw_bytes,
+            "file_bytes": os.path.getsize(out_path)}
+
+
+class WordDict:
+    """只读词典；lookup / lookup_many 都是同步调用（纯内存 + 页缓存，不需要放到线程里）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.block_words, self.block_count, src_size, src_mtime = \
+            _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f'{path} 不是词典文件')
+        self.source = (src_size, src_mtime)
+        word_off = _HEADER.size
+        self._block_off = word_off + 4 * (self.count + 1)
+        self._heap = self._block_off + 8 * (self.block_count + 1)
+        # 词偏移表直接映射成 uint32 视图（零拷贝）；大端机器上才退化为拷贝一份再翻转字节序
+        self._view = memoryview(self._mm)
+        if sys.byteorder == 'little':
+            self._offsets = self._view[word_off:self._block_off].cast('I')
+        else:
+            self._offsets = array('I', self._mm[word_off:self._block_off])
+            self._offsets.byteswap()
+        self._blocks = self._heap + self._offsets[self.count]
+        self._cache: "OrderedDict[int, List[str]]" = OrderedDict()
+
+    def close(self) -> None:
+        self._cache.clear()
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        self._view.release()
+        self._mm.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, word: str) -> bool:
+        return self._find(word.encode('utf-8')) is not None
+
+    # ---------- 内部 ----------
+    def _word_at(self, i: int) -> bytes:
+        return self._mm[self._heap + self._offsets[i]:self._heap + self._offsets[i + 1]]
+
+    def _find(self, key: bytes) -> Optional[int]:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._word_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._word_at(lo) == key:
+            return lo
+        return None
+
+    def _block(self, b: int) -> List[str]:
+        records = self._cache.get(b)
+        if records is not None:
+            self._cache.move_to_end(b)
+            return records
+        start, end = struct.unpack_from('<QQ', self._mm, self._block_off + 8 * b)
+        records = zlib.decompress(self._mm[self._blocks + start:self._blocks + end]).decode('utf-8').split('\x1e')
+        self._cache[b] = records
+        if len(self._cache) > BLOCK_CACHE:
+            self._cache.popitem(last=False)
+        return records
+
+    def _record(self, i: int, word: str) -> dict:
+        fields = self._block(i // self.block_words)[i % self.block_words].split('\x1f')
+        result = {'word': word}
+        for name, value in zip(RECORD_FIELDS, fields):
+            result[name] = (int(value) if value else 0) if name in _INT_FIELDS else value
+        return result
+
+    # ---------- 查询 ----------
+    def lookup(self, word: str) -> Optional[dict]:
+        i = self._find(word.encode('utf-8'))
+        return None if i is None else self._record(i, word)
+
+    def lookup_many(self, words: Iterable[str]) -> Dict[str, dict]:
+        """批量查词：按位置排序后访问，同一块只解压一次"""
+        found = []
+        for word in set(words):
+            i = self._find(word.encode('utf-8'))
+            if i is not None:
+                found.append((i, word))
+        found.sort()
+        return {word: self._record(i, word) for i, word in found}
+
+
+__all__ = ["WordDict", "build_word_dict", "dict_path", "source_id"]
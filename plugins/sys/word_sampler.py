@@ -0,0 +1,110 @@
+"""
+单词游戏随机抽词（O(1)）
+- 每个难度一份 array('i') 行 id 表，抽词 = 随机下标 + 主键查询，不再 ORDER BY RANDOM() 全表扫描排序
+- id 表首次使用时从词典库构建，持久化到词典库旁边（word_game.db.ids），下次启动直接读
+- 文件头记录词典库指纹（大小 + 修改时间）和各难度的筛选条件，
+  data/csv2db.py 重新生成词典库或改了难度定义后会自动重建
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+from array import array
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from ncatbot.utils import get_log
+
+LOG = get_log("WordSampler")
+
+SAMPLER_SUFFIX = '.ids'
+
+
+def sampler_path(db_path: str) -> str:
+    return db_path + SAMPLER_SUFFIX
+
+
+def db_fingerprint(db_path: str, predicates: Dict[str, str]) -> str:
+    st = os.stat(db_path)
+    where = json.dumps(predicates, sort_keys=True, ensure_ascii=False)
+    return f"{st.st_size}:{st.st_mtime_ns}:{hashlib.sha1(where.encode('utf-8')).hexdigest()[:12]}"
+
+
+class WordSampler:
+    """
+    predicates: {难度: WHERE 子句}
+    fetch_ids(where) 返回满足条件的全部 id（由 WordGameDAO 用读连接执行）
+    """
+
+    def __init__(self, db_path: str, predicates: Dict[str, str],
+                 fetch_ids: Callable[[str], Awaitable[List[int]]]):
+        self.db_path = db_path
+        self.path = sampler_path(db_path)
+        self.predicates = predicates
+        self._fetch_ids = fetch_ids
+        self._ids: Optional[Dict[str, array]] = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        """词典库换了文件：丢掉内存里的 id 表，下次抽词重新加载/构建"""
+        self._ids = None
+
+    async def ids(self, difficulty: str) -> array:
+        if self._ids is None:
+            async with self._lock:
+                if self._ids is None:
+                    self._ids = await self._load_or_build()
+        return self._ids.get(difficulty, array('i'))
+
+    async def pick(self, difficulty: str) -> Optional[int]:
+        ids = await self.ids(difficulty)
+        return ids[random.randrange(len(ids))] if ids else None
+
+    def counts(self) -> Dict[str, int]:
+        return {name: len(ids) for name, ids in (self._ids or {}).items()}
+
+    # ---------- 持久化 ----------
+    async def _load_or_build(self) -> Dict[str, array]:
+        fingerprint = db_fingerprint(self.db_path, self.predicates)
+        loaded = await asyncio.to_thread(self._read_file, fingerprint)
+        if loaded is not None:
+            return loaded
+        ids: Dict[str, array] = {}
+        for name, where in self.predicates.items():
+            ids[name] = array('i', await self._fetch_ids(where))
+        await asyncio.to_thread(self._write_file, fingerprint, ids)
+        LOG.info(f"单词 id 表已重建: {', '.join(f'{k}={len(v)}' for k, v in ids.items())}")
+        return ids
+
+    def _read_file(self, fingerprint: str) -> Optional[Dict[str, array]]:
+        """格式：一行 JSON 头 {"fingerprint", "counts": {难度: 个数}}，后面按 counts 顺序拼接 int32 数组"""
+        try:
+            with open(self.path, 'rb') as f:
+                header = json.loads(f.readline())
+                if header.get("fingerprint") != fingerprint or header.get("itemsize") != array('i').itemsize:
+                    return None
+                ids = {}
+                for name, count in header["counts"].items():
+                    arr = array('i')
+                    arr.fromfile(f, count)
+                    ids[name] = arr
+                return ids
+        except (OSError, ValueError, EOFError, KeyError):
+            return None
+
+    def _write_file(self, fingerprint: str, ids: Dict[str, array]) -> None:
+        header = {"fingerprint": fingerprint, "itemsize": array('i').itemsize,
+                  "counts": {name: len(arr) for name, arr in ids.items()}}
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(json.dumps(header).encode('utf-8') + b'\n')
+                for arr in ids.values():
+                    arr.tofile(f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            # 写不了缓存文件不影响抽词，只是下次启动还要重建
+            LOG.warning(f"单词 id 表写入失败: {e}")
+
+
+__all__ = ["WordSampler", "sampler_path", "db_fingerprint"]
@@ -0,0 +1,120 @@
+"""
+ECDICT 导入时预计算的索引字段（查询时全部走索引）
+- tag 列是空格分隔的考试标签（zk gk cet4 ...），LIKE '%cet4%' 用不上索引，
+  导入时转成 tag_bits 位图，和 collins / level 一起建覆盖索引
+- level：按 collins / oxford / bnc / frq 预先分好的 1（基础）~ 5（生僻）档
+- exchange 列（p:went/d:gone/i:going/3:goes）拆成 word_forms 表：变形 -> 原形 id
+- 难度条件用下面的小函数拼出来，可以自由组合，例如
+      all_of(min_collins(2), any_tag('cet4', 'cet6'))
+      all_of(level_at_most(3), any_tag('ielts'))
+只依赖标准库，data/csv2db.py 导入时直接加载本文件
+"""
+from typing import Dict, Iterable, Optional, Set
+
+# 位号一旦分配不要改（已导入的库里存的是位图）；新标签只能往后加
+TAG_BITS = {
+    'zk': 0,       # 中考
+    'gk': 1,       # 高考
+    'cet4': 2,
+    'cet6': 3,
+    'ky': 4,       # 考研
+    'toefl': 5,
+    'ielts': 6,
+    'gre': 7,
+    'tem4': 8,     # 专四
+    'tem8': 9,     # 专八
+    'sat': 10,
+}
+
+LEVEL_MIN, LEVEL_MAX = 1, 5
+
+
+def tag_mask(tags: Iterable[str]) -> int:
+    mask = 0
+    for tag in tags:
+        bit = TAG_BITS.get(tag)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def parse_tags(tag: Optional[str]) -> int:
+    """'gk cet4 ky' -> 位图；未知标签忽略"""
+    return tag_mask((tag or '').split())
+
+
+def word_level(collins: int, oxford: int, bnc: int, frq: int) -> int:
+    """
+    难度分档：柯林斯星级 / 牛津 3000 核心词 / 词频排名（BNC 和当代语料库取靠前的那个，0 表示无数据）
+    """
+    ranks = [r for r in (bnc, frq) if r and r > 0]
+    rank = min(ranks) if ranks else None
+    if oxford or collins >= 4 or (rank is not None and rank <= 3000):
+        return 1
+    if collins >= 3 or (rank is not None and rank <= 8000):
+        return 2
+    if collins >= 2 or (rank is not None and rank <= 15000):
+        return 3
+    if collins >= 1 or (rank is not None and rank <= 30000):
+        return 4
+    return LEVEL_MAX
+
+
+# exchange 里表示“本词的变形”的代码：过去式 / 过去分词 / 现在分词 / 三单 / 比较级 / 最高级 / 复数
+# 0:（原形）和 1:（原形的变化类型）是反向指针，由原形那一行负责
+INFLECTION_CODES = {'p', 'd', 'i', '3', 'r', 't', 's'}
+
+
+def parse_exchange(exchange: Optional[str]) -> Dict[str, str]:
+    """'p:went/d:gone/i:going' -> {'p': 'went', 'd': 'gone', 'i': 'going'}"""
+    result = {}
+    for item in (exchange or '').split('/'):
+        code, sep, form = item.partition(':')
+        if sep and form:
+            result[code.strip()] = form.strip()
+    return result
+
+
+def inflections(exchange: Optional[str]) -> Set[str]:
+    """本词的全部变形（小写），不含原形本身；导入时每行都要调，代码都是单字符，直接切片不走 parse_exchange"""
+    if not exchange:
+        return set()
+    return {item[2:].strip().lower() for item in exchange.split('/')
+            if len(item) > 2 and item[1] == ':' and item[0] in INFLECTION_CODES}
+
+
+# ---------- 可组合的难度条件（生成 WHERE 子句） ----------
+def any_tag(*tags: str) -> str:
+    unknown = [t for t in tags if t not in TAG_BITS]
+    if unknown:
+        raise ValueError(f'未知的词典标签: {unknown}')
+    return f'(tag_bits & {tag_mask(tags)}) != 0'
+
+
+def all_tags(*tags: str) -> str:
+    mask = tag_mask(tags)
+    return f'(tag_bits & {mask}) = {mask}'
+
+
+def min_collins(stars: int) -> str:
+    return f'collins >= {int(stars)}'
+
+
+def level_at_most(level: int) -> str:
+    return f'level <= {int(level)}'
+
+
+def level_between(low: int, high: int) -> str:
+    return f'level BETWEEN {int(low)} AND {int(high)}'
+
+
+def all_of(*predicates: str) -> str:
+    return '(' + ' AND '.join(predicates) + ')'
+
+
+def one_of(*predicates: str) -> str:
+    return '(' + ' OR '.join(predicates) + ')'
+
+
+__all__ = ["TAG_BITS", "tag_mask", "parse_tags", "word_level", "INFLECTION_CODES", "parse_exchange", "inflections",
+           "any_tag", "all_tags", "min_collins", "level_at_most", "level_between", "all_of", "one_of"]
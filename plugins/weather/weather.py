@@ -295,26 +295,28 @@ class WeatherPlugin(NcatBotPlugin):
             return
 
         cost = int(self.config.get("cost_per_query", 5))
-        user_info = await dao.get_user(user_id)
 
-        if not user_info:
-            await dao.add_exp_coin(user_id, exp=0, coin=0)
+        # 先预扣，查询失败再退回
+        reservation = await dao.reserve_coin(user_id, cost, reason="weather")
+        if not reservation:
             user_info = await dao.get_user(user_id)
-
-        if user_info.coin < cost:
-            await event.reply(f"❌ 金币不足！需要 {cost}，当前 {user_info.coin}")
+            await event.reply(f"❌ 金币不足！需要 {cost}，当前 {user_info.coin if user_info else 0}")
             return
 
-        await dao.add_exp_coin(user_id, exp=0, coin=-cost)
         # await event.reply(f"⏳ 正在查询 {city} 天气...")
 
-        weather_data = await self.get_weather(location_id, f"{days}d")
+        try:
+            weather_data = await self.get_weather(location_id, f"{days}d")
+        except Exception:
+            await dao.refund_coin(reservation)
+            raise
 
         if weather_data:
+            await dao.commit_coin(reservation)
             await event.reply(self.format_weather_message(city, weather_data) + "\n\n" + f"查询成功！💰 本次查询消耗 {cost} 金币")
         else:
+            await dao.refund_coin(reservation)
             await event.reply("❌ 获取失败，金币已退回")
-            await dao.add_exp_coin(user_id, exp=0, coin=cost)
 
     async def manage_config(self, event: GroupMessageEvent, action: str, *args):
         """配置管理逻辑，现在包含启用/禁用定时播报。"""
@@ -0,0 +1,14 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def run():
+    """在新事件循环里跑协程（仓库没装 pytest-asyncio）"""
+    return asyncio.run
@@ -0,0 +1,32 @@
+"""CoreDAO / ConnectionPool 生命周期：引用计数关闭、关闭后不再悄悄重开"""
+import pytest
+
+from plugins.sys.core import CoreDAO
+
+
+def test_last_release_closes(tmp_path, run):
+    async def scenario():
+        dao = CoreDAO(str(tmp_path / 'sorabot.db'))
+        await dao.acquire()                 # TTLCleaner
+        await dao.acquire()                 # 游戏插件
+        await dao.release()                 # TTLCleaner 先卸载
+        await dao.set_key('k', 'v')         # 游戏插件卸载时的落库仍然能写
+        assert await dao.get_key('k') == 'v'
+        await dao.release()
+        with pytest.raises(RuntimeError):
+            await dao.set_key('k', 'v2')
+        with pytest.raises(RuntimeError):
+            await dao.scan_keys('k')
+    run(scenario())
+
+
+def test_explicit_init_reopens(tmp_path, run):
+    async def scenario():
+        dao = CoreDAO(str(tmp_path / 'sorabot.db'))
+        await dao.init()
+        await dao.set_key('k', 'v')
+        await dao.close()
+        await dao.init()
+        assert await dao.get_key('k') == 'v'
+        await dao.close()
+    run(scenario())
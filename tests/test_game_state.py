@@ -0,0 +1,142 @@
+"""GameState 紧凑编码：快照 + 补丁的写回与恢复"""
+import time
+
+import pytest
+
+import plugins.game.game_base as game_base
+from plugins.game import state_codec
+from plugins.sys.core import CoreDAO
+
+
+@pytest.fixture
+def make_dao(tmp_path, monkeypatch):
+    def factory():
+        dao = CoreDAO(str(tmp_path / 'sorabot.db'))
+        monkeypatch.setattr(game_base, 'dao', dao)
+        return dao
+    return factory
+
+
+def sample_state():
+    return {
+        "current_word": "apple", "current_mask": [False] * 5, "revealed_positions": 0,
+        "used_words": ["apple"], "player_stats": {"1234567890": {"count": 1, "total_coins": 10}},
+        "player_combo": {"1234567890": 1}, "last_player": "1234567890", "round_number": 1,
+        "max_rounds": 10, "start_time": 1760000000.25, "hint_used": False,
+        "hints_revealed": {"phonetic": False, "definition": False}, "difficulty": "normal",
+        "strict_mode": False, "player_names": {"1234567890": "小明"}, "word_ids": list(range(1000, 1010)),
+        "neg": -5, "leading_zero": "0123456", "empty": [], "mixed": [1, "a", None, 2.5],
+    }
+
+
+def test_codec_round_trip():
+    state = sample_state()
+    assert state_codec.decode_state(state_codec.encode_state(state)) == state
+
+
+def test_codec_rejects_unknown_version():
+    blob = bytearray(state_codec.encode_state({"a": 1}))
+    blob[3] = state_codec.VERSION + 1
+    with pytest.raises(ValueError):
+        state_codec.decode_state(bytes(blob))
+
+
+async def _expire_at(dao, key):
+    async with dao.kv_pool.reader() as conn:
+        cur = await conn.execute('SELECT expire_at FROM kv WHERE store_key=?', (key,))
+        row = await cur.fetchone()
+    return row[0] if row else None
+
+
+def test_snapshot_and_patches_restore(make_dao, run):
+    async def scenario():
+        dao = make_dao()
+        await dao.init()
+        writer = game_base.GameState('wg', flush_delay=60)
+        state = sample_state()
+        await writer.save('1', state)
+        await writer.flush('1')
+        state["current_mask"][2] = True
+        state["revealed_positions"] = 1
+        await writer.save('1', state)
+        await writer.flush('1')
+        state["player_stats"]["987654321"] = {"count": 1, "total_coins": 10}
+        del state["neg"]
+        await writer.save('1', state)
+        await writer.close()
+        assert writer.snapshots == 1 and writer.patches == 2
+
+        reader = game_base.GameState('wg')
+        assert await reader.load('1') == state
+        await dao.close()
+    run(scenario())
+
+
+def test_stale_patch_ignored_after_snapshot_rewrite(make_dao, run):
+    async def scenario():
+        dao = make_dao()
+        await dao.init()
+        writer = game_base.GameState('wg', flush_delay=60)
+        state = {"big": list(range(100)), "n": 1}
+        await writer.save('1', state)
+        await writer.flush('1')
+        state["n"] = 2                              # 小改动：写补丁
+        await writer.save('1', state)
+        await writer.flush('1')
+        state["big"] = list(range(300))             # 大改动：重写快照，旧补丁留在库里
+        state["n"] = 3
+        await writer.save('1', state)
+        await writer.flush('1')
+        assert writer.snapshots == 2 and writer.patches == 1
+        assert await dao.get_key('wg:1:patch') is not None
+
+        assert await game_base.GameState('wg').load('1') == state
+        await dao.close()
+    run(scenario())
+
+
+def test_patch_never_outlives_snapshot(make_dao, run, monkeypatch):
+    clock = [1_700_000_000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+
+    async def scenario():
+        dao = make_dao()
+        await dao.init()
+        state_ = game_base.GameState('wg', ttl=90, flush_delay=60)
+        state = {"big": list(range(100)), "n": 1}
+        await state_.save('1', state)
+        await state_.flush('1')
+        base_expire = await _expire_at(dao, 'wg:1')
+
+        clock[0] += 30                              # ttl/3 之后的一次小改动
+        state["n"] = 2
+        await state_.save('1', state)
+        await state_.flush('1')
+        assert state_.patches == 1
+        assert await _expire_at(dao, 'wg:1:patch') <= base_expire
+
+        clock[0] += 30                              # 快照剩余不足 ttl/2：改写快照续期
+        state["n"] = 3
+        await state_.save('1', state)
+        await state_.flush('1')
+        assert state_.snapshots == 2
+        assert await _expire_at(dao, 'wg:1') > base_expire
+        await dao.close()
+    run(scenario())
+
+
+def test_legacy_json_snapshot_loads(make_dao, run):
+    async def scenario():
+        dao = make_dao()
+        await dao.init()
+        await dao.set_key_ttl('wg:2', {"a": 1, "names": {"1234567890": "x"}}, 100)
+        state_ = game_base.GameState('wg', flush_delay=60)
+        data = await state_.load('2')
+        assert data == {"a": 1, "names": {"1234567890": "x"}}
+        data["a"] = 2
+        await state_.save('2', data)
+        await state_.close()
+        assert isinstance(await dao.get_key('wg:2'), bytes)
+        assert await game_base.GameState('wg').load('2') == data
+        await dao.close()
+    run(scenario())
@@ -0,0 +1,39 @@
+"""群活跃汇总表：只记最后发言时间，旧库多出的 message_count 列启动时删掉"""
+import sqlite3
+import time
+
+from plugins.sys.core import CoreDAO
+
+
+def test_last_active_and_legacy_column(tmp_path, run):
+    path = str(tmp_path / 'sorabot.db')
+
+    async def scenario():
+        dao = CoreDAO(path)
+        await dao.init()
+        await dao.store_group_message('100', '1', 'a', 'hello')
+        before = await dao.last_active('100')
+        assert before is not None and before <= time.time()
+        assert await dao.get_active_groups(1) == {'100': before}
+        await dao.close()
+
+        # 模拟早期版本的表结构
+        conn = sqlite3.connect(path)
+        conn.execute('DROP TABLE group_activity')
+        conn.execute('CREATE TABLE group_activity(group_id TEXT PRIMARY KEY, last_ts REAL NOT NULL, '
+                     'message_count INTEGER NOT NULL DEFAULT 0)')
+        conn.commit()
+        conn.close()
+
+        dao = CoreDAO(path)
+        await dao.init()
+        assert await dao.last_active('100') == before       # 空表时从消息回填
+        await dao.store_group_message('100', '2', 'b', 'again')
+        assert await dao.last_active('100') >= before
+        await dao.close()
+
+    run(scenario())
+    conn = sqlite3.connect(path)
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(group_activity)')]
+    conn.close()
+    assert columns == ['group_id', 'last_ts']
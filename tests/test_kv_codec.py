@@ -0,0 +1,63 @@
+"""KV 值压缩：格式标记、原样二进制、旧 TEXT 数据与关掉压缩后的兼容读取"""
+import zlib
+
+import pytest
+
+from plugins.sys.core import CoreDAO
+from plugins.sys.kv_codec import MARK_RAW, MARK_ZLIB, MARK_ZLIB_DICT, MARK_ZSTD, KVCodec, zdict_path
+
+LONG = '{"role": "user", "content": "今天天气怎么样"}' * 50
+
+
+def test_markers_and_round_trip():
+    codec = KVCodec('zlib', min_size=64)
+    blob = codec.encode(LONG)
+    assert blob[:2] == MARK_ZLIB and codec.decode(blob) == LONG
+    assert codec.encode('short') == 'short'                          # 短值仍是 TEXT
+    assert codec.encode(b'\x00\x01') == MARK_RAW + b'\x00\x01'
+    assert codec.decode(MARK_RAW + b'\x00\x01') == b'\x00\x01'
+    assert KVCodec('none').encode(LONG) == LONG
+    assert KVCodec('none').decode(blob) == LONG                      # 关掉压缩仍能读旧值
+    assert codec.decode('plain text') == 'plain text'
+    assert codec.decode('外部写入'.encode('utf-8')) == '外部写入'      # 没有标记的 BLOB 按原文
+
+
+def test_zlib_dict(tmp_path):
+    sample = LONG.encode('utf-8')[:4096]
+    with open(zdict_path(str(tmp_path), zlib.adler32(sample)), 'wb') as f:
+        f.write(sample)
+    codec = KVCodec('zlib', min_size=64, zdict_dir=str(tmp_path))
+    blob = codec.encode(LONG)
+    assert blob[:2] == MARK_ZLIB_DICT
+    assert KVCodec('none', zdict_dir=str(tmp_path)).decode(blob) == LONG
+    with pytest.raises(ValueError):
+        KVCodec('none').decode(blob)                                 # 字典文件丢了
+
+
+def test_zstd():
+    pytest.importorskip('zstandard')
+    codec = KVCodec('zstd', min_size=64)
+    blob = codec.encode(LONG)
+    assert blob[:2] == MARK_ZSTD and codec.decode(blob) == LONG
+
+
+def test_dao_mixed_rows(tmp_path, run):
+    path = str(tmp_path / 'sorabot.db')
+
+    async def scenario():
+        dao = CoreDAO(path, kv_compression='zlib', kv_compress_min=64)
+        await dao.init()
+        async with dao.kv_pool.writer() as conn:                    # 压缩上线前写入的 TEXT 行
+            await conn.execute('INSERT INTO kv(store_key, store_value) VALUES(?, ?)', ('old', LONG))
+        await dao.set_key('new', LONG)
+        await dao.set_key_raw_ttl('raw', b'SGS\x01\x00', 100)
+        await dao.close()
+
+        for method in ('zlib', 'none'):
+            dao = CoreDAO(path, kv_compression=method, kv_cache_size=0)
+            await dao.init()
+            assert await dao.get_key('old') == LONG
+            assert await dao.get_key('new') == LONG
+            assert await dao.get_key('raw') == b'SGS\x01\x00'
+            await dao.close()
+    run(scenario())
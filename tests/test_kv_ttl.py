@@ -0,0 +1,53 @@
+"""TTL KV：expire_at 列、旧版 {"v","expire"} 信封的兼容读取与迁移"""
+import json
+import time
+
+from plugins.sys.core import CoreDAO
+
+
+def test_new_value_shaped_like_legacy_envelope(tmp_path, run):
+    async def scenario():
+        dao = CoreDAO(str(tmp_path / 'sorabot.db'))
+        await dao.init()
+        value = {"v": 5, "expire": 1}
+        await dao.set_key_ttl('amb', value, 100)
+        assert await dao.get_key_ttl('amb') == value
+        dao.cache.clear()                   # 回库读一次，走 SQL 路径
+        assert await dao.get_key_ttl('amb') == value
+        await dao.close()
+    run(scenario())
+
+
+def test_legacy_envelope_read_and_migrated(tmp_path, run):
+    path = str(tmp_path / 'sorabot.db')
+
+    async def scenario():
+        dao = CoreDAO(path)
+        await dao.init()
+        live = json.dumps({"v": {"a": 1}, "expire": int(time.time()) + 100})
+        dead = json.dumps({"v": {"a": 2}, "expire": int(time.time()) - 100})
+        async with dao.kv_pool.writer() as conn:
+            await conn.executemany('INSERT INTO kv(store_key, store_value, expire_at) VALUES(?,?,NULL)',
+                                   [('live', live), ('dead', dead)])
+        dao.cache.clear()
+        assert await dao.get_key_ttl('live') == {"a": 1}
+        assert await dao.get_key_ttl('dead') is None
+        assert await dao._migrate_ttl_envelopes() == 2
+        dao.cache.clear()
+        assert await dao.get_key_ttl('live') == {"a": 1}
+        assert await dao.get_key_ttl('dead') is None
+        await dao.close()
+    run(scenario())
+
+
+def test_ttl_expiry(tmp_path, run):
+    async def scenario():
+        dao = CoreDAO(str(tmp_path / 'sorabot.db'))
+        await dao.init()
+        await dao.set_key_ttl('gone', [1, 2], -1)
+        await dao.set_key_ttl('kept', [3], 100)
+        assert await dao.get_key_ttl('gone') is None
+        assert await dao.get_key_ttl('kept') == [3]
+        assert await dao.ttl_cleanup() == 1
+        await dao.close()
+    run(scenario())
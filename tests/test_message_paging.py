@@ -0,0 +1,44 @@
+"""群消息键集分页：跨分表续读、until 上界，远程后端逐页取"""
+import time
+
+from plugins.sys.core import CoreDAO
+from plugins.sys.remote_state import RemoteBackend, StateServer
+
+COLUMNS = ('user_id', 'message', 'timestamp')
+
+
+async def _fill(dao: CoreDAO, now: float) -> list:
+    # 三天的消息，同一时间戳多条（靠 id 区分），另有别的群的干扰
+    rows = [('100', str(i), 'n', f'm{i}', now - 2 * 86400 + i * 3600 // 2) for i in range(90)]
+    rows += [('100', 'x', 'n', 'dup', now - 3600)] * 3
+    rows += [('200', 'y', 'n', 'other', now - 60)]
+    await dao._insert_messages(rows)
+    return sorted((r[1], r[3], r[4]) for r in rows if r[0] == '100')
+
+
+def test_local_and_remote_paging(tmp_path, run):
+    async def scenario():
+        now = time.time()
+        dao = CoreDAO(str(tmp_path / 'sorabot.db'), message_partitioning='day')
+        server = StateServer(dao)
+        await server.start()
+        remote = RemoteBackend('127.0.0.1', server.port)
+        await remote.init()
+
+        expected = await _fill(dao, now)
+        local = [r async for r in dao.iter_messages('100', 72, columns=COLUMNS, page_size=7)]
+        assert sorted(local) == expected
+        assert [r[2] for r in local] == sorted(r[2] for r in local)         # 按时间顺序
+
+        before = remote.requests
+        got = [r async for r in remote.iter_messages('100', 72, columns=COLUMNS, page_size=10)]
+        assert got == local
+        assert remote.requests - before == len(local) // 10 + 1              # 一页一个请求
+
+        until = now - 86400
+        bounded = [r async for r in remote.iter_messages('100', 72, columns=COLUMNS, until=until, page_size=10)]
+        assert bounded == [r for r in local if r[2] <= until]
+
+        await remote.close()
+        await server.stop()
+    run(scenario())
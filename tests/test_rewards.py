@@ -0,0 +1,91 @@
+"""奖励累加器：日志重放、已落库批次去重、落库失败保留增量"""
+import glob
+
+from plugins.sys.core import CoreDAO
+from plugins.sys.rewards import RewardAccumulator
+
+
+class FakeStore:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.rows = []
+        self.seq = 0
+
+    async def __call__(self, rows, seq):
+        if self.fail:
+            raise RuntimeError('disk full')
+        self.rows.extend(rows)
+        self.seq = seq
+
+
+def test_replay_after_crash(tmp_path, run):
+    prefix = str(tmp_path / 'sorabot.db.rewards')
+
+    async def scenario():
+        store = FakeStore()
+        acc = RewardAccumulator(store, prefix)
+        acc.add('1', exp=5, coin=10)
+        acc.add('2', coin=3)
+        assert await acc.flush() == 2
+        acc.add('1', exp=1, coin=1)
+        acc._journal.close()                # 进程在下次落库前崩溃
+
+        acc = RewardAccumulator(store, prefix)
+        assert acc.recover(store.seq) == 1
+        assert acc.pending_for('1') == (1, 1)
+        assert await acc.flush() == 1
+        assert store.rows == [('1', 5, 10), ('2', 0, 3), ('1', 1, 1)]
+        assert glob.glob(prefix + '.*.journal') == []
+        await acc.stop()
+    run(scenario())
+
+
+def test_committed_batch_not_replayed(tmp_path, run):
+    prefix = str(tmp_path / 'sorabot.db.rewards')
+
+    async def scenario():
+        acc = RewardAccumulator(FakeStore(), prefix)
+        acc.add('1', coin=10)
+        acc._journal.close()
+        # 批次 1 已随落库事务提交，只是日志文件还没来得及删
+        acc = RewardAccumulator(FakeStore(), prefix)
+        assert acc.recover(1) == 0
+        assert not acc.has_pending()
+        assert glob.glob(prefix + '.*.journal') == []
+    run(scenario())
+
+
+def test_failed_flush_keeps_pending(tmp_path, run):
+    async def scenario():
+        store = FakeStore(fail=True)
+        acc = RewardAccumulator(store, str(tmp_path / 'r'))
+        acc.add('1', coin=10)
+        assert await acc.flush() == 0
+        assert acc.pending_for('1') == (0, 10)
+        store.fail = False
+        acc.add('1', coin=5)
+        assert await acc.flush() == 1
+        assert store.rows == [('1', 0, 15)]
+        await acc.stop()
+    run(scenario())
+
+
+def test_dao_recovers_journal_on_init(tmp_path, run):
+    path = str(tmp_path / 'sorabot.db')
+    with open(f'{path}.rewards.3.journal', 'w', encoding='utf-8') as f:
+        f.write('1\t5\t20\n1\t0\t10\n2\t3')                          # 最后半行是崩溃时写了一半
+
+    async def scenario():
+        dao = CoreDAO(path)
+        await dao.init()
+        user = await dao.get_user('1')                              # 重放的增量已落库或并进余额
+        assert (user.exp, user.coin) == (5, 30)
+        await dao.close()
+
+        dao = CoreDAO(path)
+        await dao.init()
+        user = await dao.get_user('1')
+        assert (user.exp, user.coin) == (5, 30)
+        assert not dao.rewards.has_pending()
+        await dao.close()
+    run(scenario())
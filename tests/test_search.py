@@ -0,0 +1,25 @@
+"""/搜索：整段关键词解析与多词同时命中"""
+from plugins.sys.core import CoreDAO
+from plugins.sys.search import parse_query
+
+
+def test_parse_query():
+    assert parse_query('/搜索 2024 年报') == ('2024 年报', 7)
+    assert parse_query('/搜索 周末 聚餐 30天') == ('周末 聚餐', 30)
+    assert parse_query('/搜索 周末 --days=0') == ('周末', 0)
+    assert parse_query('/搜索') == ('', 7)
+    assert parse_query('/搜索周末') is None
+    assert parse_query('周末聚餐') is None
+
+
+def test_all_terms_must_match(tmp_path, run):
+    async def scenario():
+        dao = CoreDAO(str(tmp_path / 'sorabot.db'))
+        await dao.init()
+        for text in ('周末一起去聚餐吧', '周末加班', '明天聚餐'):
+            await dao.store_group_message('100', '1', 'a', text)
+        keyword, _ = parse_query('/搜索 周末 聚餐')
+        found = await dao.search_messages(keyword, group_id='100')
+        assert [m['message'] for m in found] == ['周末一起去聚餐吧']
+        await dao.close()
+    run(scenario())
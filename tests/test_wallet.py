@@ -0,0 +1,57 @@
+"""钱包：预扣 / 确认 / 退回，以及重启时退回挂起的预扣"""
+from plugins.sys.core import CoreDAO
+
+
+def test_reserve_commit_refund(tmp_path, run):
+    async def scenario():
+        dao = CoreDAO(str(tmp_path / 'sorabot.db'))
+        await dao.init()
+        await dao.add_exp_coin('1', coin=100)
+        assert await dao.reserve_coin('1', 1000) is None            # 余额不足不扣
+        assert await dao.reserve_coin('2', 1) is None               # 未注册
+
+        r = await dao.reserve_coin('1', 30, reason='ai')
+        assert r.balance == 70 and (await dao.get_user('1')).coin == 70
+        await dao.commit_coin(r)
+        assert await dao.refund_coin(r) is False                    # 已确认的不能再退
+        assert (await dao.get_user('1')).coin == 70
+
+        r = await dao.reserve_coin('1', 50)
+        assert await dao.refund_coin(r) is True
+        assert await dao.refund_coin(r) is False                    # 不会重复退
+        assert (await dao.get_user('1')).coin == 70
+
+        assert await dao.spend_coin('1', 20) == 50
+        assert await dao.spend_coin('1', 51) is None
+        await dao.close()
+    run(scenario())
+
+
+def test_pending_reservation_refunded_on_restart(tmp_path, run):
+    path = str(tmp_path / 'sorabot.db')
+
+    async def scenario():
+        dao = CoreDAO(path)
+        await dao.init()
+        await dao.add_exp_coin('1', coin=100)
+        await dao.reserve_coin('1', 40)                             # 调用付费接口时进程退出
+        await dao.close()
+
+        dao = CoreDAO(path)
+        await dao.init()
+        assert (await dao.get_user('1')).coin == 100
+        await dao.close()
+    run(scenario())
+
+
+def test_pending_rewards_count_towards_balance(tmp_path, run):
+    async def scenario():
+        dao = CoreDAO(str(tmp_path / 'sorabot.db'))
+        await dao.init()
+        await dao.add_exp_coin('1', coin=5)
+        dao.rewards.add('1', exp=5, coin=20)                        # 还在累加器里
+        assert (await dao.get_user('1')).coin == 25
+        assert await dao.spend_coin('1', 25) == 0                   # 扣费前先落库
+        assert not dao.rewards.has_pending('1')
+        await dao.close()
+    run(scenario())